@@ -142,7 +142,7 @@ class ShellBot(object):
         This function is a proxy for the underlying space.
         """
         if self.space:
-            self.space.add_moderators(*args, **kwargs)
+            return self.space.add_moderators(*args, **kwargs)
 
     def add_participants(self, *args, **kwargs):
         """
@@ -151,7 +151,7 @@ class ShellBot(object):
         This function is a proxy for the underlying space.
         """
         if self.space:
-            self.space.add_participants(*args, **kwargs)
+            return self.space.add_participants(*args, **kwargs)
 
     def add_participant(self, *args, **kwargs):
         """
@@ -169,7 +169,7 @@ class ShellBot(object):
         This function is a proxy for the underlying space.
         """
         if self.space:
-            self.space.remove_participants(*args, **kwargs)
+            return self.space.remove_participants(*args, **kwargs)
 
     def remove_participant(self, *args, **kwargs):
         """
@@ -188,6 +188,47 @@ class ShellBot(object):
         self.engine.dispatch('dispose')
         self.space.dispose(*args, **kwargs)
 
+    def is_active(self):
+        """
+        Checks if this bot has some work in progress
+
+        :return: True if the state machine of this bot is running
+        :rtype: bool
+        """
+        if self.machine is None:
+            return False
+
+        return self.machine.is_running()
+
+    def suspend(self):
+        """
+        Saves the state of this bot before it is evicted from memory
+
+        :return: an archive to be passed to ``resume()``
+
+        Values of the state machine are saved to the store, and the store
+        itself is archived if its values are not permanent.
+        """
+        mutables = getattr(self.machine, 'mutables', None)
+        if mutables is not None:
+            self.store.remember('bot.machine', mutables.copy())
+
+        return self.store.suspend()
+
+    def resume(self, archive):
+        """
+        Restores the state of this bot after it has been built again
+
+        :param archive: the value returned by ``suspend()``
+
+        """
+        self.store.resume(archive)
+
+        mutables = getattr(self.machine, 'mutables', None)
+        values = self.store.recall('bot.machine')
+        if mutables is not None and values:
+            mutables.update(values)
+
     def say(self, text=None, content=None, file=None):
         """
         Sends a message to the chat space
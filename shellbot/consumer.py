@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from six.moves.queue import Empty
+
+
+class Consumer(object):
+    """
+    Processes items received from a queue
+
+    This is the consumption loop shared by the listener, the speaker and
+    the worker. Instead of checking if the queue is empty and sleeping, the
+    loop blocks on the queue until some item arrives, or until time out.
+    On each wake-up, all items already waiting in the queue are drained,
+    up to a maximum batch size.
+
+    The loop is stopped when the parameter ``general.switch`` is changed
+    in the context. For example::
+
+        engine.set('general.switch', 'off')
+
+    Alternatively, the loop is also broken when a poison pill is pushed
+    to the queue. For example::
+
+        queue.put(None)
+
+    """
+
+    WAIT_DURATION = 0.1  # maximum time to block on an empty queue
+
+    BATCH_SIZE = 50  # maximum number of items drained on each wake-up
+
+    def drain(self, queue):
+        """
+        Gets a batch of items from a queue
+
+        :param queue: the queue to consume
+        :type queue: Queue
+
+        :return: items received from the queue, maybe none
+        :rtype: list
+
+        This function blocks for ``WAIT_DURATION`` seconds at most, until
+        a first item is available. Then it takes other items that may
+        be waiting, without blocking.
+        """
+        try:
+            items = [queue.get(True, self.WAIT_DURATION)]
+        except Empty:
+            return []
+
+        while items[-1] is not None and len(items) < self.BATCH_SIZE:
+            try:
+                items.append(queue.get_nowait())
+            except Empty:
+                break
+
+        return items
+
+    def prepare(self, items):
+        """
+        Prepares a batch of items before processing
+
+        :param items: items received from the queue
+        :type items: list
+
+        :return: items to be processed
+        :rtype: list
+
+        Provide your own implementation in a sub-class where required,
+        e.g., to merge or to re-order items.
+        """
+        return items
+
+    def consume(self, queue, handler):
+        """
+        Continuously processes items from a queue
+
+        :param queue: the queue to consume
+        :type queue: Queue
+
+        :param handler: the function to call for each item
+        :type handler: callable
+
+        :return: True if a poison pill has been received, else False
+
+        Exceptions raised by the handler are logged, and do not stop
+        the loop. Note that ``KeyboardInterrupt`` is not caught.
+
+        If the queue supports acknowledgement, e.g., a ``Spool``, then
+        items are acknowledged after each batch has been handled.
+        """
+        while self.engine.get('general.switch', 'on') == 'on':
+
+            items = self.drain(queue)
+            try:
+                for item in self.prepare(items):
+                    if item is None:
+                        return True
+
+                    try:
+                        handler(item)
+
+                    except Exception as feedback:
+                        logging.exception(feedback)
+
+            finally:
+                if items and hasattr(queue, 'ack'):
+                    queue.ack(len(items))
+
+        return False
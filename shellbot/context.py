@@ -15,11 +15,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from bisect import bisect_left
 import colorlog
+from contextlib import contextmanager
 import logging
 import os
-from multiprocessing import Lock, Manager
-import signal
+from multiprocessing import Condition, Lock, Value
+import time
+
+from .shared import SharedDict, SharedCounters
+from .state import State
 
 
 class Context(object):
@@ -29,9 +34,44 @@ class Context(object):
     This is a key-value store, that supports concurrency
     across multiple processes.
 
+    Two backends are available:
+
+    - ``manager`` -- values are kept in the manager process that is shared
+      by all components, and every access is a round-trip to this process.
+      This is the default. See ``shellbot.state.State``.
+
+    - ``shared`` -- values are kept in shared memory, reads are lock-free
+      and writes lock only the segment where a key is stored.
+      This is adapted to keys read on every loop, like ``general.switch``.
+
+    Example::
+
+        context = Context(backend='shared')
+
+    Some keys are counters that are incremented on every item processed
+    by engine components. They are kept in shared memory apart from other
+    values, whatever the backend, so that ``increment()`` does not lock
+    anything across processes. Additional counters can be declared
+    at the creation of a context::
+
+        context = Context(counters=['my.gauge'])
+
     """
 
-    def __init__(self, settings=None, filter=None):
+    BACKENDS = ('manager', 'shared')
+
+    COUNTERS = (
+        'listener.counter',
+        'speaker.counter',
+        'worker.counter',
+        'puller.counter',
+    )
+
+    def __init__(self,
+                 settings=None,
+                 filter=None,
+                 backend='manager',
+                 counters=None):
         """
         Stores settings across multiple independent processing units
 
@@ -41,16 +81,35 @@ class Context(object):
         :param filter: a function to interpret values on check()
         :type filter: callable
 
-        """
+        :param backend: either 'manager' (the default) or 'shared'
+        :type backend: str
+
+        :param counters: names of additional counters
+        :type counters: list of str
 
-        # prevent Manager() process to be interrupted
-        handler = signal.signal(signal.SIGINT, signal.SIG_IGN)
+        A ``ValueError`` is raised if the backend is unknown.
+        """
+        if backend not in self.BACKENDS:
+            raise ValueError(u"Unknown context backend {}".format(backend))
+        self.backend = backend
 
         self.lock = Lock()
-        self.values = Manager().dict()
+        self.changed = Condition()
+
+        self.counters = SharedCounters(
+            names=list(self.COUNTERS) + list(counters if counters else []))
+
+        # index of keys, rebuilt in each process when keys are added or removed
+        self.keys_version = Value('L', 0)   # incremented on add or removal
+        self.keys_removal = Value('L', 0)   # incremented on removal
+        self._index = (None, [])
+        self._known = (0, set())
 
-        # restore current handler for the rest of the program
-        signal.signal(signal.SIGINT, handler)
+        if backend == 'shared':
+            self.values = SharedDict()
+
+        else:
+            self.values = State.dict(shared=True)
 
         self.filter = filter if filter else self._filter
 
@@ -64,17 +123,20 @@ class Context(object):
         :param settings: variables to be added to this context
         :type settings: dict
 
+        Settings are flattened, then written with a single call
+        to ``set_many()``.
         """
-        with self.lock:
+        values = {}
+        for key in settings.keys():
+            if isinstance(settings[key], dict):
+                for label in settings[key].keys():
+                    values[key+'.'+label] = settings[key].get(label)
+            elif len(key.split('.')) > 1:
+                values[key] = settings[key]
+            else:
+                values['general.'+key] = settings[key]
 
-            for key in settings.keys():
-                if isinstance(settings[key], dict):
-                    for label in settings[key].keys():
-                        self.values[key+'.'+label] = settings[key].get(label)
-                elif len(key.split('.')) > 1:
-                    self.values[key] = settings[key]
-                else:
-                    self.values['general.'+key] = settings[key]
+        self.set_many(values)
 
     def clear(self):
         """
@@ -83,6 +145,11 @@ class Context(object):
         with self.lock:
             self.values.clear()
 
+        self.counters.clear()
+
+        self.forget_keys()
+        self.notify()
+
     def check(self,
               key,
               default=None,
@@ -156,7 +223,7 @@ class Context(object):
         If a validation function is provided, then a ``ValueError`` can be
         raised as well in some situations.
         """
-        with self.lock:
+        with self.lock_for(key):
 
             if default is not None:
                 value = self.values.get(key, None)
@@ -183,6 +250,26 @@ class Context(object):
             if filter:
                 self.values[key] = self.filter(value, default)
 
+        self.track_keys([key])
+        self.notify()
+
+    def lock_for(self, key=None):
+        """
+        Provides the lock that protects one key
+
+        :param key: name of the value, or None for the entire context
+        :type key: str
+
+        :return: a lock shared across processes
+
+        With the ``shared`` backend, each key is protected by the lock of
+        its own memory segment. Else a single lock is used for everything.
+        """
+        if key is not None and self.backend == 'shared':
+            return self.values.lock_for(key)
+
+        return self.lock
+
     @classmethod
     def _filter(self, value, default=None):
         """
@@ -242,6 +329,10 @@ class Context(object):
         This function looks at keys actually used in this context,
         and return True if prefix is found. Else it returns False.
 
+        Keys are looked up in a sorted index that is kept in each process.
+        The index is rebuilt only after some key has been added or removed,
+        so that most calls do not involve the manager process at all.
+
         Example::
 
             context = Context(settings={'space': {'title', 'a title'}})
@@ -256,14 +347,74 @@ class Context(object):
             False
 
         """
-        with self.lock:
+        index = self.get_index()
 
-            for key in self.values.keys():
-                if key.startswith(prefix):
-                    return True
+        position = bisect_left(index, prefix)
+        if position < len(index) and index[position].startswith(prefix):
+            return True
 
         return False
 
+    def get_index(self):
+        """
+        Provides the sorted list of keys used in this context
+
+        :return: names of all values
+        :rtype: list of str
+
+        The list is fetched again only if the set of keys has been changed
+        since the previous call, in this process or in another one.
+        """
+        version = self.keys_version.value
+
+        (indexed, index) = self._index
+        if indexed == version:
+            return index
+
+        with self.lock:
+            keys = list(self.values.keys())
+
+        index = sorted(keys)
+        self._index = (version, index)
+        return index
+
+    def track_keys(self, keys):
+        """
+        Updates the index of keys after some change
+
+        :param keys: names of values that have been set
+        :type keys: list of str
+
+        Indexes of all processes are invalidated only if some key has not
+        been tracked before by this process. This function is called
+        after actual changes.
+        """
+        removal = self.keys_removal.value
+        (tracked, known) = self._known
+        if tracked != removal:  # keys may have been removed
+            known = set()
+
+        added = [key for key in keys if key not in known]
+        if not added:
+            return
+
+        with self.keys_version.get_lock():
+            self.keys_version.value += 1
+
+        self._known = (removal, known.union(added))
+
+    def forget_keys(self):
+        """
+        Invalidates the index of keys after some removal
+
+        This function is called after actual changes.
+        """
+        with self.keys_removal.get_lock():
+            self.keys_removal.value += 1
+
+        with self.keys_version.get_lock():
+            self.keys_version.value += 1
+
     def get(self, key, default=None):
         """
         Retrieves the value of one configurationkey
@@ -281,16 +432,23 @@ class Context(object):
             message = context.get('bot.on_start')
 
         This function is safe on multiprocessing and multithreading.
+        With the ``shared`` backend, it does not lock anything.
 
         """
-        with self.lock:
+        if key in self.counters:
+            return self.counters.get(key)
 
+        if self.backend == 'shared':
             value = self.values.get(key, default)
 
-            if value is not None:
-                return value
+        else:
+            with self.lock:
+                value = self.values.get(key, default)
+
+        if value is not None:
+            return value
 
-            return default
+        return default
 
     def set(self, key, value):
         """
@@ -309,15 +467,153 @@ class Context(object):
         This function is safe on multiprocessing and multithreading.
 
         """
-        with self.lock:
+        if key in self.counters:
+            self.counters.set(key, value if isinstance(value, int) else 0)
+            return
+
+        with self.lock_for(key):
 
             self.values[key] = value
 
+        self.track_keys([key])
+        self.notify()
+
+    def get_many(self, keys, default=None):
+        """
+        Retrieves the values of multiple configuration keys
+
+        :param keys: names of the values
+        :type keys: list of str
+
+        :param default: default value for keys that have not been set
+        :type default: any serializable type is accepted
+
+        :return: the actual values, or the default value
+        :rtype: dict
+
+        Example::
+
+            values = context.get_many(['bot.id', 'bot.name'])
+            logging.debug(values['bot.name'])
+
+        With the ``manager`` backend, the context is fetched with a single
+        exchange with the manager process, instead of one exchange per key.
+
+        This function is safe on multiprocessing and multithreading.
+        """
+        if self.backend == 'shared':
+            values = self.values
+
+        else:
+            with self.lock:
+                values = self.values.copy()
+
+        result = {}
+        for key in keys:
+            if key in self.counters:
+                result[key] = self.counters.get(key)
+                continue
+
+            value = values.get(key, default)
+            result[key] = value if value is not None else default
+
+        return result
+
+    def set_many(self, values):
+        """
+        Changes the values of multiple configuration keys
+
+        :param values: new values
+        :type values: dict
+
+        Example::
+
+            context.set_many({'bot.id': '123', 'bot.name': 'Shelly'})
+
+        The lock is taken only once, and all values are transmitted with
+        a single exchange with the manager process.
+
+        This function is safe on multiprocessing and multithreading.
+        """
+        if not values:
+            return
+
+        with self.lock:
+            self.values.update(values)
+
+        self.track_keys(values.keys())
+        self.notify()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Changes multiple values atomically
+
+        :return: a snapshot of the context, as a dict
+
+        Example::
+
+            with context.transaction() as values:
+                values['bot.name'] = values.get('bot.name', 'Shelly')
+                values['bot.counter'] = values.get('bot.counter', 0) + 1
+
+        The context is locked for the duration of the block, then fetched
+        at once. Changes made to the snapshot are written back in a single
+        operation when the block ends without exception. On exception, the
+        context is left unchanged.
+
+        Other functions of this context should not be called from within
+        the block, since the context is locked.
+        """
+        if self.backend == 'shared':
+            locked = self.values.locked()
+
+        else:
+            locked = self.lock
+
+        with locked:
+            snapshot = self.values.copy()
+            values = dict(snapshot)
+
+            yield values
+
+            updated = {}
+            for key in values.keys():
+                if key not in snapshot or snapshot[key] != values[key]:
+                    updated[key] = values[key]
+
+            deleted = [key for key in snapshot.keys() if key not in values]
+            for key in deleted:
+                del self.values[key]
+
+            if updated:
+                self.values.update(updated)
+
+        if deleted:
+            self.forget_keys()
+        self.track_keys(updated.keys())
+        self.notify()
+
     def increment(self, key, delta=1):
         """
         Increments a value
+
+        :param key: name of the value
+        :type key: str
+
+        :param delta: increment to apply
+        :type delta: int
+
+        :return: the new value
+
+        For counters, this function does not lock anything across processes,
+        and processes that are watching the context are not notified.
         """
-        with self.lock:
+        if key in self.counters:
+            self.counters.increment(key, delta)
+            return self.counters.get(key)
+
+        with self.lock_for(key):
 
             value = self.values.get(key, 0)
             if not isinstance(value, int):
@@ -325,13 +621,27 @@ class Context(object):
             value += delta
             self.values[key] = value
 
-            return value
+        self.track_keys([key])
+        self.notify()
+        return value
 
     def decrement(self, key, delta=1):
         """
         Decrements a value
+
+        :param key: name of the value
+        :type key: str
+
+        :param delta: decrement to apply
+        :type delta: int
+
+        :return: the new value
         """
-        with self.lock:
+        if key in self.counters:
+            self.counters.increment(key, -delta)
+            return self.counters.get(key)
+
+        with self.lock_for(key):
 
             value = self.values.get(key, 0)
             if not isinstance(value, int):
@@ -339,7 +649,72 @@ class Context(object):
             value -= delta
             self.values[key] = value
 
-            return value
+        self.track_keys([key])
+        self.notify()
+        return value
+
+    def notify(self):
+        """
+        Wakes up processes that are watching the context
+
+        This function is called on every change of the context, so that
+        ``watch()`` can return immediately.
+        """
+        with self.changed:
+            self.changed.notify_all()
+
+    def watch(self, key, value, timeout=None, default=None):
+        """
+        Waits for the change of a value
+
+        :param key: name of the value
+        :type key: str
+
+        :param value: the value that is currently known
+        :type value: any serializable type is accepted
+
+        :param timeout: maximum time to wait, in seconds, or None
+        :type timeout: float
+
+        :param default: default value if the key has not been set
+        :type default: any serializable type is accepted
+
+        :return: the actual value, that may still be the known value on
+            time out
+
+        This function blocks until the key gets a value that is different
+        from the one provided, or until time out. This is a replacement
+        for polling loops, like in the following example::
+
+            while context.get('general.switch', 'on') == 'on':
+                do_something()
+                context.watch('general.switch', 'on',
+                              timeout=1.0, default='on')
+
+        Here the loop is broken as soon as another process does::
+
+            context.set('general.switch', 'off')
+
+        This function is safe on multiprocessing and multithreading.
+        """
+        if timeout is not None:
+            deadline = time.time() + timeout
+
+        with self.changed:
+            while True:
+                actual = self.get(key, default)
+                if actual != value:
+                    return actual
+
+                if timeout is None:
+                    self.changed.wait()
+                    continue
+
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return actual
+
+                self.changed.wait(remaining)
 
     @classmethod
     def set_logger(cls, level=logging.DEBUG):
@@ -16,21 +16,28 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from collections import OrderedDict
 import logging
 from multiprocessing import Process, Queue
+import os
 from six import string_types
 import sys
 import time
 import yaml
 import weakref
+import zlib
 
 from .context import Context
+from .events import Codec
 from .shell import Shell
 from .listener import Listener
+from .queues import BoundedQueue
 from .server import Server
 from .bot import ShellBot
 from .spaces import SpaceFactory
 from .speaker import Speaker
+from .spool import Spool
+from .state import State
 from .stores import StoreFactory
 from .worker import Worker
 from .routes.wrapper import Wrapper
@@ -99,6 +106,16 @@ class Engine(object):
 
     """
 
+    DEFAULT_CODEC = 'pickle'  # for events pushed to the listening queue
+
+    DEFAULT_WORKERS = 1  # size of the pool of workers
+
+    BOTS_SIZE = 100  # maximum number of bots kept in memory
+
+    BOTS_IDLE = 3600  # seconds before an idle bot is evicted
+
+    BUSY_MESSAGE = u"Sorry, I am busy, please try again later"
+
     DEFAULT_SETTINGS = {
 
         'bot': {
@@ -177,11 +194,15 @@ class Engine(object):
 
         self.context = context if context else Context()
 
+        self.codec = Codec.get(
+            self.context.get('listener.codec', self.DEFAULT_CODEC))
+
         self.mouth = mouth
         self.speaker = Speaker(engine=self)
 
         self.inbox = inbox
         self.worker = Worker(engine=self)
+        self.workers = [self.worker]
 
         self.ears = ears
         self.listener = Listener(engine=self)
@@ -198,9 +219,14 @@ class Engine(object):
             'enter': [],      # invited to a space (for the bot)
             'exit': [],       # kicked off from a space (for the bot)
             'inbound': [],    # other event received from space (with event)
+            'evict': [],      # bot is removed from memory (with bot)
         }
 
-        self.bots = {}
+        self.bots = OrderedDict()  # least recently used first
+        self.bots_used = {}
+        self.archives = {}
+
+        self.space_type = None  # sensed once, then used for every new bot
 
         assert space is None or type is None  # use only one
         if type:
@@ -208,6 +234,7 @@ class Engine(object):
         self.space = space
         if self.space:
             self.space.context = self.context
+            self.space.codec = self.codec
 
         self.server = server
 
@@ -279,6 +306,7 @@ class Engine(object):
 
         if self.space is None:
             self.space = SpaceFactory.build(context=self.context, ears=self.ears)
+            self.space.codec = self.codec
 
         self.space.configure()
 
@@ -323,9 +351,33 @@ class Engine(object):
         """
 
         self.context.apply(settings)
+        self.space_type = None  # sense configuration again
         self.context.check('bot.on_enter', '', filter=True)
         self.context.check('bot.on_exit', '', filter=True)
 
+        self.context.check('listener.codec', self.DEFAULT_CODEC,
+                           validate=lambda x: x in ('json', 'pickle'))
+        self.context.check('worker.pool', self.DEFAULT_WORKERS,
+                           validate=lambda x: int(x) > 0)
+        self.context.check('speaker.threads', Speaker.DEFAULT_THREADS,
+                           validate=lambda x: int(x) > 0)
+        self.context.check('speaker.coalesce', Speaker.DEFAULT_COALESCE,
+                           validate=lambda x: float(x) >= 0)
+
+        for name in ('ears', 'inbox', 'mouth'):
+            self.context.check('queue.'+name+'.size', 0,
+                               validate=lambda x: int(x) >= 0)
+            self.context.check('queue.'+name+'.overflow', 'block',
+                               validate=lambda x: x in BoundedQueue.POLICIES)
+        self.codec = Codec.get(self.context.get('listener.codec'))
+
+        self.context.check('general.state', 'shared',
+                           validate=lambda x: x in State.MODES)
+        State.configure(self.context.get('general.state'))
+
+        if self.space:
+            self.space.codec = self.codec
+
     def get(self, key, default=None):
         """
         Retrieves the value of one configuration key
@@ -596,15 +648,17 @@ class Engine(object):
         logging.warning(u'Starting the bot')
 
         if self.mouth is None:
-            self.mouth = Queue()
+            self.mouth = self.build_queue('mouth')
 
         if self.inbox is None:
-            self.inbox = Queue()
+            self.inbox = self.build_queue('inbox')
 
         if self.ears is None:
-            self.ears = Queue()
+            self.ears = self.build_queue('ears')
             self.space.ears = self.ears
 
+        self.build_workers()
+
         self.start_processes()
 
         self.on_start()
@@ -616,15 +670,160 @@ class Engine(object):
         Starts the engine processes
 
         This function starts a separate process for each
-        main component of the architecture: listener, speaker, and worker.
+        main component of the architecture: listener, speaker, and workers.
         """
 
         self.context.set('general.switch', 'on')
 
         self._speaker_process = self.speaker.start()
-        self._worker_process = self.worker.start()
+        self._worker_processes = [x.start() for x in self.workers]
         self._listener_process = self.listener.start()
 
+    def build_workers(self):
+        """
+        Builds the pool of workers
+
+        The size of the pool is set by the parameter ``worker.pool`` in the
+        context. The first worker consumes ``self.inbox``, and every other
+        worker gets its own queue.
+
+        Example::
+
+            engine.configure_from_dict({'worker.pool': 4})
+            engine.start()
+
+        """
+        size = int(self.context.get('worker.pool', self.DEFAULT_WORKERS))
+        logging.debug(u"Building a pool of {} worker(s)".format(size))
+
+        self.workers = [self.worker]
+        for index in range(1, size):
+            self.workers.append(Worker(
+                engine=self,
+                index=index,
+                inbox=self.build_queue('inbox.{}'.format(index))))
+
+    def build_queue(self, name):
+        """
+        Builds a queue to connect engine components
+
+        :param name: the name of the queue, e.g., 'mouth'
+        :type name: str
+
+        :return: a queue that can be shared across processes
+        :rtype: BoundedQueue
+
+        If the parameter ``general.spool`` is set in the context, then
+        items are queued on disk, in a file of this directory. Else
+        a regular queue is used.
+
+        Example::
+
+            engine.configure_from_dict({'general.spool': '/var/spool/bot'})
+            engine.start()  # items not processed yet are replayed
+
+        The maximum number of items waiting in the queue, and what to do
+        when this limit is reached, are set in the context. For example::
+
+            engine.configure_from_dict({
+                'queue.inbox.size': 100,
+                'queue.inbox.overflow': 'reply',
+            })
+
+        Supported overflow policies are: ``block``, ``drop_oldest``,
+        ``drop_newest`` and ``reply``. By default queues are not limited.
+        """
+        directory = self.context.get('general.spool')
+        if directory in (None, ''):
+            queue = Queue()
+
+        else:
+            path = os.path.join(directory, name + '.db')
+            logging.debug(u"- spooling {} to {}".format(name, path))
+            queue = Spool(path)
+
+        kind = name.split('.')[0]  # 'inbox.1' -> 'inbox'
+        return BoundedQueue(
+            queue,
+            name=name,
+            size=self.context.get('queue.'+kind+'.size', 0),
+            overflow=self.context.get('queue.'+kind+'.overflow', 'block'),
+            on_drop=lambda item: self.on_drop(name, item))
+
+    def on_drop(self, name, item):
+        """
+        Handles an item dropped from a full queue
+
+        :param name: the name of the queue, e.g., 'inbox'
+        :type name: str
+
+        :param item: the item that has been dropped
+
+        If the overflow policy of the queue is ``reply``, then the space
+        where the item comes from is told to try again later.
+        """
+        logging.warning(u"Queue {} is full, dropping an item".format(name))
+
+        space_id = None
+        if name.startswith('inbox'):
+            (verb, arguments, space_id) = item
+            worker = self.get_worker(space_id)
+            self.context.decrement(worker.key('depth'))
+
+        elif name == 'ears':
+            attributes = self.codec.decode(item)
+            if attributes.get('type') == 'message':
+                space_id = attributes.get('space_id')
+
+        kind = name.split('.')[0]
+        if space_id and self.context.get('queue.'+kind+'.overflow') == 'reply':
+            self.get_bot(space_id).say(self.BUSY_MESSAGE)
+
+    def get_gauges(self):
+        """
+        Reports on the activity of engine queues
+
+        :return: the number of items waiting, and of items dropped
+        :rtype: dict
+
+        Example::
+
+            >>>engine.get_gauges()
+            {'ears.depth': 0, 'ears.dropped': 0,
+             'inbox.depth': 3, 'inbox.dropped': 0,
+             'mouth.depth': 1, 'mouth.dropped': 0}
+
+        """
+        queues = [self.ears, self.mouth]
+        queues += [x.get_inbox() for x in self.workers]
+
+        gauges = {}
+        for queue in queues:
+            if hasattr(queue, 'gauges'):
+                gauges.update(queue.gauges())
+        return gauges
+
+    def get_worker(self, space_id=None):
+        """
+        Selects the worker in charge of a space
+
+        :param space_id: the unique id of the target chat space
+        :type space_id: str
+
+        :return: the worker that processes commands of this space
+        :rtype: Worker
+
+        Spaces are spread over the pool of workers by hashing their id,
+        so that commands of a space are always executed in sequence.
+        """
+        if len(self.workers) < 2:
+            return self.worker
+
+        key = space_id if space_id else ''
+        if not isinstance(key, bytes):
+            key = key.encode('utf-8')
+        return self.workers[zlib.crc32(key) % len(self.workers)]
+
     def on_start(self):
         """
         Does additional stuff when the engine is started
@@ -633,12 +832,16 @@ class Engine(object):
         """
         pass
 
+    STOP_DELAY = 1.0  # maximum time to wait for each process on stop
+
     def stop(self):
         """
         Stops the engine
 
         This function changes in the context a specific key that is monitored
-        by bot components.
+        by bot components. Processes that are watching the context are woken
+        up immediately, and the function waits for the termination of
+        the listener, of the speaker and of the workers.
         """
 
         logging.warning(u'Stopping the bot')
@@ -649,9 +852,18 @@ class Engine(object):
         logging.debug(u"- running on_stop()")
         self.on_stop()
 
+        if self.space is not None:
+            self.space.on_stop()
+
         logging.debug(u"- switching off")
         self.context.set('general.switch', 'off')
-        time.sleep(1)
+
+        processes = [getattr(self, '_listener_process', None)]
+        processes += getattr(self, '_worker_processes', [])
+        processes.append(getattr(self, '_speaker_process', None))
+        for process in processes:
+            if process is not None:
+                process.join(self.STOP_DELAY)
 
     def on_stop(self):
         """
@@ -679,15 +891,77 @@ class Engine(object):
         logging.debug(u"Getting bot {}".format(space_id))
         if space_id and space_id in self.bots.keys():
             logging.debug(u"- found matching bot instance")
-            return self.bots[space_id]
+            bot = self.bots.pop(space_id)
+            self.bots[space_id] = bot  # most recently used
+            self.bots_used[space_id] = time.time()
+            return bot
 
         bot = self.build_bot(space_id)
 
         if bot:
+            archive = self.archives.pop(bot.space_id, None)
+            if archive is not None:
+                logging.debug(u"- resuming bot state")
+                bot.resume(archive)
+
             self.bots[bot.space_id] = bot
+            self.bots_used[bot.space_id] = time.time()
+            self.evict_bots(keep=bot.space_id)
 
         return bot
 
+    def evict_bots(self, keep=None):
+        """
+        Removes bots that are idle, or in excess
+
+        :param keep: the id of a bot that should not be evicted
+        :type keep: str
+
+        Bots are kept in memory in the order of their last use. The number of
+        bots is limited by the parameter ``bots.size`` in the context, and
+        bots are evicted after ``bots.idle`` seconds without activity.
+        For example::
+
+            engine.configure_from_dict({
+                'bots.size': 500,
+                'bots.idle': 600,
+            })
+
+        Bots that have a running state machine are not evicted.
+        """
+        size = int(self.context.get('bots.size', self.BOTS_SIZE))
+        idle = float(self.context.get('bots.idle', self.BOTS_IDLE))
+        threshold = time.time() - idle
+
+        excess = len(self.bots) - size
+        for space_id in list(self.bots.keys()):
+            used = self.bots_used.setdefault(space_id, time.time())
+            if excess < 1 and used > threshold:
+                break  # other bots have been used more recently
+
+            if space_id == keep or self.bots[space_id].is_active():
+                continue
+
+            self.evict_bot(space_id)
+            excess -= 1
+
+    def evict_bot(self, space_id):
+        """
+        Removes a bot from memory
+
+        :param space_id: the unique id of the related chat space
+        :type space_id: str
+
+        The state of the bot is archived, and restored transparently
+        when the bot is needed again.
+        """
+        logging.debug(u"Evicting bot {}".format(space_id))
+        bot = self.bots.pop(space_id)
+        self.bots_used.pop(space_id, None)
+
+        self.dispatch('evict', bot=bot)
+        self.archives[space_id] = bot.suspend()
+
     def build_bot(self, id=None, driver=ShellBot):
         """
         Builds a new bot
@@ -725,10 +999,20 @@ class Engine(object):
 
         This function receives an identifier, and returns
         a space bound to it.
+
+        The type of space is sensed from the context on first call, and
+        remembered for subsequent calls, until the engine is configured
+        again.
         """
         logging.debug(u"- building space instance")
         if space_id:
-            space = SpaceFactory.build(context=self.context, ears=self.ears)
+            if self.space_type is None:
+                self.space_type = SpaceFactory.sense(self.context)
+
+            space = SpaceFactory.get(type=self.space_type,
+                                     context=self.context,
+                                     ears=self.ears)
+            space.codec = self.codec
             space.configure()
             space.connect()
             space.use_space(id=space_id)
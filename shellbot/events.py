@@ -17,7 +17,9 @@
 
 import json
 import logging
+import pickle
 from six import string_types
+import yaml
 
 
 class Event(object):
@@ -416,3 +418,119 @@ class Leave(Event):
         """
         return self.__getattr__('space_id')
 
+
+class Codec(object):
+    """
+    Encodes events pushed to the listening queue
+
+    Spaces turn events into some representation that is pushed to the
+    ``ears`` queue, and the listener decodes it back into a dictionary.
+    Both sides use the codec provided by the engine, that is selected
+    with the parameter ``listener.codec`` in the context.
+
+    This codec uses JSON text, as returned by ``str(event)``.
+
+    Example::
+
+        codec = Codec.get('pickle')
+        queue.put(codec.encode(message))
+        ...
+        attributes = codec.decode(queue.get())
+
+    """
+
+    name = 'json'
+
+    @classmethod
+    def get(cls, name='json'):
+        """
+        Loads a codec by name
+
+        :param name: either 'json' or 'pickle'
+        :type name: str
+
+        :return: a codec instance
+
+        A ``ValueError`` is raised if the name is unknown.
+        """
+        for codec in (Codec, PickleCodec):
+            if codec.name == name:
+                return codec()
+
+        raise ValueError(u"Unknown codec {}".format(name))
+
+    def encode(self, event):
+        """
+        Turns an event into a representation for the queue
+
+        :param event: the event to transmit
+        :type event: Event
+
+        :return: the representation of the event
+        """
+        return str(event)
+
+    def decode(self, item):
+        """
+        Turns an item received from the queue into a dictionary
+
+        :param item: the item received
+        :type item: dict, or encoded representation
+
+        :return: the attributes of the event, including its type
+        :rtype: dict
+
+        Dictionaries are passed through. Text is parsed as JSON, or as YAML
+        if this fails, so that events encoded by other codecs can still
+        be handled.
+        """
+        if isinstance(item, dict):
+            return item
+
+        try:
+            return json.loads(item)
+        except ValueError:
+            return yaml.safe_load(item)  # not json, e.g., hand-written input
+
+
+class PickleCodec(Codec):
+    """
+    Encodes events in binary format
+
+    This is much faster than the parsing of text, on both sides of the queue.
+    """
+
+    name = 'pickle'
+
+    PROTOCOL = 2  # can be read by any python version supported by shellbot
+
+    def encode(self, event):
+        """
+        Turns an event into a representation for the queue
+
+        :param event: the event to transmit
+        :type event: Event
+
+        :return: the pickled attributes of the event, including its type
+        :rtype: bytes
+        """
+        with_type = event.attributes.copy()
+        with_type['type'] = event.type
+        return pickle.dumps(with_type, self.PROTOCOL)
+
+    def decode(self, item):
+        """
+        Turns an item received from the queue into a dictionary
+
+        :param item: the item received
+        :type item: dict, or encoded representation
+
+        :return: the attributes of the event, including its type
+        :rtype: dict
+
+        Text that has been encoded by the JSON codec is also accepted.
+        """
+        if isinstance(item, bytes) and item[:1] == b'\x80':  # pickle header
+            return pickle.loads(item)
+
+        return super(PickleCodec, self).decode(item)
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import random
+import threading
+import time
+
+
+class TokenBucket(object):
+    """
+    Limits the rate of some action
+
+    The bucket is refilled continuously at a given rate, up to its capacity.
+    Each action takes one token from the bucket, so that short bursts are
+    accepted while the average rate is enforced.
+
+    Example::
+
+        bucket = TokenBucket(rate=2.0, burst=5)
+        delay = bucket.delay()
+        if delay > 0:
+            time.sleep(delay)
+        bucket.take()
+
+    This class is not thread-safe, and is used behind the lock of a
+    ``Limiter``.
+    """
+
+    def __init__(self, rate, burst=1):
+        """
+        Limits the rate of some action
+
+        :param rate: number of tokens added per second
+        :type rate: float
+
+        :param burst: maximum number of tokens in the bucket
+        :type burst: int
+
+        """
+        assert rate > 0
+        assert burst >= 1
+        self.rate = float(rate)
+        self.burst = burst
+        self.tokens = float(burst)
+        self.stamp = time.time()
+
+    def refill(self, now=None):
+        """
+        Adds tokens for the time elapsed since last refill
+
+        :param now: current time, for test purpose
+        :type now: float
+
+        """
+        now = now if now else time.time()
+        elapsed = max(0.0, now - self.stamp)
+        self.tokens = min(float(self.burst), self.tokens + elapsed * self.rate)
+        self.stamp = now
+
+    def delay(self, now=None):
+        """
+        Computes time to wait before a token is available
+
+        :param now: current time, for test purpose
+        :type now: float
+
+        :return: seconds to wait, or 0.0 if a token can be taken now
+        :rtype: float
+        """
+        self.refill(now)
+        if self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    def take(self):
+        """
+        Takes one token from the bucket
+        """
+        self.tokens -= 1.0
+
+    def is_full(self):
+        """
+        Checks if the bucket has been refilled completely
+
+        :return: True or False
+        :rtype: bool
+        """
+        self.refill()
+        return self.tokens >= self.burst
+
+
+class Limiter(object):
+    """
+    Limits the rate of requests to a back-end API
+
+    Requests are limited globally, and also per target, e.g., per space.
+    When the API asks to slow down, all requests are suspended for the
+    time requested by the API. Failed requests can be retried after
+    an exponential backoff with random jitter.
+
+    Example::
+
+        limiter = Limiter(context=my_context, prefix='spark.limiter')
+
+        attempt = 0
+        while True:
+            limiter.acquire(space_id)
+            try:
+                api.post(...)
+                break
+
+            except Exception:
+                attempt += 1
+                if attempt >= limiter.MAX_ATTEMPTS:
+                    raise
+                time.sleep(limiter.backoff(attempt))
+
+    The limiter reports its activity in the context, with following counters
+    under the prefix: ``waits``, ``postpones``, ``retries`` and ``drops``.
+    The current state is also given by ``state()``.
+
+    The limiter is thread-safe, and it applies to the process where it
+    is used, e.g., the speaker.
+    """
+
+    RATE = 2.0  # requests per second for each target
+
+    BURST = 5  # requests that can be sent at once to a target
+
+    GLOBAL_RATE = 10.0  # requests per second for all targets
+
+    GLOBAL_BURST = 20  # requests that can be sent at once
+
+    BACKOFF_DELAY = 0.5  # first delay before a retry
+
+    BACKOFF_LIMIT = 30.0  # maximum delay between retries
+
+    MAX_ATTEMPTS = 5  # before a request is dropped
+
+    MAX_BUCKETS = 1000  # idle buckets are forgotten beyond this number
+
+    def __init__(self,
+                 rate=None,
+                 burst=None,
+                 global_rate=None,
+                 global_burst=None,
+                 context=None,
+                 prefix='limiter'):
+        """
+        Limits the rate of requests to a back-end API
+
+        :param rate: requests per second for each target
+        :type rate: float
+
+        :param burst: requests that can be sent at once to a target
+        :type burst: int
+
+        :param global_rate: requests per second for all targets
+        :type global_rate: float
+
+        :param global_burst: requests that can be sent at once
+        :type global_burst: int
+
+        :param context: where activity of the limiter is reported
+        :type context: Context
+
+        :param prefix: the name of counters in the context
+        :type prefix: str
+
+        """
+        self.rate = rate if rate else self.RATE
+        self.burst = burst if burst else self.BURST
+
+        self.bucket = TokenBucket(
+            rate=global_rate if global_rate else self.GLOBAL_RATE,
+            burst=global_burst if global_burst else self.GLOBAL_BURST)
+        self.buckets = {}
+
+        self.context = context
+        self.prefix = prefix
+
+        self.suspended_until = 0.0
+        self.lock = threading.Lock()
+
+    def report(self, name):
+        """
+        Counts some activity of the limiter
+
+        :param name: the counter to increment, e.g., 'waits'
+        :type name: str
+
+        """
+        if self.context is not None:
+            self.context.increment(self.prefix + '.' + name)
+
+    def get_bucket(self, key):
+        """
+        Provides the bucket of a target
+
+        :param key: the target of requests, e.g., a space id
+        :type key: str
+
+        :return: the bucket of this target
+        :rtype: TokenBucket
+
+        The lock of the limiter has to be acquired by the caller.
+        """
+        bucket = self.buckets.get(key)
+        if bucket is None:
+
+            if len(self.buckets) >= self.MAX_BUCKETS:
+                for idle in [x for x in self.buckets.keys()
+                             if self.buckets[x].is_full()]:
+                    del self.buckets[idle]
+
+            bucket = TokenBucket(rate=self.rate, burst=self.burst)
+            self.buckets[key] = bucket
+
+        return bucket
+
+    def acquire(self, key=None):
+        """
+        Waits until a request can be sent
+
+        :param key: the target of the request, e.g., a space id
+        :type key: str
+
+        :return: the time spent waiting, in seconds
+        :rtype: float
+
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.time()
+                bucket = self.get_bucket(key)
+                delay = max(self.suspended_until - now,
+                            self.bucket.delay(now),
+                            bucket.delay(now))
+
+                if delay <= 0:
+                    self.bucket.take()
+                    bucket.take()
+                    return waited
+
+            if not waited:
+                logging.debug(u"- throttling for {:.3f} seconds".format(delay))
+                self.report('waits')
+
+            time.sleep(delay)
+            waited += delay
+
+    def postpone(self, delay):
+        """
+        Suspends all requests
+
+        :param delay: seconds to wait, e.g., value of Retry-After
+        :type delay: float
+
+        """
+        logging.warning(u"Suspending requests for {} seconds".format(delay))
+        with self.lock:
+            self.suspended_until = max(self.suspended_until,
+                                       time.time() + float(delay))
+        self.report('postpones')
+
+    def backoff(self, attempt):
+        """
+        Computes the delay before a retry
+
+        :param attempt: the number of attempts made so far
+        :type attempt: int
+
+        :return: seconds to wait
+        :rtype: float
+
+        The delay doubles on each attempt, and half of it is random, so that
+        multiple clients do not retry at the same time.
+        """
+        delay = min(self.BACKOFF_LIMIT,
+                    self.BACKOFF_DELAY * (2 ** max(0, attempt - 1)))
+        self.report('retries')
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def drop(self):
+        """
+        Records that a request has been abandoned
+        """
+        self.report('drops')
+
+    def state(self):
+        """
+        Describes the current state of the limiter
+
+        :return: the tokens available globally, the number of targets,
+            and the remaining time of suspension
+        :rtype: dict
+
+        """
+        with self.lock:
+            self.bucket.refill()
+            return {
+                'tokens': self.bucket.tokens,
+                'targets': len(self.buckets),
+                'suspended': max(0.0, self.suspended_until - time.time()),
+            }
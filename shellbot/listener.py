@@ -18,20 +18,17 @@
 import json
 import logging
 from multiprocessing import Process
-from six import string_types
 import time
-import yaml
 
+from .consumer import Consumer
 from .events import Event, Message, Attachment, Join, Leave
 
 
-class Listener(object):
+class Listener(Consumer):
     """
     Handles messages received from chat space
     """
 
-    EMPTY_DELAY = 0.005   # time to wait if queue is empty
-
     FRESH_DURATION = 0.5  # maximum amount of time for listener detection
 
     def __init__(self, engine=None, filter=None):
@@ -83,7 +80,7 @@ class Listener(object):
         Continuously receives updates
 
         This function is looping on items received from the queue, and
-        is handling them one by one in the background.
+        is handling them in batches in the background.
 
         Processing should be handled in a separate background process, like
         in the following example::
@@ -106,21 +103,7 @@ class Listener(object):
 
         try:
             self.engine.set('listener.counter', 0)
-            while self.engine.get('general.switch', 'on') == 'on':
-
-                if self.engine.ears.empty():
-                    time.sleep(self.EMPTY_DELAY)
-                    continue
-
-                try:
-                    item = self.engine.ears.get_nowait()
-                    if item is None:
-                        break
-
-                    self.process(item)
-
-                except Exception as feedback:
-                    logging.exception(feedback)
+            self.consume(self.engine.ears, self.process)
 
         except KeyboardInterrupt:
             pass
@@ -132,7 +115,7 @@ class Listener(object):
         Processes items received from the chat space
 
         :param item: the item received
-        :type item: dict or json-encoded string
+        :type item: dict, or a representation encoded by the engine codec
 
         This function dispatches items based on their type. The type is
         a key of the provided dict.
@@ -160,8 +143,7 @@ class Listener(object):
         logging.debug(u'Listener is working on {}'.format(counter))
 
         try:
-            if isinstance(item, string_types):
-                item = yaml.safe_load(item)  # better unicode than json.loads()
+            item = self.engine.codec.decode(item)
 
             assert isinstance(item, dict)  # low-level event representation
 
@@ -17,10 +17,11 @@
 
 from collections import defaultdict
 import logging
-from multiprocessing import Manager, Lock, Process, Queue
-import signal
+from multiprocessing import Lock, Process, Queue
 import time
 
+from shellbot.state import State as SharedState
+
 
 class Machine(object):
     """
@@ -112,13 +113,11 @@ class Machine(object):
 
         self.lock = Lock()
 
-        # prevent Manager() process to be interrupted
-        handler = signal.signal(signal.SIGINT, signal.SIG_IGN)
-
-        self.mutables = Manager().dict()
+        self.mutables = SharedState.dict(shared=True)  # machine can be ran apart
 
-        # restore current handler for the rest of the program
-        signal.signal(signal.SIGINT, handler)
+        store = getattr(bot, 'store', None)
+        if store is not None:
+            store.share()  # bot is updated from the machine process
 
         self.mixer = Queue()
 
@@ -496,7 +495,10 @@ class Machine(object):
                     if self.mixer.empty():
 #                        logging.debug(u"Clocking the machine")
                         self.step(event='tick')
-                        time.sleep(self.TICK_DURATION)
+                        self.bot.engine.context.watch('general.switch',
+                                                      'on',
+                                                      self.TICK_DURATION,
+                                                      default='on')
                         continue
 
                     item = self.mixer.get(True, self.TICK_DURATION)
@@ -403,7 +403,10 @@ class Input(Machine):
                     if self.bot.fan.empty():
                         label = 'fan.' + self.bot.space_id
                         self.bot.engine.set(label, time.time())
-                        time.sleep(self.TICK_DURATION)
+                        self.bot.engine.context.watch('general.switch',
+                                                      'on',
+                                                      self.TICK_DURATION,
+                                                      default='on')
                         continue
 
                     item = self.bot.fan.get(True, self.TICK_DURATION)
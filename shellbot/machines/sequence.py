@@ -17,10 +17,11 @@
 
 from collections import defaultdict
 import logging
-from multiprocessing import Manager, Lock, Process, Queue
-import signal
+from multiprocessing import Lock, Process, Queue
 import time
 
+from shellbot.state import State as SharedState
+
 
 class Sequence(object):
     """
@@ -53,13 +54,7 @@ class Sequence(object):
 
         self.lock = Lock()
 
-        # prevent Manager() process to be interrupted
-        handler = signal.signal(signal.SIGINT, signal.SIG_IGN)
-
-        self.mutables = Manager().dict()
-
-        # restore current handler for the rest of the program
-        signal.signal(signal.SIGINT, handler)
+        self.mutables = SharedState.dict(shared=True)  # machines can be ran apart
 
         self.on_init(**kwargs)
 
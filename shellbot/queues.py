@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import ctypes
+import logging
+from multiprocessing import Condition
+from multiprocessing.sharedctypes import RawValue
+from six.moves.queue import Empty
+
+
+class BoundedQueue(object):
+    """
+    Limits the number of items waiting in a queue
+
+    This wraps a ``multiprocessing.Queue`` or a ``Spool``, and counts items
+    that are waiting in it. When the maximum size is reached, new items are
+    handled according to the overflow policy:
+
+    - ``block`` - wait until some item is consumed, this is the default
+    - ``drop_oldest`` - remove the oldest item to make room for the new one
+    - ``drop_newest`` - discard the new item
+    - ``reply`` - discard the new item, and let the engine tell the chat
+      space to try again later
+
+    Example::
+
+        queue = BoundedQueue(Queue(), name='inbox', size=100,
+                             overflow='drop_newest')
+        if queue.put(item) is False:
+            logging.warning(u"Dropped")
+
+    The number of items waiting, and the number of items dropped, are
+    shared across processes, and given by ``gauges()``.
+    """
+
+    POLICIES = ('block', 'drop_oldest', 'drop_newest', 'reply')
+
+    OLDEST_TIMEOUT = 0.1  # time to get the oldest item, if any
+
+    def __init__(self, queue, name='queue', size=0, overflow=None,
+                 on_drop=None):
+        """
+        Limits the number of items waiting in a queue
+
+        :param queue: the underlying queue
+        :type queue: Queue or Spool
+
+        :param name: the name of the queue, for reporting
+        :type name: str
+
+        :param size: maximum number of items, or 0 for no limit
+        :type size: int
+
+        :param overflow: what to do when the queue is full
+        :type overflow: str
+
+        :param on_drop: a function called with each item that is dropped
+        :type on_drop: callable
+
+        """
+        overflow = overflow if overflow else 'block'
+        if overflow not in self.POLICIES:
+            raise ValueError(u"Unknown overflow policy {}".format(overflow))
+
+        self.queue = queue
+        self.name = name
+        self.size = int(size) if size else 0
+        self.overflow = overflow
+        self.on_drop = on_drop
+
+        self.changed = Condition()
+        self.depth = RawValue(ctypes.c_long, 0)
+        self.dropped = RawValue(ctypes.c_long, 0)
+
+        if hasattr(queue, 'ack'):  # items spooled before a restart
+            self.depth.value = queue.qsize()
+
+    def put(self, item, block=True, timeout=None):
+        """
+        Appends an item to the queue
+
+        :param item: the item to be queued
+
+        :return: False if the item has been dropped, else True
+        :rtype: bool
+
+        Parameters ``block`` and ``timeout`` are accepted for compatibility
+        with ``multiprocessing.Queue``. The overflow policy applies when
+        the queue is full.
+        """
+        with self.changed:
+            if not self.size or self.depth.value < self.size:
+                self.depth.value += 1
+                self.queue.put(item)
+                return True
+
+            if self.overflow == 'block':
+                while self.depth.value >= self.size:
+                    self.changed.wait()
+                self.depth.value += 1
+                self.queue.put(item)
+                return True
+
+            if self.overflow == 'drop_oldest':
+                try:
+                    oldest = self.queue.get(True, self.OLDEST_TIMEOUT)
+                    if hasattr(self.queue, 'ack'):
+                        self.queue.ack()
+                    self.queue.put(item)
+                    item = oldest
+
+                except Empty:  # oldest item is being consumed
+                    pass
+
+            self.dropped.value += 1
+
+        logging.debug(u"- {} is full, dropping an item".format(self.name))
+        if self.on_drop:
+            self.on_drop(item)
+        return False
+
+    def put_nowait(self, item):
+        """
+        Appends an item to the queue
+        """
+        return self.put(item, block=False)
+
+    def get(self, block=True, timeout=None):
+        """
+        Gets the oldest item of the queue
+
+        :param block: wait for an item if the queue is empty
+        :type block: bool
+
+        :param timeout: maximum time to wait, in seconds, or None
+        :type timeout: float
+
+        :return: the item
+
+        An exception ``Empty`` is raised if no item is available.
+        """
+        item = self.queue.get(block, timeout)
+
+        with self.changed:
+            self.depth.value -= 1
+            self.changed.notify()
+
+        return item
+
+    def get_nowait(self):
+        """
+        Gets the oldest item of the queue, without waiting
+        """
+        return self.get(block=False)
+
+    def ack(self, count=1):
+        """
+        Acknowledges items that have been processed
+
+        :param count: the number of items to acknowledge
+        :type count: int
+
+        This has no effect if the underlying queue does not support
+        acknowledgement.
+        """
+        if hasattr(self.queue, 'ack'):
+            self.queue.ack(count)
+
+    def qsize(self):
+        """
+        Counts items that are waiting
+
+        :return: the number of items waiting in the queue
+        :rtype: int
+        """
+        return self.depth.value
+
+    def empty(self):
+        """
+        Checks if the queue is empty
+
+        :return: True or False
+        :rtype: bool
+        """
+        return self.depth.value < 1
+
+    def gauges(self):
+        """
+        Reports on the activity of the queue
+
+        :return: the number of items waiting, and of items dropped
+        :rtype: dict
+
+        Example::
+
+            >>>queue.gauges()
+            {'inbox.depth': 3, 'inbox.dropped': 0}
+
+        """
+        return {
+            self.name + '.depth': self.depth.value,
+            self.name + '.dropped': self.dropped.value,
+        }
@@ -0,0 +1,487 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from contextlib import contextmanager
+import copy
+import ctypes
+from multiprocessing import RLock
+from multiprocessing.sharedctypes import RawArray, RawValue
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+
+
+class SharedDict(object):
+    """
+    Shares a dictionary across processes through shared memory
+
+    Keys are spread over a fixed number of shards. Each shard is a segment
+    of shared memory that contains a pickled dictionary, plus a sequence
+    number and a lock.
+
+    Reads are lock-free. Each process keeps a decoded copy of every shard,
+    and the copy is used for as long as the sequence number of the shard
+    does not change. Therefore, reading a stable key costs a comparison of
+    integers and a dictionary lookup, without any inter-process communication.
+
+    Writes are serialized per shard, so that updates of unrelated keys do not
+    contend on the same lock. The sequence number is odd while a shard is
+    being written, and readers retry until they get a consistent copy.
+
+    Example::
+
+        values = SharedDict()
+        values['general.switch'] = 'on'
+
+        ...
+
+        # in another process
+        if values.get('general.switch') == 'on':
+            ...
+
+    Shared memory has to be allocated before processes are forked, and
+    it cannot grow afterwards. A ``ValueError`` is raised when a shard
+    is full.
+    """
+
+    SHARDS = 8  # number of independent segments
+
+    SHARD_SIZE = 65536  # bytes of shared memory per segment
+
+    HEADER = struct.Struct('!I')  # length of the pickled content
+
+    def __init__(self, shards=None, size=None):
+        """
+        Shares a dictionary across processes through shared memory
+
+        :param shards: number of independent segments
+        :type shards: int
+
+        :param size: bytes of shared memory per segment
+        :type size: int
+
+        """
+        self.shards = shards if shards else self.SHARDS
+        assert self.shards > 0
+
+        self.size = size if size else self.SHARD_SIZE
+        assert self.size > self.HEADER.size
+
+        self._buffers = []
+        self._sequences = []
+        self._locks = []
+        for index in range(self.shards):
+            buffer = RawArray(ctypes.c_char, self.size)  # zeroed = empty dict
+            self._buffers.append(buffer)
+            self._sequences.append(RawValue(ctypes.c_ulong, 0))
+            self._locks.append(RLock())
+
+        self._cache = [(0, {}) for index in range(self.shards)]
+
+    def shard(self, key):
+        """
+        Locates the shard of a key
+
+        :param key: name of the value
+        :type key: str
+
+        :return: the index of the shard
+        :rtype: int
+
+        The hash is stable across processes, whatever the hash seed of
+        the interpreter.
+        """
+        if not isinstance(key, bytes):
+            key = key.encode('utf-8')
+        return zlib.crc32(key) % self.shards
+
+    def lock_for(self, key):
+        """
+        Provides the lock that protects one key
+
+        :param key: name of the value
+        :type key: str
+
+        :return: a re-entrant lock shared across processes
+
+        Use this lock to make a read-modify-write sequence atomic. Other
+        keys stored in other shards are not blocked.
+
+        Example::
+
+            with values.lock_for('gauge'):
+                values['gauge'] = values.get('gauge', 0) + 1
+
+        """
+        return self._locks[self.shard(key)]
+
+    @contextmanager
+    def locked(self):
+        """
+        Locks all shards
+
+        Use this to make a sequence of changes across multiple keys atomic.
+        Shards are always locked in the same order, and locks are
+        re-entrant, so that changes can be made within the block.
+
+        Example::
+
+            with values.locked():
+                values['a'] = values.get('b')
+                values['b'] = None
+
+        """
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            yield self
+        finally:
+            for lock in reversed(self._locks):
+                lock.release()
+
+    def _load(self, index):
+        """
+        Gets a consistent copy of one shard
+
+        :param index: the target shard
+        :type index: int
+
+        :return: the dictionary stored in the shard
+        :rtype: dict
+
+        This function does not lock anything. If a writer is active, or if
+        the shard has been changed while being copied, then the copy is
+        attempted again.
+        """
+        sequence = self._sequences[index]
+        while True:
+            start = sequence.value
+
+            (cached, values) = self._cache[index]
+            if cached == start:
+                return values
+
+            if start % 2:  # a writer is active
+                time.sleep(0)
+                continue
+
+            buffer = self._buffers[index]
+            (length,) = self.HEADER.unpack(buffer[:self.HEADER.size])
+            data = buffer[self.HEADER.size:self.HEADER.size+length]
+
+            if sequence.value != start:  # changed while being copied
+                continue
+
+            values = pickle.loads(data) if length else {}
+            self._cache[index] = (start, values)
+            return values
+
+    def _save(self, index, values):
+        """
+        Writes one shard
+
+        :param index: the target shard
+        :type index: int
+
+        :param values: the new content of the shard
+        :type values: dict
+
+        The lock of the shard has to be acquired by the caller.
+        """
+        data = pickle.dumps(values, protocol=2)
+        if self.HEADER.size + len(data) > self.size:
+            raise ValueError(u"Shared memory is full ({} bytes)".format(
+                self.size))
+
+        sequence = self._sequences[index]
+        buffer = self._buffers[index]
+
+        sequence.value += 1  # odd, readers will wait
+        buffer[:self.HEADER.size] = self.HEADER.pack(len(data))
+        buffer[self.HEADER.size:self.HEADER.size+len(data)] = data
+        sequence.value += 1  # even, shard is consistent again
+
+        self._cache[index] = (sequence.value, values)
+
+    def get(self, key, default=None):
+        """
+        Retrieves the value of one key
+
+        :param key: name of the value
+        :type key: str
+
+        :param default: default value
+        :type default: any serializable type is accepted
+
+        :return: the actual value, or the default value
+
+        Mutable values are copied, so that changes made by the caller
+        are not reflected in the cache of this process.
+        """
+        value = self._load(self.shard(key)).get(key, default)
+        if isinstance(value, (list, dict, set)):
+            return copy.deepcopy(value)
+        return value
+
+    def __getitem__(self, key):
+        value = self._load(self.shard(key))[key]
+        if isinstance(value, (list, dict, set)):
+            return copy.deepcopy(value)
+        return value
+
+    def __setitem__(self, key, value):
+        index = self.shard(key)
+        with self._locks[index]:
+            values = dict(self._load(index))
+            values[key] = value
+            self._save(index, values)
+
+    def __delitem__(self, key):
+        index = self.shard(key)
+        with self._locks[index]:
+            values = dict(self._load(index))
+            del values[key]
+            self._save(index, values)
+
+    def __contains__(self, key):
+        return key in self._load(self.shard(key))
+
+    def __len__(self):
+        return sum([len(self._load(index)) for index in range(self.shards)])
+
+    def keys(self):
+        """
+        Lists keys of all shards
+
+        :return: names of values
+        :rtype: list of str
+        """
+        keys = []
+        for index in range(self.shards):
+            keys.extend(self._load(index).keys())
+        return keys
+
+    def copy(self):
+        """
+        Copies all shards
+
+        :return: a snapshot of all values
+        :rtype: dict
+
+        Values can be changed in the snapshot without side effect.
+        """
+        snapshot = {}
+        for index in range(self.shards):
+            snapshot.update(self._load(index))
+        return copy.deepcopy(snapshot)
+
+    def update(self, values):
+        """
+        Changes multiple keys
+
+        :param values: new values
+        :type values: dict
+
+        Each shard is locked and written only once.
+        """
+        spread = {}
+        for key in values.keys():
+            spread.setdefault(self.shard(key), {})[key] = values[key]
+
+        for index in sorted(spread.keys()):
+            with self._locks[index]:
+                updated = dict(self._load(index))
+                updated.update(spread[index])
+                self._save(index, updated)
+
+    def clear(self):
+        """
+        Removes all keys
+        """
+        for index in range(self.shards):
+            with self._locks[index]:
+                self._save(index, {})
+
+
+class SharedCounters(object):
+    """
+    Counts events across processes through shared memory
+
+    Each process gets its own slot of counters in shared memory, and
+    increments it without any inter-process lock. The value of a counter is
+    the sum of the slots of all processes.
+
+    Example::
+
+        counters = SharedCounters(names=['listener.counter'])
+
+        ...
+
+        # in multiple processes
+        counters.increment('listener.counter')
+
+        ...
+
+        # anywhere
+        total = counters.get('listener.counter')
+
+    Names of counters have to be known before processes are forked. If more
+    processes than slots are incrementing counters, the extra processes
+    share a common slot protected by a lock.
+    """
+
+    SLOTS = 32  # number of processes that can count without locking
+
+    def __init__(self, names=(), slots=None):
+        """
+        Counts events across processes through shared memory
+
+        :param names: the names of counters
+        :type names: list of str
+
+        :param slots: number of processes that can count without locking
+        :type slots: int
+
+        """
+        self.names = {}
+        for name in names:
+            self.names.setdefault(name, len(self.names))
+
+        self.slots = slots if slots else self.SLOTS
+        assert self.slots > 1
+
+        # slot 0 is shared by processes that could not get their own slot
+        self._values = RawArray(ctypes.c_longlong,
+                                self.slots * max(1, len(self.names)))
+        self._next = RawValue(ctypes.c_int, 1)
+        self._lock = RLock()
+
+        self._pid = None
+        self._slot = None
+        self._local = None  # created in each process
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def __getstate__(self):
+        """
+        Leaves the slot of this process out of pickled state
+
+        This is required to pass counters to processes that are spawned,
+        since a thread lock cannot be pickled.
+        """
+        state = self.__dict__.copy()
+        state['_pid'] = None
+        state['_slot'] = None
+        state['_local'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def _get_slot(self):
+        """
+        Provides the slot of this process
+
+        :return: the index of the slot, or 0 if no slot is available
+        :rtype: int
+
+        A slot is claimed on first use in each process.
+        """
+        pid = os.getpid()
+        if self._pid != pid:  # first use, or inherited from a parent process
+            with self._lock:
+                if self._next.value < self.slots:
+                    self._slot = self._next.value
+                    self._next.value += 1
+                else:
+                    self._slot = 0
+
+            self._local = threading.Lock()
+            self._pid = pid
+
+        return self._slot
+
+    def increment(self, name, delta=1):
+        """
+        Increments a counter
+
+        :param name: name of the counter
+        :type name: str
+
+        :param delta: increment to apply
+        :type delta: int
+
+        A ``KeyError`` is raised if the counter is unknown.
+        """
+        column = self.names[name]
+        slot = self._get_slot()
+        index = slot * len(self.names) + column
+
+        if slot:
+            with self._local:  # threads of this process
+                self._values[index] += delta
+
+        else:
+            with self._lock:
+                self._values[index] += delta
+
+    def get(self, name):
+        """
+        Retrieves the value of a counter
+
+        :param name: name of the counter
+        :type name: str
+
+        :return: the sum of the slots of all processes
+        :rtype: int
+
+        A ``KeyError`` is raised if the counter is unknown.
+        """
+        column = self.names[name]
+        width = len(self.names)
+        return sum(self._values[column::width])
+
+    def set(self, name, value=0):
+        """
+        Changes the value of a counter
+
+        :param name: name of the counter
+        :type name: str
+
+        :param value: new value
+        :type value: int
+
+        All slots are reset, and the value is put in the common slot.
+        Increments made at the same time by other processes may be lost.
+        """
+        column = self.names[name]
+        width = len(self.names)
+        with self._lock:
+            for slot in range(self.slots):
+                self._values[slot * width + column] = 0
+            self._values[column] = value
+
+    def clear(self):
+        """
+        Resets all counters
+        """
+        for name in self.names.keys():
+            self.set(name, 0)
@@ -257,12 +257,12 @@ class Shell(object):
                     self.verb = verb
                     command.execute(bot, arguments)
                 else:
-                    if not self.engine.get('worker.busy', False):
+                    worker = self.engine.get_worker(space_id)
+                    if not worker.is_busy():
                         bot.say(u"Ok, working on it")
                     else:
                         bot.say(u"Ok, will work on it as soon as possible")
-                    self.engine.inbox.put(
-                        (command.keyword, arguments, space_id))
+                    worker.push((command.keyword, arguments, space_id))
 
             elif '*default' in self._commands.keys():
                 command = self._commands['*default']
@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import logging
+import os
+import re
+from six.moves import queue
+import tempfile
+import threading
+
+
+class Downloader(object):
+    """
+    Downloads documents shared in chat spaces
+
+    Each document is fetched with a single request, and streamed to disk by
+    chunks. Connections are kept alive across downloads.
+
+    Downloaded files are kept in a local cache, so that a document
+    shared multiple times is fetched only once. The cache is indexed by URL,
+    and files with the same content are stored only once. When the cache
+    exceeds its maximum size, least recently used files are removed.
+
+    Example::
+
+        downloader = Downloader(directory='/var/cache/shellbot')
+
+        path = downloader.download(url, headers={'Authorization': token})
+
+        # or, in the background
+        downloader.submit(url, callback=lambda path: logging.debug(path))
+
+    Downloads submitted in the background are handled by a pool of threads,
+    that is started on first use in each process.
+    """
+
+    CHUNK = 64 * 1024  # bytes written at once
+
+    SIZE = 100 * 1024 * 1024  # maximum size of the cache, in bytes
+
+    WORKERS = 2  # threads that download in the background
+
+    def __init__(self, directory=None, size=None, workers=None, session=None):
+        """
+        Downloads documents shared in chat spaces
+
+        :param directory: where files are cached
+        :type directory: str
+
+        :param size: maximum size of the cache, in bytes
+        :type size: int
+
+        :param workers: number of threads that download in the background
+        :type workers: int
+
+        :param session: an HTTP session, for test purpose
+        :type session: requests.Session
+
+        """
+        self.directory = directory if directory else os.path.join(
+            tempfile.gettempdir(), 'shellbot-attachments')
+        self.size = int(size) if size else self.SIZE
+        self.workers = int(workers) if workers else self.WORKERS
+
+        self.session = session
+        self.urls = {}  # url -> path
+        self.lock = threading.Lock()
+
+        self.tasks = None
+        self.threads = []
+        self._pid = None
+
+    def get_session(self):
+        """
+        Provides an HTTP session
+
+        :return: a session that keeps connections alive
+        :rtype: requests.Session
+
+        """
+        if self.session is None:
+            import requests
+            self.session = requests.Session()
+
+        return self.session
+
+    def download(self, url, headers=None):
+        """
+        Copies a shared document locally
+
+        :param url: the link to the document
+        :type url: str
+
+        :param headers: HTTP headers added to the request, e.g., for
+            authentication
+        :type headers: dict
+
+        :return: the path to the local copy
+        :rtype: str
+
+        An exception is raised if the document cannot be retrieved.
+        """
+        path = self.urls.get(url)
+        if path and os.path.isfile(path):
+            logging.debug(u"- using cached {}".format(path))
+            self.touch(path)
+            return path
+
+        logging.debug(u"- fetching {}".format(url))
+        response = self.get_session().get(url=url,
+                                          headers=headers if headers else {},
+                                          stream=True)
+        temporary = None
+        try:
+            logging.debug(u"- status: {}".format(response.status_code))
+            if response.status_code != 200:
+                raise Exception(u"Unable to download attachment")
+
+            name = self.name(response.headers)
+
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+
+            digest = hashlib.sha1()
+            (handle, temporary) = tempfile.mkstemp(dir=self.directory,
+                                                   suffix='.part')
+            with os.fdopen(handle, 'wb') as stream:
+                for chunk in response.iter_content(chunk_size=self.CHUNK):
+                    if chunk:
+                        digest.update(chunk)
+                        stream.write(chunk)
+
+        except Exception:
+            if temporary:
+                os.remove(temporary)
+            raise
+
+        finally:
+            response.close()
+
+        folder = os.path.join(self.directory, digest.hexdigest()[:16])
+        path = os.path.join(folder, name)
+        with self.lock:
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+
+            if os.path.isfile(path):  # same content has been fetched already
+                os.remove(temporary)
+                self.touch(path)
+            else:
+                os.rename(temporary, path)
+
+            self.urls[url] = path
+
+        logging.debug(u"- written to {}".format(path))
+        self.evict(keep=path)
+        return path
+
+    def name(self, headers):
+        """
+        Names a document from response headers
+
+        :param headers: headers of the HTTP response
+        :type headers: dict
+
+        :return: the name of the document, or 'downloadable'
+        :rtype: str
+
+        """
+        line = headers.get('Content-Disposition', '')
+        match = re.search('filename=(.+)', line)
+        if match:
+            name = match.group(1).strip()
+            if name.startswith('"') and name.endswith('"'):
+                name = name[1:-1]
+            name = os.path.basename(name)
+            if name not in ('', '.', '..'):
+                return name
+
+        return 'downloadable'
+
+    def touch(self, path):
+        """
+        Marks a cached file as recently used
+
+        :param path: the path to the file
+        :type path: str
+
+        """
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    def evict(self, keep=None):
+        """
+        Removes least recently used files when the cache is too large
+
+        :param keep: a file that should not be removed
+        :type keep: str
+
+        :return: the number of files removed
+        :rtype: int
+
+        """
+        files = []
+        total = 0
+        for folder, names, filenames in os.walk(self.directory):
+            for name in filenames:
+                if name.endswith('.part'):  # download in progress
+                    continue
+
+                path = os.path.join(folder, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        count = 0
+        for stamp, size, path in sorted(files):
+            if total <= self.size:
+                break
+
+            if path == keep:
+                continue
+
+            logging.debug(u"- evicting {}".format(path))
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+
+            try:
+                os.rmdir(os.path.dirname(path))  # if empty
+            except OSError:
+                pass
+
+            total -= size
+            count += 1
+
+        return count
+
+    def submit(self, url, callback, headers=None):
+        """
+        Downloads a document in the background
+
+        :param url: the link to the document
+        :type url: str
+
+        :param callback: a function called with the path of the local copy
+        :type callback: callable
+
+        :param headers: HTTP headers added to the request
+        :type headers: dict
+
+        """
+        with self.lock:
+            if self._pid != os.getpid():  # threads are not forked
+                self.start()
+
+        self.tasks.put((url, callback, headers))
+
+    def start(self):
+        """
+        Starts threads that download in the background
+        """
+        logging.debug(u"- starting {} downloading threads".format(
+            self.workers))
+
+        self.tasks = queue.Queue()
+        self.threads = []
+        for index in range(self.workers):
+            thread = threading.Thread(target=self.run)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+        self._pid = os.getpid()
+
+    def stop(self):
+        """
+        Stops threads that download in the background
+
+        Pending downloads are completed before this function returns.
+        """
+        (threads, self.threads) = (self.threads, [])
+        for thread in threads:
+            self.tasks.put(None)
+
+        for thread in threads:
+            thread.join()
+
+        self._pid = None
+
+    def run(self):
+        """
+        Downloads documents in the background
+
+        The loop is broken when ``None`` is received.
+        """
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                break
+
+            (url, callback, headers) = task
+            try:
+                callback(self.download(url, headers=headers))
+
+            except Exception as feedback:
+                logging.error(u"Unable to download attachment")
+                logging.exception(feedback)
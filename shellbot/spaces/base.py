@@ -17,12 +17,15 @@
 
 from bottle import request
 import logging
-from multiprocessing import Process, Queue, Manager
+from multiprocessing import Process, Queue
+from multiprocessing.pool import ThreadPool
 import os
-import signal
 from six import string_types
 import time
 
+from shellbot.events import Codec
+from shellbot.state import State
+
 
 class Space(object):
     """
@@ -92,6 +95,10 @@ class Space(object):
 
     PULL_INTERVAL = 0.05  # time between pulls, when not hooked
 
+    MESSAGE_SIZE = 7000  # maximum number of characters posted at once
+
+    MEMBERSHIP_THREADS = 1  # concurrent requests on bulk membership changes
+
     def __init__(self,
                  context=None,
                  ears=None,
@@ -111,16 +118,11 @@ class Space(object):
                           ears=my_engine.ears)
 
         """
-        # prevent Manager() process to be interrupted
-        handler = signal.signal(signal.SIGINT, signal.SIG_IGN)
-
-        self.values = Manager().dict()
-
-        # restore current handler for the rest of the program
-        signal.signal(signal.SIGINT, handler)
+        self.values = State.dict(shared=True)
 
         self.context = context
         self.ears = ears
+        self.codec = Codec()  # changed by the engine
 
         self.on_init(**kwargs)
 
@@ -447,11 +449,19 @@ class Space(object):
         :param persons: e-mail addresses of persons to add
         :type persons: list of str
 
+        :return: the outcome for each person, i.e., 'added', 'skipped'
+            or 'failed'
+        :rtype: dict
+
+        Persons who are moderators of the space already are skipped.
         """
         logging.info(u"Adding moderators")
-        for person in persons:
-            logging.info(u"- {}".format(person))
-            self.add_moderator(person)
+
+        members = self.list_members()
+        skipped = set(x for x in members if members[x]) if members else ()
+
+        return self.change_members(self.add_moderator, persons,
+                                   label='added', skipped=skipped)
 
     def add_moderator(self, person):
         """
@@ -479,11 +489,19 @@ class Space(object):
         :param persons: e-mail addresses of persons to add
         :type persons: list of str
 
+        :return: the outcome for each person, i.e., 'added', 'skipped'
+            or 'failed'
+        :rtype: dict
+
+        Persons who are members of the space already are skipped.
         """
         logging.info(u"Adding participants")
-        for person in persons:
-            logging.info(u"- {}".format(person))
-            self.add_participant(person)
+
+        members = self.list_members()
+        skipped = set(members.keys()) if members else ()
+
+        return self.change_members(self.add_participant, persons,
+                                   label='added', skipped=skipped)
 
     def add_participant(self, person):
         """
@@ -509,11 +527,96 @@ class Space(object):
         :param persons: e-mail addresses of persons to delete
         :type persons: list of str
 
+        :return: the outcome for each person, i.e., 'removed', 'skipped'
+            or 'failed'
+        :rtype: dict
+
+        Persons who are not members of the space are skipped.
         """
         logging.info(u"Removing participants")
+
+        members = self.list_members()
+        if members is None:
+            skipped = ()
+        else:
+            skipped = set(x.lower() for x in persons if x.lower() not in members)
+
+        return self.change_members(self.remove_participant, persons,
+                                   label='removed', skipped=skipped)
+
+    def list_members(self):
+        """
+        Lists members of the space
+
+        :return: e-mail addresses of members, in lower case, with True for
+            moderators and False for other participants, or None
+        :rtype: dict
+
+        This function is used to skip useless changes on bulk operations.
+        It returns None if members are not known, and should be expanded in
+        sub-class, where members can be listed.
+        """
+        return None
+
+    def change_members(self, function, persons, label, skipped=()):
+        """
+        Applies a membership change to multiple persons
+
+        :param function: the change to apply to each person
+        :type function: callable
+
+        :param persons: e-mail addresses of persons to change
+        :type persons: list of str
+
+        :param label: the outcome of a successful change, e.g., 'added'
+        :type label: str
+
+        :param skipped: e-mail addresses to leave unchanged, in lower case
+        :type skipped: set of str
+
+        :return: the outcome for each person, i.e., the label, 'skipped'
+            or 'failed'
+        :rtype: dict
+
+        Changes are made concurrently, by up to ``membership.threads``
+        threads under the prefix of this space. A change that raises an
+        exception, or that returns False, is reported as failed.
+        """
+        report = {}
+        changed = []
         for person in persons:
+            if person.lower() in skipped:
+                logging.info(u"- {} (skipped)".format(person))
+                report[person] = 'skipped'
+            elif person not in changed:
+                changed.append(person)
+
+        def change(person):
             logging.info(u"- {}".format(person))
-            self.remove_participant(person)
+            try:
+                return function(person) is not False
+
+            except Exception as feedback:
+                logging.warning(u"Unable to change '{}'".format(person))
+                logging.exception(feedback)
+                return False
+
+        threads = int(self.get('membership.threads', self.MEMBERSHIP_THREADS))
+        if threads > 1 and len(changed) > 1:
+            pool = ThreadPool(min(threads, len(changed)))
+            try:
+                outcomes = pool.map(change, changed)
+            finally:
+                pool.close()
+                pool.join()
+
+        else:
+            outcomes = [change(person) for person in changed]
+
+        for person, outcome in zip(changed, outcomes):
+            report[person] = label if outcome else 'failed'
+
+        return report
 
     def remove_participant(self, person):
         """
@@ -698,6 +801,20 @@ class Space(object):
         """
         pass
 
+    def on_stop(self):
+        """
+        Adds processing just before the engine is stopped
+
+        This function should be expanded in sub-class, where necessary.
+
+        Example::
+
+            def on_stop(self):
+                self.flush_pending_updates()
+
+        """
+        pass
+
     def run(self):
         """
         Continuously fetches updates
@@ -735,7 +852,10 @@ class Space(object):
                 try:
                     self.pull()
                     self.context.increment('puller.counter')
-                    time.sleep(self.PULL_INTERVAL)
+                    self.context.watch('general.switch',
+                                       'on',
+                                       self.get_pull_interval(),
+                                       default='on')
 
                 except Exception as feedback:
                     logging.exception(feedback)
@@ -746,6 +866,18 @@ class Space(object):
 
         logging.info(u"Puller has been stopped")
 
+    def get_pull_interval(self):
+        """
+        Provides the time to wait before next pull
+
+        :return: a number of seconds
+        :rtype: float
+
+        This function can be overlaid in sub-class to adapt the interval
+        to the traffic.
+        """
+        return self.PULL_INTERVAL
+
     def pull(self):
         """
         Fetches updates
@@ -22,11 +22,18 @@ import os
 import re
 import requests
 from six import string_types
-import tempfile
+from six.moves import queue
+import threading
 import time
+import weakref
+import zlib
 
 from shellbot.events import Event, Message, Attachment, Join, Leave
+from shellbot.limiter import Limiter
+from shellbot.stores import StoreFactory
+from .attachments import Downloader
 from .base import Space
+from .directory import Directory, RoomCache
 
 
 class SparkSpace(Space):
@@ -69,8 +76,35 @@ class SparkSpace(Space):
 
     If one token is missing, then the other one is used for everything.
 
+    API instances are shared by all spaces of a process that use the
+    same token, so that connections to Cisco Spark are kept alive and
+    reused across rooms. The identity of the bot and of the administrator
+    is also retrieved only once per API instance.
+
     """
 
+    clients = {}  # (pid, factory, token) -> API instance
+
+    identities = weakref.WeakKeyDictionary()  # API instance -> people.me()
+
+    directories = {}  # token -> Directory of rooms
+
+    FETCH_QUEUE = 1000  # notifications waiting for each fetcher thread
+
+    DRAIN_DELAY = 5.0  # maximum time to handle pending notifications on stop
+
+    PULL_PAGE = 10  # messages listed at once
+
+    PULL_LIMIT = 1000  # messages read from one room to catch up
+
+    PULL_MIN = 0.5  # time between pulls, when busy
+
+    PULL_MAX = 10.0  # time between pulls, when idle
+
+    MEMBERSHIP_THREADS = 4  # concurrent requests on bulk membership changes
+
+    MEMBERS_TTL = 60  # seconds before members of the room are listed again
+
     def on_init(self,
                 prefix='spark',
                 token=None,
@@ -106,6 +140,13 @@ class SparkSpace(Space):
 
         self.api = None
         self.personal_api = None
+        self.limiter = None
+        self.downloader = None
+        self.cursors = None
+
+        self.fetchers = []
+        self._fetchers_pid = None
+        self._fetchers_lock = threading.Lock()
 
     def on_reset(self):
         """
@@ -120,6 +161,8 @@ class SparkSpace(Space):
         self.personal_token = self.get('personal_token', '')
 
         self._last_message_id = 0
+        self._pull_interval = None
+        self._members = None  # (room id, time stamp, members)
 
     def check(self):
         """
@@ -174,6 +217,36 @@ class SparkSpace(Space):
           If ``spark.personal_token`` is not provided, then the function looks
           for an environment variable ``CISCO_SPARK_TOKEN`` instead.
 
+        * ``spark.limiter.rate`` - messages per second posted to one room,
+          and ``spark.limiter.global_rate`` - messages per second posted
+          to all rooms. See ``get_limiter()``.
+
+        * ``spark.directory.ttl`` - seconds before the list of rooms is
+          loaded again. See ``get_directory()``.
+
+        * ``spark.rooms.ttl`` - seconds before titles of rooms mentioned
+          in membership events are looked up again. See ``describe_room()``.
+
+        * ``spark.attachments.path`` - where shared documents are cached,
+          ``spark.attachments.size`` - maximum size of the cache, in bytes,
+          and ``spark.attachments.workers`` - number of threads that
+          download in the background. See ``get_downloader()``.
+
+        * ``spark.pull.rooms`` - ids of rooms pulled in addition to the
+          bonded room, or ``'*'`` for all rooms of the personal account.
+          ``spark.pull.min`` and ``spark.pull.max`` set the range of
+          the interval between pulls. See ``pull()``.
+
+        * ``spark.reconcile`` - if True, webhooks are updated in place on
+          registration, instead of being deleted and created again.
+          See ``register()``.
+
+        * ``spark.membership.threads`` - number of requests made
+          concurrently to add or remove multiple persons.
+
+        * ``spark.fetchers`` - number of threads that fetch details of
+          webhook notifications. See ``get_fetchers()``.
+
         If a single value is provided for ``moderators`` or for
         ``participants`` then it is turned automatically to a list.
 
@@ -239,10 +312,10 @@ class SparkSpace(Space):
         try:
             if self.token:
                 logging.debug(u"Loading Cisco Spark API as bot")
-                self.api = factory(access_token=self.token)
+                self.api = self.get_client(factory, self.token)
 
             else:
-                self.api = factory(access_token=self.personal_token)
+                self.api = self.get_client(factory, self.personal_token)
 
         except Exception as feedback:
             logging.error(u"Unable to load Cisco Spark API")
@@ -252,10 +325,11 @@ class SparkSpace(Space):
         try:
             if self.personal_token:
                 logging.debug(u"Loading Cisco Spark API as person")
-                self.personal_api = factory(access_token=self.personal_token)
+                self.personal_api = self.get_client(factory,
+                                                    self.personal_token)
 
             else:
-                self.personal_api = factory(access_token=self.token)
+                self.personal_api = self.get_client(factory, self.token)
 
         except Exception as feedback:
             logging.error(u"Unable to load Cisco Spark API")
@@ -263,6 +337,55 @@ class SparkSpace(Space):
 
         self.on_connect()
 
+    def get_client(self, factory, token):
+        """
+        Provides an API instance for some token
+
+        :param factory: the API factory
+        :type factory: callable
+
+        :param token: the authentication token
+        :type token: str
+
+        :return: an API instance shared by spaces of this process
+
+        Instances are not shared across processes, since connections
+        cannot be used safely by multiple processes.
+        """
+        key = (os.getpid(), factory, token)
+        client = self.clients.get(key)
+        if client is None:
+            client = factory(access_token=token)
+            self.clients[key] = client
+
+        else:
+            logging.debug(u"- reusing API instance")
+
+        return client
+
+    def get_identity(self, api):
+        """
+        Retrieves the person authenticated by an API instance
+
+        :param api: the API instance
+        :type api: object
+
+        :return: the result of ``api.people.me()``
+
+        The identity is remembered, so that the API is called only once.
+        """
+        try:
+            return self.identities[api]
+        except (KeyError, TypeError):
+            pass
+
+        me = api.people.me()
+        try:
+            self.identities[api] = me
+        except TypeError:  # no weak reference to this instance
+            pass
+        return me
+
     def on_connect(self):
         """
         Retrieves attributes of this bot
@@ -278,21 +401,17 @@ class SparkSpace(Space):
             try:
 
                 logging.debug(u"Retrieving bot information")
-                me = self.api.people.me()
+                me = self.get_identity(self.api)
 #                logging.debug(u"- {}".format(str(me)))
 
-                self.context.set('bot.email', str(me.emails[0]))
-                logging.debug(u"- bot email: {}".format(
-                    self.context.get('bot.email')))
-
-                self.context.set('bot.name',
-                             str(me.displayName))
-                logging.debug(u"- bot name: {}".format(
-                    self.context.get('bot.name')))
-
-                self.context.set('bot.id', me.id)
-                logging.debug(u"- bot id: {}".format(
-                    self.context.get('bot.id')))
+                self.context.set_many({
+                    'bot.email': str(me.emails[0]),
+                    'bot.name': str(me.displayName),
+                    'bot.id': me.id,
+                })
+                logging.debug(u"- bot email: {}".format(me.emails[0]))
+                logging.debug(u"- bot name: {}".format(me.displayName))
+                logging.debug(u"- bot id: {}".format(me.id))
 
                 break
 
@@ -311,20 +430,19 @@ class SparkSpace(Space):
         while count:
             try:
                 logging.debug(u"Retrieving admin information")
-                me = self.personal_api.people.me()
+                me = self.get_identity(self.personal_api)
 #                logging.debug(u"- {}".format(str(me)))
 
-                self.context.set('administrator.email', str(me.emails[0]))
+                self.context.set_many({
+                    'administrator.email': str(me.emails[0]),
+                    'administrator.name': str(me.displayName),
+                    'administrator.id': me.id,
+                })
                 logging.debug(u"- administrator email: {}".format(
-                    self.context.get('administrator.email')))
-
-                self.context.set('administrator.name', str(me.displayName))
+                    me.emails[0]))
                 logging.debug(u"- administrator name: {}".format(
-                    self.context.get('administrator.name')))
-
-                self.context.set('administrator.id', me.id)
-                logging.debug(u"- administrator id: {}".format(
-                    self.context.get('administrator.id')))
+                    me.displayName))
+                logging.debug(u"- administrator id: {}".format(me.id))
 
                 break
 
@@ -356,18 +474,20 @@ class SparkSpace(Space):
         logging.info(u"Using Cisco Spark room '{}'".format(id))
 
         assert self.personal_api is not None  # connect() is prerequisite
+        directory = self.get_directory()
         try:
-            for room in self.personal_api.rooms.list():
-                if id == room.id:
-                    logging.info(u"- found it")
-                    self.use_room(room)
-                    return True
+            room = directory.get(id, lister=self.personal_api.rooms.list)
+            if room is None:  # maybe a room created since last listing
+                room = self.personal_api.rooms.get(roomId=id)
+                directory.put(room)
 
-            logging.info(u"- not found")
+            logging.info(u"- found it")
+            self.use_room(room)
+            return True
 
         except Exception as feedback:
-            logging.error(u"Unable to list rooms")
-            logging.exception(feedback)
+            logging.info(u"- not found")
+            logging.debug(feedback)
 
         return False
 
@@ -390,11 +510,12 @@ class SparkSpace(Space):
 
         assert self.personal_api is not None  # connect() is prerequisite
         try:
-            for room in self.personal_api.rooms.list():
-                if title == room.title:
-                    logging.info(u"- found it")
-                    self.use_room(room)
-                    return True
+            room = self.get_directory().lookup(
+                title, lister=self.personal_api.rooms.list)
+            if room is not None:
+                logging.info(u"- found it")
+                self.use_room(room)
+                return True
 
             logging.info(u"- not found")
 
@@ -404,6 +525,84 @@ class SparkSpace(Space):
 
         return False
 
+    def get_directory(self):
+        """
+        Provides the directory of rooms of the personal account
+
+        :return: the directory shared by all spaces that use the same token
+        :rtype: Directory
+
+        The directory is loaded on first use, and loaded again after
+        ``spark.directory.ttl`` seconds. It is updated on room creation and
+        deletion, and on membership events received by webhook. Rooms that
+        are not in the directory are fetched individually from the API.
+        """
+        key = self.personal_token or self.token
+        directory = self.directories.get(key)
+        if directory is None:
+            directory = Directory(ttl=self.get('directory.ttl'))
+            self.directories[key] = directory
+
+        return directory
+
+    def get_room_cache(self):
+        """
+        Provides the cache of room descriptions
+
+        :return: a cache shared by all processes of the bot
+        :rtype: RoomCache
+
+        """
+        return RoomCache(context=self.context,
+                         prefix=self.prefix+'.rooms',
+                         ttl=self.get('rooms.ttl'))
+
+    def describe_room(self, id):
+        """
+        Provides the title and the type of a room
+
+        :param id: the unique id of the room
+        :type id: str
+
+        :return: a dict with keys ``title`` and ``type``
+        :rtype: dict
+
+        The room is looked up only if it is not in the cache already.
+        """
+        cache = self.get_room_cache()
+        info = cache.get(id)
+        if info is None:
+            item = self.personal_api.rooms.get(roomId=id)
+            self.get_directory().put(item)
+            info = {'title': item._json['title'], 'type': item._json['type']}
+            try:
+                cache.put(id, info['title'], info['type'])
+
+            except Exception as feedback:  # e.g., shared memory is full
+                logging.warning(u"Unable to cache room description")
+                logging.exception(feedback)
+
+        return info
+
+    def on_start(self):
+        """
+        Adds processing just before first update reception
+
+        The directory of rooms is loaded in bulk, so that processes started
+        afterwards share it.
+        """
+        self.set('fetchers.stopping', False)  # see on_stop()
+
+        if self.personal_api is None:
+            return
+
+        try:
+            self.get_directory().warm(self.personal_api.rooms.list)
+
+        except Exception as feedback:
+            logging.warning(u"Unable to list rooms")
+            logging.exception(feedback)
+
     def create_space(self, title, ex_team=None, **kwargs):
         """
         Creates a space
@@ -436,6 +635,7 @@ class SparkSpace(Space):
                                                       teamId=teamId)
                 logging.info(u"- done")
 
+                self.get_directory().put(room)
                 self.use_room(room)
                 break
 
@@ -511,6 +711,8 @@ class SparkSpace(Space):
         assert self.personal_api is not None  # connect() is prerequisite
         try:
             self.personal_api.rooms.delete(roomId=self.id)
+            self.get_directory().forget(self.id)
+            self.get_room_cache().forget(self.id)
 
         except Exception as feedback:
             logging.warning(u"Unable to delete room")
@@ -552,6 +754,9 @@ class SparkSpace(Space):
         :param person: e-mail address of the person to add
         :type person: str
 
+        :return: True on success, False otherwise
+        :rtype: bool
+
         """
         try:
             assert self.personal_api is not None  # connect() is prerequisite
@@ -560,10 +765,13 @@ class SparkSpace(Space):
             self.personal_api.memberships.create(roomId=self.id,
                                                  personEmail=person,
                                                  isModerator=True)
+            self.remember_member(person, True)
+            return True
 
         except Exception as feedback:
             logging.warning(u"Unable to add moderator '{}'".format(person))
             logging.exception(feedback)
+            return False
 
     def add_participant(self, person):
         """
@@ -572,6 +780,9 @@ class SparkSpace(Space):
         :param person: e-mail address of the person to add
         :type person: str
 
+        :return: True on success, False otherwise
+        :rtype: bool
+
         """
         try:
             assert self.api is not None  # connect() is prerequisite
@@ -579,10 +790,13 @@ class SparkSpace(Space):
 
             self.api.memberships.create(roomId=self.id,
                                         personEmail=person)
+            self.remember_member(person, False)
+            return True
 
         except Exception as feedback:
             logging.warning(u"Unable to add participant '{}'".format(person))
             logging.exception(feedback)
+            return False
 
     def remove_participant(self, person):
         """
@@ -591,6 +805,9 @@ class SparkSpace(Space):
         :param person: e-mail address of the person to remove
         :type person: str
 
+        :return: True on success, False otherwise
+        :rtype: bool
+
         """
         try:
             assert self.personal_api is not None  # connect() is prerequisite
@@ -598,10 +815,65 @@ class SparkSpace(Space):
 
             self.personal_api.memberships.delete(roomId=self.id,
                                                  personEmail=person)
+            self.remember_member(person, None)
+            return True
 
         except Exception as feedback:
             logging.warning(u"Unable to remove participant '{}'".format(person))
             logging.exception(feedback)
+            return False
+
+    def list_members(self):
+        """
+        Lists members of the Cisco Spark room
+
+        :return: e-mail addresses of members, in lower case, with True for
+            moderators and False for other participants, or None
+        :rtype: dict
+
+        Members are listed once, then kept for ``MEMBERS_TTL`` seconds,
+        and updated on each change made through this space.
+        """
+        if self.id is None or self.personal_api is None:
+            return None
+
+        if (self._members and self._members[0] == self.id
+                and time.time() - self._members[1] < self.MEMBERS_TTL):
+            return dict(self._members[2])
+
+        try:
+            members = {}
+            for item in self.personal_api.memberships.list(roomId=self.id):
+                if item.personEmail:
+                    members[item.personEmail.lower()] = bool(item.isModerator)
+
+        except Exception as feedback:
+            logging.debug(u"Unable to list members")
+            logging.debug(feedback)
+            return None
+
+        self._members = (self.id, time.time(), members)
+        return dict(members)
+
+    def remember_member(self, person, is_moderator):
+        """
+        Updates the list of members after a change
+
+        :param person: e-mail address of the person
+        :type person: str
+
+        :param is_moderator: True or False, or None if the person has left
+        :type is_moderator: bool
+
+        """
+        if not self._members or self._members[0] != self.id:
+            return
+
+        members = self._members[2]
+        if is_moderator is None:
+            members.pop(person.lower(), None)
+        else:
+            members[person.lower()] = is_moderator
 
     def post_message(self,
                      text=None,
@@ -661,11 +933,14 @@ class SparkSpace(Space):
 
         assert self.api is not None  # connect() is prerequisite
 
-        count = 2
-        while count:
+        id = space_id if space_id else self.id
+        files = [file] if file else None
+        limiter = self.get_limiter()
+
+        attempt = 0
+        while True:
+            limiter.acquire(id)
             try:
-                id = space_id if space_id else self.id
-                files = [file] if file else None
                 self.api.messages.create(roomId=id,
                                          text=text,
                                          markdown=content,
@@ -675,10 +950,77 @@ class SparkSpace(Space):
 
             except Exception as feedback:
                 logging.warning(u"Unable to post message")
-                time.sleep(0.1)
-                count -= 1
-                if count == 0:
+                attempt += 1
+
+                delay = self.get_retry_after(feedback)
+                if delay is not None:
+                    limiter.postpone(delay)  # for all rooms
+
+                if attempt >= limiter.MAX_ATTEMPTS:
                     logging.exception(feedback)
+                    limiter.drop()
+                    break
+
+                if delay is None:
+                    time.sleep(limiter.backoff(attempt))
+
+    def get_limiter(self):
+        """
+        Provides the limiter of messages posted by this space
+
+        :return: the limiter shared by all threads of this process
+        :rtype: Limiter
+
+        The limiter is built on first use, with following parameters:
+
+        * ``spark.limiter.rate`` - messages per second posted to one room
+
+        * ``spark.limiter.burst`` - messages that can be posted at once
+          to one room
+
+        * ``spark.limiter.global_rate`` - messages per second posted to
+          all rooms
+
+        * ``spark.limiter.global_burst`` - messages that can be posted at
+          once to all rooms
+
+        Activity of the limiter is counted in the context under
+        ``spark.limiter``, e.g., ``spark.limiter.waits``.
+        """
+        if self.limiter is None:
+            self.limiter = Limiter(
+                rate=self.get('limiter.rate'),
+                burst=self.get('limiter.burst'),
+                global_rate=self.get('limiter.global_rate'),
+                global_burst=self.get('limiter.global_burst'),
+                context=self.context,
+                prefix=self.prefix+'.limiter')
+
+        return self.limiter
+
+    def get_retry_after(self, feedback):
+        """
+        Checks if the API has asked to slow down
+
+        :param feedback: the exception raised by the API
+        :type feedback: Exception
+
+        :return: seconds to wait, or None if this is not a rate limit
+        :rtype: float or None
+
+        """
+        delay = getattr(feedback, 'retry_after', None)
+        if delay is not None:
+            return float(delay)
+
+        response = getattr(feedback, 'response', None)
+        if getattr(response, 'status_code', None) != 429:
+            return None
+
+        try:
+            return max(1.0, float(response.headers.get('Retry-After', 15)))
+        except (TypeError, ValueError):
+            return 15.0
 
     def register(self, hook_url):
         """
@@ -713,9 +1055,17 @@ class SparkSpace(Space):
         registration. This means that only the most recent instance of the bot
         will be notified of new invitations.
 
+        If ``spark.reconcile`` is set, then existing webhooks are compared
+        with the expected ones, and only differences are applied. See
+        ``reconcile()``.
+
         """
         assert hook_url not in (None, '')
 
+        if self.get('reconcile'):
+            self.reconcile(hook_url)
+            return
+
         try:
             logging.debug(u"Purging bot webhooks")
             for webhook in self.api.webhooks.list():
@@ -745,29 +1095,157 @@ class SparkSpace(Space):
 
         try:
 
-            logging.debug(u"- registering 'shellbot-rooms'")
-            self.api.webhooks.create(name='shellbot-rooms',
-                                     targetUrl=hook_url,
-                                     resource='memberships',
-                                     event='all',
-                                     filter='personId='+self.context.get('bot.id'))
-
-            logging.debug(u"- registering 'shellbot-messages'")
-            self.personal_api.webhooks.create(name='shellbot-messages',
-                                              targetUrl=hook_url,
-                                              resource='messages',
-                                              event='created')
-
-            logging.debug(u"- registering 'shellbot-participants'")
-            self.personal_api.webhooks.create(name='shellbot-participants',
-                                              targetUrl=hook_url,
-                                              resource='memberships',
-                                              event='all')
+            for (api, attributes) in self.list_webhooks(hook_url):
+                logging.debug(u"- registering '{}'".format(attributes['name']))
+                api.webhooks.create(**attributes)
 
         except Exception as feedback:
             logging.warning(u"Unable to add webhook")
             logging.exception(feedback)
 
+    def list_webhooks(self, hook_url):
+        """
+        Lists webhooks expected by this space
+
+        :param hook_url: web address to be used by Cisco Spark service
+        :type hook_url: str
+
+        :return: API instances and attributes of webhooks
+        :rtype: list of (api, dict)
+
+        """
+        return [
+            (self.api, {'name': 'shellbot-rooms',
+                        'targetUrl': hook_url,
+                        'resource': 'memberships',
+                        'event': 'all',
+                        'filter': 'personId='+self.context.get('bot.id')}),
+            (self.personal_api, {'name': 'shellbot-messages',
+                                 'targetUrl': hook_url,
+                                 'resource': 'messages',
+                                 'event': 'created'}),
+            (self.personal_api, {'name': 'shellbot-participants',
+                                 'targetUrl': hook_url,
+                                 'resource': 'memberships',
+                                 'event': 'all'}),
+        ]
+
+    def reconcile(self, hook_url):
+        """
+        Registers webhooks, while keeping those already in place
+
+        :param hook_url: web address to be used by Cisco Spark service
+        :type hook_url: str
+
+        :return: the number of webhooks created, updated or deleted
+        :rtype: int
+
+        Existing webhooks are compared with the expected ones, on name,
+        resource, event and filter:
+
+        - a webhook that matches is kept as-is, so that no event is missed
+          while the bot restarts
+        - a webhook that matches, except for its target URL, is updated
+        - other webhooks registered with the bot token, or with the personal
+          token under a name used by shellbot, are deleted
+        - expected webhooks that are missing are created
+
+        """
+        logging.info(u"Reconciling webhooks with Cisco Spark")
+        logging.debug(u"- url: {}".format(hook_url))
+
+        assert self.personal_api is not None  # connect() is prerequisite
+
+        expected = self.list_webhooks(hook_url)
+
+        apis = []
+        for (api, attributes) in expected:
+            if api not in apis:
+                apis.append(api)
+
+        changes = 0
+        for api in apis:
+            if api is self.api:  # bot webhooks are all managed by shellbot
+                managed = None
+            else:
+                managed = ('shellbot-webhook',
+                           'shellbot-messages',
+                           'shellbot-participants')
+
+            try:
+                changes += self.reconcile_api(
+                    api,
+                    [attributes for (x, attributes) in expected if x is api],
+                    managed)
+
+            except Exception as feedback:
+                logging.warning(u"Unable to reconcile webhooks")
+                logging.exception(feedback)
+
+        logging.debug(u"- {} change(s)".format(changes))
+        return changes
+
+    def reconcile_api(self, api, expected, managed=None):
+        """
+        Reconciles webhooks registered with one API instance
+
+        :param api: the API instance to use
+        :type api: CiscoSparkAPI
+
+        :param expected: attributes of expected webhooks
+        :type expected: list of dict
+
+        :param managed: names of webhooks that can be deleted, or None for all
+        :type managed: list of str
+
+        :return: the number of webhooks created, updated or deleted
+        :rtype: int
+
+        """
+        def key(attributes):
+            return (attributes.get('name'),
+                    attributes.get('resource'),
+                    attributes.get('event'),
+                    attributes.get('filter'))
+
+        missing = dict((key(x), x) for x in expected)
+
+        changes = 0
+        for webhook in api.webhooks.list():
+            current = {'name': webhook.name,
+                       'targetUrl': getattr(webhook, 'targetUrl', None),
+                       'resource': getattr(webhook, 'resource', None),
+                       'event': getattr(webhook, 'event', None),
+                       'filter': getattr(webhook, 'filter', None)}
+            active = getattr(webhook, 'status', 'active') == 'active'
+
+            attributes = missing.get(key(current))
+            if attributes and active:
+                del missing[key(current)]
+
+                if current['targetUrl'] != attributes['targetUrl']:
+                    logging.debug(u"- updating '{}'".format(webhook.name))
+                    api.webhooks.update(webhookId=webhook.id,
+                                        name=attributes['name'],
+                                        targetUrl=attributes['targetUrl'])
+                    changes += 1
+
+                else:
+                    logging.debug(u"- keeping '{}'".format(webhook.name))
+
+            elif managed is None or webhook.name in managed:
+                logging.debug(u"- deleting '{}'".format(webhook.name))
+                api.webhooks.delete(webhookId=webhook.id)
+                changes += 1
+
+        for attributes in expected:
+            if key(attributes) in missing:
+                logging.debug(u"- registering '{}'".format(attributes['name']))
+                api.webhooks.create(**attributes)
+                changes += 1
+
+        return changes
+
     def webhook(self, message_id=None):
         """
         Processes the flow of events from Cisco Spark
@@ -801,67 +1279,21 @@ class SparkSpace(Space):
             logging.debug(u'Receiving data from webhook')
 
             if message_id:
-                resource = 'messages'
-                event = 'created'
-                hook = 'injection'
+                self.fetch('messages', 'created', {'id': message_id},
+                           'injection')
+                return "OK"
 
-            else:
-#                logging.debug(u"- {}".format(request.json))
-                resource = request.json['resource']
-                event = request.json['event']
-                data = request.json['data']
-                hook = request.json['name']
-
-            if resource == 'messages' and event == 'created':
-                logging.debug(u"- handling '{}:{}'".format(resource, event))
-
-                if not message_id:
-                    message_id = data['id']
-
-                retries = 2
-                while retries:
-                    try:
-                        item = self.personal_api.messages.get(messageId=message_id)
-                        item._json['hook'] = hook
-                        self.on_message(item._json, self.ears)
-                        break
-                    except Exception:
-                        if retries:
-                            retries -= 1
-                            time.sleep(0.1)
-                            continue
-                        raise
-
-            elif resource == 'memberships' and event == 'created':
-                logging.debug(u"- handling '{}:{}'".format(resource, event))
-
-                item = self.personal_api.rooms.get(roomId=data['roomId'])
-#                logging.debug(u"- {}".format(item._json))
-
-                data['space_title'] = item._json['title']
-                data['space_type'] = item._json['type']
-                data['hook'] = hook
-#                logging.debug(u"- {}".format(data))
-
-                self.on_join(data, self.ears)
-
-            elif resource == 'memberships' and event == 'deleted':
-                logging.debug(u"- handling '{}:{}'".format(resource, event))
-
-                item = self.personal_api.rooms.get(roomId=data['roomId'])
-#                logging.debug(u"- {}".format(item._json))
-
-                data['space_title'] = item._json['title']
-                data['space_type'] = item._json['type']
-                data['hook'] = hook
-#                logging.debug(u"- {}".format(data))
-
-                self.on_leave(data, self.ears)
+#            logging.debug(u"- {}".format(request.json))
+            resource = request.json['resource']
+            event = request.json['event']
+            data = request.json['data']
+            hook = request.json['name']
 
-            else:
-                logging.debug(u"- throwing away {}:{}".format(resource, event))
-                logging.debug(u"- {}".format(data))
+            if self.get_fetchers() and not self.get('fetchers.stopping'):
+                self.dispatch((resource, event, data, hook))
+                return "OK"
 
+            self.fetch(resource, event, data, hook)
             return "OK"
 
         except Exception as feedback:
@@ -869,47 +1301,401 @@ class SparkSpace(Space):
             logging.error(feedback)
             raise
 
+    def fetch(self, resource, event, data, hook):
+        """
+        Fetches details of a webhook notification
+
+        :param resource: the type of resource, e.g., 'messages'
+        :type resource: str
+
+        :param event: the type of event, e.g., 'created'
+        :type event: str
+
+        :param data: the content of the notification
+        :type data: dict
+
+        :param hook: the name of the webhook
+        :type hook: str
+
+        The message, or the room, that is referenced by the notification is
+        retrieved from Cisco Spark, and a normalized event is pushed
+        to the listening queue.
+        """
+        if resource == 'messages' and event == 'created':
+            logging.debug(u"- handling '{}:{}'".format(resource, event))
+
+            message_id = data['id']
+
+            retries = 2
+            while retries:
+                try:
+                    item = self.personal_api.messages.get(messageId=message_id)
+                    item._json['hook'] = hook
+                    self.on_message(item._json, self.ears)
+                    break
+                except Exception:
+                    if retries:
+                        retries -= 1
+                        time.sleep(0.1)
+                        continue
+                    raise
+
+        elif resource == 'memberships' and event == 'created':
+            logging.debug(u"- handling '{}:{}'".format(resource, event))
+
+            info = self.describe_room(data['roomId'])
+
+            data['space_title'] = info['title']
+            data['space_type'] = info['type']
+            data['hook'] = hook
+#            logging.debug(u"- {}".format(data))
+
+            self.on_join(data, self.ears)
+
+        elif resource == 'memberships' and event == 'deleted':
+            logging.debug(u"- handling '{}:{}'".format(resource, event))
+
+            info = self.describe_room(data['roomId'])
+            if data.get('personId') == self.context.get('administrator.id'):
+                self.get_directory().forget(data['roomId'])
+                self.get_room_cache().forget(data['roomId'])
+
+            data['space_title'] = info['title']
+            data['space_type'] = info['type']
+            data['hook'] = hook
+#            logging.debug(u"- {}".format(data))
+
+            self.on_leave(data, self.ears)
+
+        else:
+            logging.debug(u"- throwing away {}:{}".format(resource, event))
+            logging.debug(u"- {}".format(data))
+
+    def get_fetchers(self):
+        """
+        Provides threads that fetch details of webhook notifications
+
+        :return: a list of (queue, thread) tuples, that can be empty
+        :rtype: list
+
+        When the parameter ``spark.fetchers`` is set, the webhook
+        only queues notifications and returns at once, so that Cisco Spark
+        gets a fast answer. Notifications are then handled by a pool of
+        threads, and messages of multiple rooms are fetched in parallel.
+        See ``dispatch()``.
+
+        Threads are started on first use by the process that receives
+        webhook notifications. If the parameter is not set, an empty list
+        is returned and notifications are handled synchronously.
+        """
+        count = int(self.get('fetchers', 0) or 0)
+        if count < 1:
+            return []
+
+        with self._fetchers_lock:
+            if self._fetchers_pid != os.getpid():  # threads are not forked
+                self.start_fetchers(count)
+
+        return self.fetchers
+
+    def start_fetchers(self, count):
+        """
+        Starts threads that fetch details of webhook notifications
+
+        :param count: the number of threads to start
+        :type count: int
+
+        """
+        logging.debug(u"- starting {} fetching threads".format(count))
+
+        self.fetchers = []
+        for index in range(count):
+            lane = queue.Queue(maxsize=self.FETCH_QUEUE)
+            thread = threading.Thread(target=self.run_fetcher, args=(lane,))
+            thread.daemon = True
+            thread.start()
+            self.fetchers.append((lane, thread))
+
+        self._fetchers_pid = os.getpid()
+
+    def dispatch(self, notification):
+        """
+        Passes one notification to the thread in charge of its room
+
+        :param notification: (resource, event, data, hook)
+        :type notification: tuple
+
+        Rooms are spread over threads by hashing their id, so that messages
+        of one room are pushed to the listener in the order of their
+        reception. If the queue of the thread is full, this function waits
+        until some room is available.
+        """
+        room_id = notification[2].get('roomId') or ''
+        if not isinstance(room_id, bytes):
+            room_id = room_id.encode('utf-8')
+
+        (lane, thread) = self.fetchers[zlib.crc32(room_id) % len(self.fetchers)]
+        self.context.increment(self.prefix+'.fetchers.pending')
+        lane.put(notification)
+
+    def stop_fetchers(self):
+        """
+        Stops threads that fetch details of webhook notifications
+
+        Notifications that are pending are handled before this
+        function returns.
+        """
+        with self._fetchers_lock:
+            for (lane, thread) in self.fetchers:
+                lane.put(None)
+
+            for (lane, thread) in self.fetchers:
+                thread.join()
+
+            self.fetchers = []
+            self._fetchers_pid = None
+
+    def run_fetcher(self, lane):
+        """
+        Handles webhook notifications in the background
+
+        :param lane: the queue of notifications handled by this thread
+        :type lane: Queue
+
+        The loop is broken when ``None`` is received.
+        """
+        while True:
+            notification = lane.get()
+            if notification is None:
+                break
+
+            try:
+                self.fetch(*notification)
+
+            except Exception as feedback:
+                logging.error(u"Unable to process webhook event")
+                logging.exception(feedback)
+
+            finally:
+                self.context.decrement(self.prefix+'.fetchers.pending')
+
+    def on_stop(self):
+        """
+        Adds processing just before the engine is stopped
+
+        Webhook notifications have been acknowledged to Cisco Spark already,
+        so the ones that are still queued are fetched before the listener
+        is stopped. New notifications are fetched synchronously from now on.
+
+        Fetcher threads run in the process of the web server, therefore
+        this function waits until they have no pending notification,
+        or until ``DRAIN_DELAY``.
+        """
+        self.set('fetchers.stopping', True)
+
+        self.stop_fetchers()  # if the web server is in this process
+
+        label = self.prefix+'.fetchers.pending'
+        deadline = time.time() + self.DRAIN_DELAY
+        pending = self.context.get(label, 0)
+        while pending > 0:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                logging.warning(u"- {} notifications have not been fetched"
+                                .format(pending))
+                break
+
+            pending = self.context.watch(label, pending, remaining, default=0)
+
     def pull(self):
         """
-        Fetches events from one Cisco Spark room
+        Fetches events from Cisco Spark rooms
+
+        :return: the number of new messages
+        :rtype: int
 
         This function senses most recent items, and pushes them
         to a processing queue.
-        """
 
-        assert self.is_ready
+        The bonded room is pulled, and also rooms listed in ``spark.pull.rooms``.
+        This setting can also be ``'*'``, to pull all rooms of the
+        personal account. For example::
+
+            space.configure({'spark.pull.rooms': ['*id1', '*id2']})
+
+        For each room, the id of the last message received is remembered in
+        a store, so that messages are neither lost nor received twice when
+        the bot is restarted. If the store is persistent, e.g., Sqlite, the
+        cursor survives restarts.
+
+        Messages are listed until the last message received is found,
+        so that large bursts are received entirely. The time between two
+        pulls is reduced when messages are received, and increased
+        when rooms are quiet. See ``get_pull_interval()``.
+        """
 
         logging.info(u'Pulling messages')
         self.context.increment(u'puller.counter')
 
         assert self.api is not None  # connect() is prerequisite
+        count = 0
+        for room_id in self.list_pulled_rooms():
+            count += self.pull_room(room_id)
+
+        minimum = float(self.get('pull.min', self.PULL_MIN))
+        maximum = float(self.get('pull.max', self.PULL_MAX))
+        if count:
+            self._pull_interval = minimum
+        elif self._pull_interval:
+            self._pull_interval = min(maximum, 2.0 * self._pull_interval)
+        else:
+            self._pull_interval = minimum
+
+        return count
+
+    def list_pulled_rooms(self):
+        """
+        Lists rooms covered by pull()
+
+        :return: ids of rooms
+        :rtype: list of str
+
+        """
+        rooms = []
+        if self.id:
+            rooms.append(self.id)
+
+        values = self.get('pull.rooms', [])
+        if values == '*':
+            assert self.personal_api is not None  # connect() is prerequisite
+            directory = self.get_directory()
+            if directory.is_stale():
+                directory.warm(self.personal_api.rooms.list)
+            values = sorted(directory.rooms.keys())
+
+        elif isinstance(values, string_types):
+            values = [values]
+
+        for value in values:
+            if value not in rooms:
+                rooms.append(value)
+
+        assert rooms  # bond() or spark.pull.rooms is prerequisite
+        return rooms
+
+    def pull_room(self, room_id):
+        """
+        Fetches new messages from one Cisco Spark room
+
+        :param room_id: the unique id of the room
+        :type room_id: str
+
+        :return: the number of new messages
+        :rtype: int
+
+        """
+        cursor = self.get_cursor(room_id)
+
         new_items = []
         try:
-            items = self.api.messages.list(roomId=self.id,
+            items = self.api.messages.list(roomId=room_id,
                                            mentionedPeople=['me'],
-                                           max=10)
+                                           max=self.PULL_PAGE)
 
             for item in items:
 
-                if item.id == self._last_message_id:
+                if item.id == cursor:
                     break
 
                 new_items.append(item)
 
+                if not cursor and len(new_items) >= self.PULL_PAGE:
+                    break  # first pull of this room
+
+                if len(new_items) >= self.PULL_LIMIT:
+                    logging.warning(u"Too many messages to catch up")
+                    break
+
         except Exception as feedback:
             logging.warning(u"Unable to pull messages")
             logging.exception(feedback)
-            return
+            return 0
 
-        if len(new_items):
-            logging.info(u"Pulling {} new messages".format(len(new_items)))
+        if not new_items:
+            return 0
 
-        while len(new_items):
-            item = new_items.pop()
-            self._last_message_id = item.id
+        logging.info(u"Pulling {} new messages".format(len(new_items)))
+
+        for item in reversed(new_items):
             item._json['hook'] = 'pull'
             self.on_message(item._json, self.ears)
 
+        self.set_cursor(room_id, new_items[0].id)
+        return len(new_items)
+
+    def get_cursors(self):
+        """
+        Provides the store of pull cursors
+
+        :return: a store bound to this space
+        :rtype: Store
+
+        The store is built from configuration, so that a persistent store
+        is used if one has been configured, e.g., Sqlite.
+        """
+        if self.cursors is None:
+            self.cursors = StoreFactory.build(context=self.context)
+            self.cursors.bond(id=self.prefix+'.cursors')
+
+        return self.cursors
+
+    def get_cursor(self, room_id):
+        """
+        Retrieves the id of the last message pulled from a room
+
+        :param room_id: the unique id of the room
+        :type room_id: str
+
+        :return: the id of a message, or None
+        :rtype: str
+
+        """
+        if room_id == self.id and self._last_message_id:
+            return self._last_message_id
+
+        return self.get_cursors().recall('cursor.'+room_id)
+
+    def set_cursor(self, room_id, message_id):
+        """
+        Remembers the id of the last message pulled from a room
+
+        :param room_id: the unique id of the room
+        :type room_id: str
+
+        :param message_id: the id of the message
+        :type message_id: str
+
+        """
+        if room_id == self.id:
+            self._last_message_id = message_id
+
+        self.get_cursors().remember('cursor.'+room_id, message_id)
+
+    def get_pull_interval(self):
+        """
+        Provides the time to wait before next pull
+
+        :return: a number of seconds
+        :rtype: float
+
+        The interval is short when messages are flowing, and doubles
+        on every pull that gets no new message, up to ``spark.pull.max``.
+        """
+        if self._pull_interval is None:
+            return float(self.get('pull.min', self.PULL_MIN))
+
+        return self._pull_interval
+
     def on_message(self, item, queue):
         """
         Normalizes message for the listener
@@ -940,7 +1726,7 @@ class SparkSpace(Space):
         message.space_id = message.get('roomId')
 
         logging.debug(u"- putting message to ears")
-        queue.put(str(message))
+        queue.put(self.codec.encode(message))
 
         for url in item.get('files', []):
             attachment = Attachment(item.copy())
@@ -950,33 +1736,72 @@ class SparkSpace(Space):
             attachment.space_id = item.get('roomId', None)
 
             logging.debug(u"- putting attachment to ears")
-            queue.put(str(attachment))
+            queue.put(self.codec.encode(attachment))
 
-    def download_attachment(self, url):
+    def download_attachment(self, url, callback=None):
         """
         Copies a shared document locally
+
+        :param url: the link to the document
+        :type url: str
+
+        :param callback: if provided, a function called with the path
+            of the local copy, once downloaded in the background
+        :type callback: callable
+
+        :return: the path to the local copy, or None with a callback
+        :rtype: str
+
+        Documents are cached, so that a document shared multiple times
+        is downloaded only once.
         """
-        path = tempfile.gettempdir()+'/'+self.name_attachment(url)
-        logging.debug(u"- writing to {}".format(path))
-        with open(path, "w+b") as handle:
-            handle.write(self.get_attachment(url))
+        downloader = self.get_downloader()
+        if callback:
+            downloader.submit(url, callback, headers=self.get_headers())
+            return None
 
-        return path
+        return downloader.download(url, headers=self.get_headers())
 
-    def name_attachment(self, url, response=None):
+    def get_downloader(self):
         """
-        Retrieves a document attached to a room
+        Provides the downloader of shared documents
+
+        :return: a downloader bound to the cache of this space
+        :rtype: Downloader
+
         """
-        logging.debug(u"- sensing {}".format(url))
+        if self.downloader is None:
+            self.downloader = Downloader(
+                directory=self.get('attachments.path'),
+                size=self.get('attachments.size'),
+                workers=self.get('attachments.workers'))
+
+        return self.downloader
+
+    def get_headers(self):
+        """
+        Provides headers used to download shared documents
 
+        :return: the authorization header, if a token is available
+        :rtype: dict
+
+        """
         headers = {}
         if self.personal_token:
             headers['Authorization'] = 'Bearer '+self.personal_token
         elif self.token:
             headers['Authorization'] = 'Bearer '+self.token
 
+        return headers
+
+    def name_attachment(self, url, response=None):
+        """
+        Retrieves a document attached to a room
+        """
+        logging.debug(u"- sensing {}".format(url))
+
         if not response:
-            response = requests.head(url=url, headers=headers)
+            response = requests.head(url=url, headers=self.get_headers())
 
         logging.debug(u"- status: {}".format(response.status_code))
         if response.status_code != 200:
@@ -999,14 +1824,8 @@ class SparkSpace(Space):
         """
         logging.debug(u"- fetching {}".format(url))
 
-        headers = {}
-        if self.personal_token:
-            headers['Authorization'] = 'Bearer '+self.personal_token
-        elif self.token:
-            headers['Authorization'] = 'Bearer '+self.token
-
         if not response:
-            response = requests.get(url=url, headers=headers)
+            response = requests.get(url=url, headers=self.get_headers())
 
         logging.debug(u"- status: {}".format(response.status_code))
         if response.status_code != 200:
@@ -1055,7 +1874,7 @@ class SparkSpace(Space):
         join.actor_label = join.get('personDisplayName')
         join.space_id = join.get('roomId')
 
-        queue.put(str(join))
+        queue.put(self.codec.encode(join))
 
     def on_leave(self, item, queue):
         """
@@ -1095,7 +1914,7 @@ class SparkSpace(Space):
         leave.actor_label = leave.get('personDisplayName')
         leave.space_id = leave.get('roomId')
 
-        queue.put(str(leave))
+        queue.put(self.codec.encode(leave))
 
     def update_title(self, title):
         """
@@ -1107,6 +1926,9 @@ class SparkSpace(Space):
         This function should be rewritten in sub-classes if
         space title does not come from ``space.room`` parameter.
         """
-        return self.api.room.update(self.id, title)
+        result = self.api.room.update(self.id, title)
+        self.get_directory().forget(self.id)
+        self.get_room_cache().rename(self.id, title)
+        return result
 
 
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import threading
+import time
+
+
+class Directory(object):
+    """
+    Caches the list of rooms of an account
+
+    Rooms are indexed by id and by title, so that a room can be found
+    without listing all rooms of the account on every lookup. The full list
+    is loaded once, and loaded again when it is older than some time to live.
+
+    Example::
+
+        directory = Directory(ttl=300)
+
+        room = directory.get(id, lister=api.rooms.list)
+        if room is None:
+            room = api.rooms.get(roomId=id)
+            directory.put(room)
+
+    Rooms can be any object that has attributes ``id`` and ``title``.
+    The function used to list rooms is provided on each call, so that
+    a directory can be shared by multiple API instances.
+    """
+
+    TTL = 300  # seconds before the full list of rooms is loaded again
+
+    def __init__(self, ttl=None):
+        """
+        Caches the list of rooms of an account
+
+        :param ttl: seconds before the list of rooms is loaded again
+        :type ttl: float
+
+        """
+        self.ttl = float(ttl) if ttl else self.TTL
+        self.rooms = {}  # id -> room
+        self.titles = {}  # title -> id
+        self.stamp = None
+        self.lock = threading.Lock()
+
+    def is_stale(self):
+        """
+        Checks if the list of rooms should be loaded again
+
+        :return: True or False
+        :rtype: bool
+        """
+        if self.stamp is None:
+            return True
+
+        return time.time() - self.stamp > self.ttl
+
+    def warm(self, lister):
+        """
+        Loads the full list of rooms
+
+        :param lister: the function that lists rooms
+        :type lister: callable
+
+        Exceptions raised by the lister are not caught, and previous
+        content of the directory is kept in that case.
+        """
+        logging.debug(u"Loading the directory of rooms")
+
+        rooms = {}
+        titles = {}
+        for room in lister():
+            rooms[room.id] = room
+            titles.setdefault(room.title, room.id)  # first listed wins
+
+        with self.lock:
+            self.rooms = rooms
+            self.titles = titles
+            self.stamp = time.time()
+
+        logging.debug(u"- {} rooms".format(len(rooms)))
+
+    def get(self, id, lister=None):
+        """
+        Finds a room by id
+
+        :param id: the unique id of the room
+        :type id: str
+
+        :param lister: the function that lists rooms, if the cache is stale
+        :type lister: callable
+
+        :return: the room, or None
+        """
+        if lister and self.is_stale():
+            self.warm(lister)
+
+        return self.rooms.get(id)
+
+    def lookup(self, title, lister=None):
+        """
+        Finds a room by title
+
+        :param title: the title of the room
+        :type title: str
+
+        :param lister: the function that lists rooms, if the cache is stale
+        :type lister: callable
+
+        :return: the room, or None
+        """
+        if lister and self.is_stale():
+            self.warm(lister)
+
+        id = self.titles.get(title)
+        if id is None:
+            return None
+
+        return self.rooms.get(id)
+
+    def put(self, room):
+        """
+        Adds or updates one room
+
+        :param room: the room to remember
+        :type room: object
+
+        """
+        with self.lock:
+            previous = self.rooms.get(room.id)
+            if previous is not None and self.titles.get(previous.title) == room.id:
+                del self.titles[previous.title]
+
+            self.rooms[room.id] = room
+            self.titles.setdefault(room.title, room.id)
+
+    def forget(self, id):
+        """
+        Removes one room
+
+        :param id: the unique id of the room
+        :type id: str
+
+        """
+        with self.lock:
+            room = self.rooms.pop(id, None)
+            if room is not None and self.titles.get(room.title) == id:
+                del self.titles[room.title]
+
+    def clear(self):
+        """
+        Empties the directory
+
+        The full list of rooms will be loaded on next lookup.
+        """
+        with self.lock:
+            self.rooms = {}
+            self.titles = {}
+            self.stamp = None
+
+
+class RoomCache(object):
+    """
+    Remembers titles and types of rooms across processes
+
+    Membership events received from Cisco Spark mention only the id of the
+    room. When a team is added to a room, hundreds of such events can be
+    received for the same room, and each of them would need a lookup.
+
+    This cache is kept in the context of the bot, so that lookups made by one
+    process benefit to all other processes. Each room is remembered under
+    its own key, e.g., ``spark.rooms.<id>``, and entries expire after some
+    time.
+
+    Example::
+
+        cache = RoomCache(context, prefix='spark.rooms')
+
+        info = cache.get(id)
+        if info is None:
+            room = api.rooms.get(roomId=id)
+            info = cache.put(room.id, room.title, room.type)
+
+        logging.debug(info['title'])
+
+    """
+
+    TTL = 600  # seconds before an entry expires
+
+    def __init__(self, context, prefix='rooms', ttl=None):
+        """
+        Remembers titles and types of rooms across processes
+
+        :param context: where entries are stored
+        :type context: Context
+
+        :param prefix: the beginning of keys used in the context
+        :type prefix: str
+
+        :param ttl: seconds before an entry expires
+        :type ttl: float
+
+        """
+        assert context is not None
+        self.context = context
+        self.prefix = prefix
+        self.ttl = float(ttl) if ttl else self.TTL
+
+    def get(self, id):
+        """
+        Retrieves the description of a room
+
+        :param id: the unique id of the room
+        :type id: str
+
+        :return: a dict with keys ``title`` and ``type``, or None
+        :rtype: dict
+
+        """
+        entry = self.context.get(self.prefix+'.'+id)
+        if not entry:
+            return None
+
+        if time.time() - entry[2] > self.ttl:
+            return None
+
+        return {'title': entry[0], 'type': entry[1]}
+
+    def put(self, id, title, type):
+        """
+        Remembers the description of a room
+
+        :param id: the unique id of the room
+        :type id: str
+
+        :param title: the title of the room
+        :type title: str
+
+        :param type: the type of the room, e.g., 'group' or 'direct'
+        :type type: str
+
+        :return: a dict with keys ``title`` and ``type``
+        :rtype: dict
+
+        """
+        self.context.set(self.prefix+'.'+id, [title, type, time.time()])
+        return {'title': title, 'type': type}
+
+    def rename(self, id, title):
+        """
+        Changes the title of a room, if it is cached
+
+        :param id: the unique id of the room
+        :type id: str
+
+        :param title: the new title of the room
+        :type title: str
+
+        """
+        entry = self.context.get(self.prefix+'.'+id)
+        if entry:
+            self.put(id, title, entry[1])
+
+    def forget(self, id):
+        """
+        Removes the description of a room
+
+        :param id: the unique id of the room
+        :type id: str
+
+        """
+        if self.context.get(self.prefix+'.'+id):
+            self.context.set(self.prefix+'.'+id, None)
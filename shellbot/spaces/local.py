@@ -328,4 +328,4 @@ class LocalSpace(Space):
         message.from_id = '*user'
         message.mentioned_ids = [self.context.get('bot.id')]
 
-        queue.put(str(message))
+        queue.put(self.codec.encode(message))
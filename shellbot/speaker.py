@@ -18,7 +18,13 @@
 import logging
 from multiprocessing import Process, Queue
 from six import string_types
+from six.moves import queue
+from six.moves.queue import Empty
+import threading
 import time
+import zlib
+
+from .consumer import Consumer
 
 
 class Vibes(object):
@@ -36,14 +42,33 @@ class Vibes(object):
             self.text, self.content, self.file, self.space_id)
 
 
-class Speaker(object):
+class Speaker(Consumer):
     """
     Sends updates to a business messaging space
+
+    By default, updates are posted one at a time. When the parameter
+    ``speaker.threads`` is set in the context, updates are spread over
+    multiple threads, so that multiple spaces are served in parallel.
+    Updates of one space are always posted by the same thread, so that
+    they are received in order. For example::
+
+        engine.configure_from_dict({'speaker.threads': 8})
+
+    When the parameter ``speaker.coalesce`` is set, the speaker waits for
+    this number of seconds after the first update, and updates received
+    meanwhile for the same space are merged into a single message.
+    For example::
+
+        engine.configure_from_dict({'speaker.coalesce': 0.02})
+
     """
 
-    EMPTY_DELAY = 0.005   # time to wait if queue is empty
     NOT_READY_DELAY = 5   # time to wait if space is not ready
 
+    DEFAULT_THREADS = 1  # updates are posted sequentially
+
+    DEFAULT_COALESCE = 0.0  # seconds to wait for updates to be merged
+
     def __init__(self, engine=None):
         """
         Sends updates to a business messaging space
@@ -53,6 +78,8 @@ class Speaker(object):
 
         """
         self.engine = engine
+        self.lanes = []
+        self.coalesce = self.DEFAULT_COALESCE
 
     def start(self):
         """
@@ -73,7 +100,7 @@ class Speaker(object):
         Continuously send updates
 
         This function is looping on items received from the queue, and
-        is handling them one by one in the background.
+        is handling them in batches in the background.
 
         Processing should be handled in a separate background process, like
         in the following example::
@@ -86,39 +113,213 @@ class Speaker(object):
 
             engine.set('general.switch', 'off')
 
-        Alternatively, the loop is also broken when an exception is pushed
+        Alternatively, the loop is also broken when a poison pill is pushed
         to the queue. For example::
 
-            engine.mouth.put(Exception('EOQ'))
+            engine.mouth.put(None)
 
         Note that items are not picked up from the queue until the underlying
         space is ready for handling messages.
         """
         logging.info(u"Starting speaker")
 
+        threads = int(self.engine.get('speaker.threads',
+                                      self.DEFAULT_THREADS))
+        self.coalesce = float(self.engine.get('speaker.coalesce',
+                                              self.DEFAULT_COALESCE))
+
         try:
             self.engine.set('speaker.counter', 0)
-            not_ready_flag = True
-            while self.engine.get('general.switch', 'on') == 'on':
+            if threads > 1:
+                self.start_lanes(threads)
+                self.consume(self.engine.mouth, self.dispatch)
+            else:
+                self.consume(self.engine.mouth, self.process)
+
+        except KeyboardInterrupt:
+            pass
+
+        finally:
+            self.stop_lanes()
+
+        logging.info(u"Speaker has been stopped")
+
+    def drain(self, queue):
+        """
+        Gets a batch of updates from a queue
 
-                if self.engine.mouth.empty():
-                    time.sleep(self.EMPTY_DELAY)
+        :param queue: the queue to consume
+        :type queue: Queue
+
+        :return: updates received from the queue, maybe none
+        :rtype: list
+
+        If coalescing has been enabled, then this function waits for
+        additional updates until the end of the coalescing window.
+        """
+        items = super(Speaker, self).drain(queue)
+        if not items or not self.coalesce:
+            return items
+
+        deadline = time.time() + self.coalesce
+        while items[-1] is not None and len(items) < self.BATCH_SIZE:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+
+            try:
+                items.append(queue.get(True, remaining))
+            except Empty:
+                break
+
+        return items
+
+    def prepare(self, items):
+        """
+        Merges updates sent to the same space
+
+        :param items: updates received from the queue
+        :type items: list
+
+        :return: updates to be posted
+        :rtype: list
+
+        This function has no effect if coalescing has not been enabled.
+        Else the text and the content of an update are appended to the
+        previous update for the same space, unless a file is attached,
+        or unless the message would exceed the size accepted by the space.
+        Updates of each space are kept in order.
+        """
+        if not self.coalesce or self.engine.space is None:
+            return items
+
+        limit = self.engine.space.MESSAGE_SIZE
+        prepared = []
+        latest = {}  # space_id -> index of last update in prepared
+        for item in items:
+            if not isinstance(item, Vibes):
+                prepared.append(item)
+                continue
+
+            index = latest.get(item.space_id)
+            if index is not None:
+                merged = self.merge(prepared[index], item, limit)
+                if merged is not None:
+                    prepared[index] = merged
                     continue
 
-                try:
-                    item = self.engine.mouth.get(True, 0.1)
-                    if item is None:
-                        break
+            latest[item.space_id] = len(prepared)
+            prepared.append(item)
 
-                    self.process(item)
+        if len(prepared) < len(items):
+            logging.debug(u"- merged {} updates into {}".format(
+                len(items), len(prepared)))
 
-                except Exception as feedback:
-                    logging.exception(feedback)
+        return prepared
 
-        except KeyboardInterrupt:
-            pass
+    def merge(self, previous, item, limit):
+        """
+        Merges two updates sent to the same space
 
-        logging.info(u"Speaker has been stopped")
+        :param previous: the update that was received first
+        :type previous: Vibes
+
+        :param item: the update that was received next
+        :type item: Vibes
+
+        :param limit: maximum number of characters of a message
+        :type limit: int
+
+        :return: the merged update, or None if updates cannot be merged
+        :rtype: Vibes or None
+
+        """
+        if previous.file or item.file:
+            return None
+
+        text = u'\n'.join([x for x in (previous.text, item.text) if x])
+
+        content = None
+        if previous.content or item.content:
+            content = u'\n\n'.join(
+                [x.content or x.text for x in (previous, item)
+                 if x.content or x.text])
+
+        if len(text) > limit or len(content or '') > limit:
+            return None
+
+        return Vibes(text, content, None, previous.space_id)
+
+    def start_lanes(self, count):
+        """
+        Starts threads that post updates in parallel
+
+        :param count: the number of threads to start
+        :type count: int
+
+        Each thread has its own queue of updates.
+        """
+        logging.debug(u"- starting {} speaking threads".format(count))
+
+        self.lanes = []
+        for index in range(count):
+            lane = queue.Queue()
+            thread = threading.Thread(target=self.run_lane, args=(lane,))
+            thread.daemon = True
+            thread.start()
+            self.lanes.append((lane, thread))
+
+    def stop_lanes(self):
+        """
+        Stops threads that post updates in parallel
+
+        Updates that are pending in threads are posted before this
+        function returns.
+        """
+        for (lane, thread) in self.lanes:
+            lane.put(None)
+
+        for (lane, thread) in self.lanes:
+            thread.join()
+
+        self.lanes = []
+
+    def run_lane(self, lane):
+        """
+        Posts updates received from one thread queue
+
+        :param lane: the queue of this thread
+        :type lane: Queue
+
+        The loop is broken when ``None`` is received.
+        """
+        while True:
+            item = lane.get()
+            if item is None:
+                break
+
+            try:
+                self.process(item)
+
+            except Exception as feedback:
+                logging.exception(feedback)
+
+    def dispatch(self, item):
+        """
+        Passes one update to the thread in charge of its space
+
+        :param item: the update to be transmitted
+        :type item: str or object
+
+        Spaces are spread over threads by hashing their id, and updates
+        without a space id are all handled by the same thread.
+        """
+        space_id = getattr(item, 'space_id', None) or ''
+        if not isinstance(space_id, bytes):
+            space_id = space_id.encode('utf-8')
+
+        (lane, thread) = self.lanes[zlib.crc32(space_id) % len(self.lanes)]
+        lane.put(item)
 
     def process(self, item):
         """
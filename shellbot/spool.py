@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from multiprocessing import Condition
+import os
+import pickle
+from six.moves.queue import Empty
+import sqlite3
+import time
+
+
+class Spool(object):
+    """
+    Queues items on disk
+
+    This is a replacement of ``multiprocessing.Queue`` that survives crashes
+    and restarts of the bot. Items are stored in a Sqlite database, so that
+    large bursts do not consume process memory.
+
+    Items taken from the spool have to be acknowledged once they have been
+    processed. Items that have been taken but not acknowledged are
+    delivered again when the spool is created on next start.
+
+    Example::
+
+        spool = Spool('/var/spool/shellbot/inbox.db')
+        spool.put(('echo', 'hello', space_id))
+
+        ...
+
+        # in another process
+        item = spool.get()
+        process(item)
+        spool.ack()
+
+    The spool has to be created before processes are forked. Each process
+    then opens its own connection to the database.
+    """
+
+    TIMEOUT = 30.0  # seconds to wait for a lock on the database
+
+    def __init__(self, path):
+        """
+        Queues items on disk
+
+        :param path: name of the database file
+        :type path: str
+
+        """
+        assert path not in (None, '')
+        self.path = path
+
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self.ready = Condition()
+
+        self._pid = None
+        self._db = None
+        self._taken = []  # items taken by this process, not yet acknowledged
+
+        self.replay()
+
+    def get_db(self):
+        """
+        Gets a handle on the database
+
+        :return: a connection owned by this process
+        :rtype: sqlite3.Connection
+
+        """
+        pid = os.getpid()
+        if self._pid != pid:  # first use, or inherited from a parent process
+            self._db = sqlite3.connect(self.path,
+                                       timeout=self.TIMEOUT,
+                                       isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS spool "
+                             "(id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                             "taken INTEGER DEFAULT 0, "
+                             "item BLOB)")
+            self._pid = pid
+            self._taken = []
+
+        return self._db
+
+    def replay(self):
+        """
+        Delivers again items that have not been acknowledged
+
+        :return: the number of items that will be delivered again
+        :rtype: int
+
+        This function is called on initialisation of the spool.
+        """
+        cursor = self.get_db().execute(
+            "UPDATE spool SET taken=0 WHERE taken=1")
+        if cursor.rowcount > 0:
+            logging.info(u"Replaying {} item(s) from {}".format(
+                cursor.rowcount, self.path))
+        return cursor.rowcount
+
+    def put(self, item, block=True, timeout=None):
+        """
+        Appends an item to the spool
+
+        :param item: the item to be queued
+        :type item: any object that can be pickled, or None
+
+        Parameters ``block`` and ``timeout`` are accepted for compatibility
+        with ``multiprocessing.Queue``, and are not used.
+        """
+        data = pickle.dumps(item, protocol=2)
+        self.get_db().execute("INSERT INTO spool (item) VALUES (?)",
+                              (sqlite3.Binary(data),))
+
+        with self.ready:
+            self.ready.notify_all()
+
+    def put_nowait(self, item):
+        """
+        Appends an item to the spool
+        """
+        self.put(item)
+
+    def take(self):
+        """
+        Takes the oldest item that is available
+
+        :return: the id and the item, or None if the spool is empty
+        :rtype: tuple or None
+
+        """
+        db = self.get_db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT id, item FROM spool WHERE taken=0 "
+                             "ORDER BY id LIMIT 1").fetchone()
+            if row:
+                db.execute("UPDATE spool SET taken=1 WHERE id=?", (row[0],))
+            db.execute("COMMIT")
+
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+        if row is None:
+            return None
+
+        return (row[0], pickle.loads(bytes(row[1])))
+
+    def get(self, block=True, timeout=None):
+        """
+        Gets the oldest item of the spool
+
+        :param block: wait for an item if the spool is empty
+        :type block: bool
+
+        :param timeout: maximum time to wait, in seconds, or None
+        :type timeout: float
+
+        :return: the item
+
+        An exception ``Empty`` is raised if no item is available.
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        with self.ready:  # do not miss notifications of put()
+            while True:
+                taken = self.take()
+                if taken:
+                    self._taken.append(taken[0])
+                    return taken[1]
+
+                if not block:
+                    raise Empty()
+
+                remaining = deadline - time.time() if deadline else None
+                if remaining is not None and remaining <= 0:
+                    raise Empty()
+
+                self.ready.wait(remaining)
+
+    def get_nowait(self):
+        """
+        Gets the oldest item of the spool, without waiting
+        """
+        return self.get(block=False)
+
+    def ack(self, count=1):
+        """
+        Acknowledges items that have been processed
+
+        :param count: the number of items to acknowledge
+        :type count: int
+
+        Items are acknowledged in the order in which they have been taken
+        by this process.
+        """
+        ids = self._taken[:count]
+        self._taken = self._taken[count:]
+        if ids:
+            self.get_db().executemany("DELETE FROM spool WHERE id=?",
+                                      [(x,) for x in ids])
+
+    def qsize(self):
+        """
+        Counts items that are available
+
+        :return: the number of items waiting in the spool
+        :rtype: int
+        """
+        row = self.get_db().execute(
+            "SELECT COUNT(*) FROM spool WHERE taken=0").fetchone()
+        return row[0]
+
+    def empty(self):
+        """
+        Checks if the spool is empty
+
+        :return: True or False
+        :rtype: bool
+        """
+        return self.qsize() == 0
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from multiprocessing import Manager
+import signal
+import threading
+
+
+class State(object):
+    """
+    Provides dictionaries to components of the engine
+
+    Stores, machines and spaces keep their values in dictionaries that
+    can be shared across processes. Instead of starting a
+    ``multiprocessing.Manager()`` process for each of them, a single
+    manager is started for the whole program, and each component gets its
+    own dictionary from it.
+
+    Example::
+
+        values = State.dict()
+        values['state'] = 'running'
+
+    In the ``local`` mode, components that do not need to be shared
+    across processes get a regular dictionary instead. Components that
+    have to be shared, e.g., machines ran in the background, request
+    a shared dictionary explicitly. A memory store is moved to the manager
+    when a machine is attached to its bot, so that input captured
+    by the machine is visible to the bot::
+
+        State.configure(mode='local')
+
+        values = State.dict()  # a regular dict
+        mutables = State.dict(shared=True)  # a dict in the manager process
+
+    """
+
+    MODES = ('shared', 'local')
+
+    mode = 'shared'
+
+    _manager = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def configure(cls, mode='shared'):
+        """
+        Sets the mode of operation
+
+        :param mode: either 'shared' (the default) or 'local'
+        :type mode: str
+
+        A ``ValueError`` is raised if the mode is unknown.
+        """
+        if mode not in cls.MODES:
+            raise ValueError(u"Unknown state mode {}".format(mode))
+
+        cls.mode = mode
+
+    @classmethod
+    def get_manager(cls):
+        """
+        Provides the manager shared by all components
+
+        :return: a manager that has been started
+        :rtype: SyncManager
+
+        The manager process is started on first use, and inherited by
+        processes that are forked afterwards.
+        """
+        with cls._lock:
+            if cls._manager is None:
+                logging.debug(u"Starting state manager")
+
+                # prevent Manager() process to be interrupted
+                handler = signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+                cls._manager = Manager()
+
+                # restore current handler for the rest of the program
+                signal.signal(signal.SIGINT, handler)
+
+        return cls._manager
+
+    @classmethod
+    def dict(cls, shared=None):
+        """
+        Provides a new dictionary
+
+        :param shared: True to share values across processes, False for
+            a regular dict, or None to apply the mode of operation
+        :type shared: bool
+
+        :return: an empty dictionary
+        :rtype: dict or DictProxy
+
+        """
+        if shared is None:
+            shared = (cls.mode == 'shared')
+
+        if shared:
+            return cls.get_manager().dict()
+
+        return {}
+
+    @classmethod
+    def shutdown(cls):
+        """
+        Stops the manager process, if any
+
+        Dictionaries provided previously cannot be used afterwards.
+        """
+        with cls._lock:
+            if cls._manager is not None:
+                cls._manager.shutdown()
+                cls._manager = None
@@ -119,6 +119,38 @@ class Store(object):
         """
         pass
 
+    def share(self):
+        """
+        Makes values visible to processes started afterwards
+
+        This function is called when a state machine is attached to the bot,
+        since machines update the store from separate processes. It should
+        be expanded in sub-class if values are kept in process memory.
+        """
+        pass
+
+    def suspend(self):
+        """
+        Saves values before the store is released
+
+        :return: an archive of values, or None
+
+        This function is called when a bot is evicted from memory. It should
+        be expanded in sub-class if values are not permanent, and the
+        archive is passed to ``resume()`` when the bot is built again.
+        """
+        return None
+
+    def resume(self, archive):
+        """
+        Restores values after the store has been re-created
+
+        :param archive: values returned by ``suspend()``, or None
+
+        This function should be expanded in sub-class where necessary.
+        """
+        pass
+
     def to_text(self, value):
         """
         Turns a value to a textual representation
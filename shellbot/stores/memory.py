@@ -18,9 +18,9 @@
 import colorlog
 import logging
 import os
-from multiprocessing import Lock, Manager
-import signal
+from multiprocessing import Lock
 
+from shellbot.state import State
 from .base import Store
 
 
@@ -41,13 +41,21 @@ class MemoryStore(Store):
         """
         Adds processing to initialization
         """
-        # prevent Manager() process to be interrupted
-        handler = signal.signal(signal.SIGINT, signal.SIG_IGN)
+        self.values = State.dict()
 
-        self.values = Manager().dict()
+    def share(self):
+        """
+        Makes values visible to processes started afterwards
 
-        # restore current handler for the rest of the program
-        signal.signal(signal.SIGINT, handler)
+        In the ``local`` mode of ``shellbot.state.State``, values are
+        moved to the shared manager, with their current content.
+        """
+        with self.lock:
+            if isinstance(self.values, dict):
+                logging.debug(u"- sharing store values")
+                values = State.dict(shared=True)
+                values.update(self.values)
+                self.values = values
 
     def _set(self, key, value):
         """
@@ -108,3 +116,22 @@ class MemoryStore(Store):
             self.values.clear()
         else:
             self.values[key] = None
+
+    def suspend(self):
+        """
+        Saves values before the store is released
+
+        :return: a copy of all values
+        :rtype: dict
+        """
+        return self.values.copy()
+
+    def resume(self, archive):
+        """
+        Restores values after the store has been re-created
+
+        :param archive: values returned by ``suspend()``, or None
+        :type archive: dict
+        """
+        if archive:
+            self.values.update(archive)
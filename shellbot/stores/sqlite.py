@@ -16,6 +16,8 @@
 # limitations under the License.
 
 import colorlog
+from contextlib import contextmanager
+import json
 import logging
 import os
 from multiprocessing import Lock, Manager
@@ -34,8 +36,21 @@ class SqliteStore(Store):
 
         store = SqliteStore(db='shellstore.db', id=space.id)
 
+    Each process keeps a single connection to the database, that is reused
+    across calls. The database is put in write-ahead logging mode, so that
+    readers do not block writers, and values are indexed by space and by key.
+
+    Counters, lists and dicts are changed within the database, in
+    transactions that are atomic across processes. Items appended to a list
+    are stored in a separate table, so that existing items are not
+    written again.
+
     """
 
+    TIMEOUT = 30.0  # seconds to wait for a lock on the database
+
+    SYNCHRONOUS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
     def on_init(self,
                 prefix='sqlite',
                 id=None,
@@ -67,18 +82,139 @@ class SqliteStore(Store):
         if db not in (None, ''):
             self.context.set(self.prefix+'.db', db)
 
+        self._db = None
+        self._db_key = None  # (process id, file name) of the connection
+        self._native = False  # upsert and JSON functions are available
+
     def check(self):
         """
         Checks configuration
+
+        This function handles following parameters:
+
+        * ``sqlite.db`` - name of the database file, default: ``store.db``
+
+        * ``sqlite.synchronous`` - how often data is flushed to disk, from
+          ``OFF`` to ``EXTRA``, default: ``NORMAL``. With write-ahead logging,
+          ``NORMAL`` is safe against corruption, but the last transactions
+          may be lost on power failure.
+
         """
         self.context.check(self.prefix+'.db', 'store.db')
+        self.context.check(self.prefix+'.synchronous', 'NORMAL',
+                           validate=lambda x: x.upper() in self.SYNCHRONOUS)
 
     def get_db(self):
         """
         Gets a handle on the database
+
+        :return: a connection owned by this process
+        :rtype: sqlite3.Connection
+
+        The connection is opened on first use in each process, and the table
+        is created if needed. Statements are committed as soon as they
+        are executed, and compiled statements are cached by the connection.
         """
         db = self.context.get(self.prefix+'.db', 'store.db')
-        return sqlite3.connect(db)
+        key = (os.getpid(), db)
+        if self._db_key != key:  # first use, or inherited from a parent process
+            handle = sqlite3.connect(db,
+                                     timeout=self.TIMEOUT,
+                                     isolation_level=None,
+                                     check_same_thread=False)
+            handle.execute("PRAGMA journal_mode=WAL")
+
+            synchronous = str(self.context.get(self.prefix+'.synchronous',
+                                               'NORMAL')).upper()
+            if synchronous not in self.SYNCHRONOUS:
+                synchronous = 'NORMAL'
+            handle.execute("PRAGMA synchronous="+synchronous)
+
+            self.create_table(handle)
+
+            try:
+                handle.execute("SELECT json_valid('1')")
+                self._native = sqlite3.sqlite_version_info >= (3, 24, 0)
+            except sqlite3.OperationalError:  # JSON1 extension is missing
+                self._native = False
+
+            self._db = handle
+            self._db_key = key
+
+        return self._db
+
+    def create_table(self, handle):
+        """
+        Creates the table of values, or upgrades it
+
+        :param handle: an instance of a Sqlite database
+        :type handle: a connection
+
+        Previous versions of the table used a numeric id and no index
+        on space. Values are copied to the new table on first use.
+        """
+        columns = [x[1] for x in handle.execute("PRAGMA table_info(store)")]
+        if 'id' in columns:
+            logging.info(u"Upgrading Sqlite store")
+            handle.execute("BEGIN IMMEDIATE")
+            try:
+                handle.execute("ALTER TABLE store RENAME TO store_previous")
+                handle.execute("CREATE TABLE store \
+                    (context TEXT NOT NULL, \
+                    key TEXT NOT NULL, \
+                    value TEXT, \
+                    PRIMARY KEY (context, key))")
+                handle.execute("INSERT OR REPLACE INTO store (context,key,value) \
+                    SELECT context, key, value FROM store_previous \
+                    WHERE context IS NOT NULL AND key IS NOT NULL \
+                    ORDER BY id")
+                handle.execute("DROP TABLE store_previous")
+                handle.execute("COMMIT")
+
+            except Exception:
+                handle.execute("ROLLBACK")
+                raise
+
+        else:
+            handle.execute("CREATE TABLE IF NOT EXISTS store \
+                (context TEXT NOT NULL, \
+                key TEXT NOT NULL, \
+                value TEXT, \
+                PRIMARY KEY (context, key))")
+
+        handle.execute("CREATE TABLE IF NOT EXISTS store_items \
+            (context TEXT NOT NULL, \
+            key TEXT NOT NULL, \
+            seq INTEGER NOT NULL, \
+            item TEXT, \
+            PRIMARY KEY (context, key, seq))")
+
+    @contextmanager
+    def transaction(self):
+        """
+        Changes values atomically
+
+        :return: a handle on the database
+
+        Example::
+
+            with store.transaction() as handle:
+                store._set('a', '1', handle=handle)
+                store._set('b', '2', handle=handle)
+
+        The database is locked for writing until the end of the block, so
+        that concurrent changes by other processes are serialized.
+        Changes are rolled back on exception.
+        """
+        handle = self.get_db()
+        handle.execute("BEGIN IMMEDIATE")
+        try:
+            yield handle
+            handle.execute("COMMIT")
+
+        except Exception:
+            handle.execute("ROLLBACK")
+            raise
 
     def bond(self, id=None):
         """
@@ -91,15 +227,7 @@ class SqliteStore(Store):
         if id not in (None, ''):
             self.id = id
 
-        handle = self.get_db()
-        try:
-            handle.execute("CREATE TABLE store \
-                (id INTEGER PRIMARY KEY, \
-                context TEXT, \
-                key TEXT UNIQUE, \
-                value TEXT)")
-        except sqlite3.OperationalError as feedback:
-            logging.debug(feedback)
+        self.get_db()
 
     def _set(self, key, value, handle=None):
         """
@@ -124,13 +252,11 @@ class SqliteStore(Store):
         """
         handle = handle if handle else self.get_db()
 
-        cursor = handle.cursor()
-        cursor.execute("DELETE FROM store WHERE context=? AND key=?",
-                       (self.id, key))
-        cursor.execute("INSERT INTO store (context,key,value) VALUES (?,?,?)",
+        handle.execute("INSERT OR REPLACE INTO store (context,key,value) "
+                       "VALUES (?,?,?)",
                        (self.id, key, value))
-        handle.commit()
-        cursor.close()
+        handle.execute("DELETE FROM store_items WHERE context=? AND key=?",
+                       (self.id, key))
 
     def _get(self, key, handle=None):
         """
@@ -151,14 +277,25 @@ class SqliteStore(Store):
         """
         handle = handle if handle else self.get_db()
 
-        cursor = handle.cursor()
-        cursor.execute("SELECT value FROM store WHERE context=? AND key=?",
-                       (self.id, key))
-        result = cursor.fetchone()
+        result = handle.execute("SELECT value FROM store "
+                                "WHERE context=? AND key=?",
+                                (self.id, key)).fetchone()
         try:
-            return result[0]
+            value = result[0]
         except TypeError:
-            return None
+            value = None
+
+        items = handle.execute("SELECT item FROM store_items "
+                               "WHERE context=? AND key=? ORDER BY seq",
+                               (self.id, key)).fetchall()
+        if not items:
+            return value
+
+        value = self.from_text(value)  # items appended to a list
+        if not isinstance(value, list):
+            value = []
+        value.extend([self.from_text(x[0]) for x in items])
+        return self.to_text(value)
 
     def _clear(self, key=None, handle=None):
         """
@@ -185,15 +322,150 @@ class SqliteStore(Store):
         handle = handle if handle else self.get_db()
 
         if key in (None, ''):
-            cursor = handle.cursor()
-            cursor.execute("DELETE FROM store WHERE context=?",
+            handle.execute("DELETE FROM store WHERE context=?",
+                           (self.id,))
+            handle.execute("DELETE FROM store_items WHERE context=?",
                            (self.id,))
-            handle.commit()
-            cursor.close()
 
         else:
-            cursor = handle.cursor()
-            cursor.execute("DELETE FROM store WHERE context=? AND key=?",
+            handle.execute("DELETE FROM store WHERE context=? AND key=?",
+                           (self.id, key))
+            handle.execute("DELETE FROM store_items WHERE context=? AND key=?",
+                           (self.id, key))
+
+    def increment(self, key, delta=1):
+        """
+        Increments a value
+
+        :param key: name of the value
+        :type key: str
+
+        :param delta: increment to apply
+        :type delta: int
+
+        :return: the new value
+
+        Example::
+
+            value = store.increment('gauge')
+
+        The value is changed within the database, so this function is safe
+        across processes.
+        """
+        self.get_db()  # senses features of the database
+        if not self._native:
+            return super(SqliteStore, self).increment(key, delta)
+
+        with self.lock, self.transaction() as handle:
+            handle.execute("DELETE FROM store_items WHERE context=? AND key=?",
+                           (self.id, key))
+            handle.execute("INSERT INTO store (context,key,value) "
+                           "VALUES (?,?,?) "
+                           "ON CONFLICT (context,key) DO UPDATE SET value="
+                           "CASE WHEN json_valid(value) THEN "
+                           "CASE WHEN json_type(value)='integer' "
+                           "THEN CAST(value AS INTEGER)+excluded.value "
+                           "ELSE excluded.value END "
+                           "ELSE excluded.value END",
+                           (self.id, key, delta))
+            result = handle.execute("SELECT value FROM store "
+                                    "WHERE context=? AND key=?",
+                                    (self.id, key)).fetchone()
+
+        return int(result[0])
+
+    def decrement(self, key, delta=1):
+        """
+        Decrements a value
+
+        :param key: name of the value
+        :type key: str
+
+        :param delta: decrement to apply
+        :type delta: int
+
+        :return: the new value
+
+        Example::
+
+            value = store.decrement('gauge')
+
+        """
+        return self.increment(key, -delta)
+
+    def append(self, key, item):
+        """
+        Appends an item to a list
+
+        :param key: name of the list
+        :type key: str
+
+        :param item: a new item to append
+        :type item: any serializable type is accepted
+
+        Example::
+
+            >>>store.append('names', 'Alice')
+            >>>store.append('names', 'Bob')
+            >>>store.recall('names')
+            ['Alice', 'Bob']
+
+        The item is added to a separate table, so that the list is not
+        written again. This function is safe across processes.
+        """
+        self.get_db()  # senses features of the database
+        if not self._native:
+            return super(SqliteStore, self).append(key, item)
+
+        with self.lock, self.transaction() as handle:
+            handle.execute("DELETE FROM store WHERE context=? AND key=? "
+                           "AND NOT (json_valid(value) "
+                           "AND json_type(value)='array')",
+                           (self.id, key))
+            handle.execute("INSERT INTO store_items (context,key,seq,item) "
+                           "SELECT ?, ?, COALESCE(MAX(seq), 0) + 1, ? "
+                           "FROM store_items WHERE context=? AND key=?",
+                           (self.id, key, self.to_text(item), self.id, key))
+
+    def update(self, key, label, item):
+        """
+        Updates a dict
+
+        :param key: name of the dict
+        :type key: str
+
+        :param label: named entry in the dict
+        :type label: str
+
+        :param item: new value of this entry
+        :type item: any serializable type is accepted
+
+        Example::
+
+            >>>store.update('input', 'PO Number', '1234A')
+            >>>store.recall('input')
+            {'PO Number': '1234A'}
+
+        The entry is changed within the database, so this function is safe
+        across processes.
+        """
+        assert label not in (None, '')
+
+        self.get_db()  # senses features of the database
+        if not self._native or '"' in label:
+            return super(SqliteStore, self).update(key, label, item)
+
+        path = u'$."{}"'.format(label)
+        with self.lock, self.transaction() as handle:
+            handle.execute("DELETE FROM store_items WHERE context=? AND key=?",
                            (self.id, key))
-            handle.commit()
-            cursor.close()
+            handle.execute("INSERT INTO store (context,key,value) "
+                           "VALUES (?, ?, json_object(?, json(?))) "
+                           "ON CONFLICT (context,key) DO UPDATE SET value="
+                           "CASE WHEN json_valid(value) THEN "
+                           "CASE WHEN json_type(value)='object' "
+                           "THEN json_set(value, ?, json(?)) "
+                           "ELSE excluded.value END "
+                           "ELSE excluded.value END",
+                           (self.id, key, label, self.to_text(item),
+                            path, self.to_text(item)))
@@ -76,11 +76,14 @@ class SpaceUpdater(Updater):
         logging.debug(event.attributes)
 
         if event.get('url'):
-            file = self.space.download_attachment(event.url)
-            message = u"{}: {}".format(event.from_label, os.path.basename(file))
 
-            self.mouth.put(Vibes(text=message,
-                                 file=file))
+            def forward(file):
+                message = u"{}: {}".format(event.from_label,
+                                           os.path.basename(file))
+                self.mouth.put(Vibes(text=message,
+                                     file=file))
+
+            self.space.download_attachment(event.url, callback=forward)
 
         else:
             self.mouth.put(self.format(event))
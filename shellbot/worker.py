@@ -19,21 +19,89 @@ import logging
 from multiprocessing import Process
 import time
 
+from .consumer import Consumer
 
-class Worker(object):
+
+class Worker(Consumer):
     """
     Executes non-interactive commands
+
+    The engine can run a pool of workers, each with its own queue. Commands
+    of one space are always pushed to the same worker, so that they are
+    executed in sequence, while commands of other spaces are executed
+    in parallel by other workers.
+
+    Each worker reports its state in the context, under keys
+    ``worker.<index>.busy`` and ``worker.<index>.depth``.
     """
 
-    def __init__(self, engine=None):
+    def __init__(self, engine=None, index=0, inbox=None):
         """
         Executes non-interactive commands
 
         :param engine: the overarching engine
         :type engine: Engine
 
+        :param index: the rank of this worker in the pool
+        :type index: int
+
+        :param inbox: the queue of this worker, else the inbox of the engine
+        :type inbox: Queue
+
         """
         self.engine = engine
+        self.index = index
+        self.inbox = inbox
+
+    def get_inbox(self):
+        """
+        Provides the queue consumed by this worker
+
+        :return: the queue of this worker
+        :rtype: Queue
+
+        The first worker of the pool consumes the inbox of the engine.
+        """
+        if self.inbox is not None:
+            return self.inbox
+
+        return self.engine.inbox
+
+    def key(self, name):
+        """
+        Provides the name of a value that is specific to this worker
+
+        :param name: the name of the value, e.g., 'busy' or 'depth'
+        :type name: str
+
+        :return: the key to be used in the context, e.g., 'worker.0.busy'
+        :rtype: str
+        """
+        return u'worker.{}.{}'.format(self.index, name)
+
+    def push(self, item):
+        """
+        Submits an action to this worker
+
+        :param item: the action to perform
+        :type item: list or tuple
+
+        The depth of the queue of this worker is updated in the context.
+        """
+        self.engine.context.increment(self.key('depth'))
+        self.get_inbox().put(item)
+
+    def is_busy(self):
+        """
+        Checks if this worker has some work in progress or pending
+
+        :return: True or False
+        :rtype: bool
+        """
+        if self.engine.get(self.key('busy'), False):
+            return True
+
+        return self.engine.get(self.key('depth'), 0) > 0
 
     def start(self):
         """
@@ -56,7 +124,7 @@ class Worker(object):
         :type context: context
 
         This function is looping on items received from the queue, and
-        is handling them one by one in the background.
+        is handling them in batches in the background.
 
         Processing should be handled in the background, like
         in the following example::
@@ -73,41 +141,42 @@ class Worker(object):
 
             context.set('general.switch', 'off')
 
-        Alternatively, the loop is also broken when an exception is pushed
+        Alternatively, the loop is also broken when a poison pill is pushed
         to the queue. For example::
 
-            inbox.put(Exception('EOQ'))
+            inbox.put(None)
 
         """
-        logging.info(u"Starting worker")
+        logging.info(u"Starting worker {}".format(self.index))
 
-        self.engine.set('worker.counter', 0)
-        self.engine.set('worker.busy', False)
+        if self.index == 0:  # the counter is shared by all workers
+            self.engine.set('worker.counter', 0)
+        self.engine.set(self.key('busy'), False)
 
         try:
-            while self.engine.get('general.switch', 'on') == 'on':
+            self.consume(self.get_inbox(), self.work)
 
-                if self.engine.inbox.empty():
-                    time.sleep(0.005)
-                    continue
-
-                try:
-                    item = self.engine.inbox.get(True, 0.1)
-                    if item is None:
-                        break
+        except KeyboardInterrupt:
+            pass
 
-                    self.engine.set('worker.busy', True)
-                    self.process(item)
-                    self.engine.set('worker.busy', False)
+        finally:
+            logging.info(u"Worker {} has been stopped".format(self.index))
 
-                except Exception as feedback:
-                    logging.exception(feedback)
+    def work(self, item):
+        """
+        Processes one action while the worker is flagged as busy
 
-        except KeyboardInterrupt:
-            pass
+        :param item: the action to perform
+        :type item: list or tuple
 
+        """
+        self.engine.set(self.key('busy'), True)
+        try:
+            self.process(item)
         finally:
-            logging.info(u"Worker has been stopped")
+            self.engine.set(self.key('busy'), False)
+            if self.engine.context.decrement(self.key('depth')) < 0:
+                self.engine.context.increment(self.key('depth'))  # not pushed
 
     def process(self, item):
         """
@@ -15,6 +15,7 @@ sys.path.insert(0, os.path.abspath('../..'))
 
 from shellbot import Context, Engine
 from shellbot.machines import Input
+from shellbot.state import State
 from shellbot.stores import MemoryStore
 
 class MyEngine(Engine):
@@ -521,6 +522,38 @@ class InputTests(unittest.TestCase):
 
         self.assertEqual(my_engine.get('said'), machine.ANSWER_MESSAGE)
 
+    def test_local(self):
+
+        logging.info("******** local state")
+
+        State.configure(mode='local')
+        try:
+            store = MemoryStore()
+            self.assertTrue(isinstance(store.values, dict))
+
+            class MyBot(FakeBot):
+
+                def say(self, message):
+                    self.engine.set('said', message)
+
+            my_bot = MyBot(engine=my_engine, store=store)
+
+            machine = Input(bot=my_bot,
+                            question="What's up, Doc?",
+                            key='my.input')
+            self.assertFalse(isinstance(store.values, dict))
+
+            p = machine.start(tick=0.001)
+
+            time.sleep(0.01)
+            my_bot.fan.put('here we go')
+            p.join()
+
+        finally:
+            State.configure()
+
+        self.assertEqual(my_bot.recall('input'), {u'my.input': u'here we go'})
+
     def test_delayed(self):
 
         logging.info("******** delayed")
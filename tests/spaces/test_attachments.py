@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import gc
+import logging
+import mock
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath('../..'))
+
+from shellbot import Context
+from shellbot.spaces.attachments import Downloader
+
+
+class FakeResponse(object):
+
+    def __init__(self, content=b'hello world', status_code=200, name=None):
+        self.content = content
+        self.status_code = status_code
+        self.headers = {}
+        if name:
+            self.headers['Content-Disposition'] = 'filename="{}"'.format(name)
+        self.close = mock.Mock()
+
+    def iter_content(self, chunk_size):
+        for index in range(0, len(self.content), 4):
+            yield self.content[index:index+4]
+
+
+class DownloaderTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        collected = gc.collect()
+        logging.info("Garbage collector: collected %d objects." % (collected))
+
+    def test_name(self):
+
+        logging.info('*** name ***')
+
+        downloader = Downloader(directory=self.directory)
+        self.assertEqual(downloader.name({}), 'downloadable')
+        self.assertEqual(downloader.name({'Content-Disposition': 'who cares'}),
+                         'downloadable')
+        self.assertEqual(downloader.name(
+            {'Content-Disposition': 'attachment; filename="some_file.pdf"'}),
+            'some_file.pdf')
+        self.assertEqual(downloader.name(
+            {'Content-Disposition': 'filename="../../etc/passwd"'}),
+            'passwd')
+
+    def test_download(self):
+
+        logging.info('*** download ***')
+
+        session = mock.Mock()
+        session.get.return_value = FakeResponse(name='a.txt')
+        downloader = Downloader(directory=self.directory, session=session)
+
+        path = downloader.download('http://a', headers={'Authorization': '*'})
+        self.assertEqual(os.path.basename(path), 'a.txt')
+        with open(path, 'rb') as handle:
+            self.assertEqual(handle.read(), b'hello world')
+        self.assertTrue(session.get.call_args[1]['stream'])
+        self.assertTrue(session.get.return_value.close.called)
+
+        self.assertEqual(downloader.download('http://a'), path)
+        self.assertEqual(session.get.call_count, 1)  # cached by url
+
+        session.get.return_value = FakeResponse(name='a.txt')
+        self.assertEqual(downloader.download('http://b'), path)  # by content
+        self.assertEqual(session.get.call_count, 2)
+
+        session.get.return_value = FakeResponse(status_code=404)
+        with self.assertRaises(Exception):
+            downloader.download('http://c')
+
+        self.assertEqual(os.listdir(self.directory), [os.path.basename(
+            os.path.dirname(path))])  # no partial file is left
+
+    def test_evict(self):
+
+        logging.info('*** evict ***')
+
+        session = mock.Mock()
+        downloader = Downloader(directory=self.directory, size=25,
+                                session=session)
+
+        paths = []
+        for index in range(3):
+            session.get.return_value = FakeResponse(
+                content=b'0123456789' + str(index).encode('ascii'),
+                name='{}.txt'.format(index))
+            paths.append(downloader.download('http://{}'.format(index)))
+            stamp = time.time() - 100 + index
+            os.utime(paths[-1], (stamp, stamp))
+
+        self.assertFalse(os.path.exists(paths[0]))  # least recently used
+        self.assertTrue(os.path.exists(paths[1]))
+        self.assertTrue(os.path.exists(paths[2]))
+
+        downloader.touch(paths[1])
+        downloader.size = 15
+        self.assertEqual(downloader.evict(), 1)
+        self.assertTrue(os.path.exists(paths[1]))
+        self.assertFalse(os.path.exists(paths[2]))
+
+    def test_submit(self):
+
+        logging.info('*** submit ***')
+
+        def get(url, **kwargs):
+            if url == 'http://a':
+                return FakeResponse(name='a.txt')
+            return FakeResponse(status_code=500)
+
+        session = mock.Mock()
+        session.get.side_effect = get
+        downloader = Downloader(directory=self.directory, workers=3,
+                                session=session)
+
+        paths = []
+        downloader.submit('http://a', callback=paths.append)
+        self.assertEqual(len(downloader.threads), 3)
+
+        downloader.submit('http://b', callback=paths.append)
+        downloader.stop()
+        self.assertEqual(downloader.threads, [])
+        self.assertEqual(len(paths), 1)  # failed download is not forwarded
+        self.assertEqual(os.path.basename(paths[0]), 'a.txt')
+
+
+if __name__ == '__main__':
+
+    Context.set_logger()
+    sys.exit(unittest.main())
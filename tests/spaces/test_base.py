@@ -361,6 +361,42 @@ class SpaceTests(unittest.TestCase):
 
         self.assertEqual(space._persons, [])
 
+    def test_change_members(self):
+
+        logging.info("*** change_members")
+
+        class MySpace(Space):
+            def on_reset(self):
+                self._persons = []
+
+            def add_participant(self, person):
+                if person == 'bad@acme.com':
+                    raise Exception('TEST')
+                if person == 'wrong@acme.com':
+                    return False
+                time.sleep(0.05)
+                self._persons.append(person)
+
+            def list_members(self):
+                return {'alice@acme.com': False}
+
+        my_context.set('space.membership.threads', 10)
+        space = MySpace(context=my_context)
+        persons = ['Alice@acme.com', 'bad@acme.com', 'wrong@acme.com'] + [
+            'user{}@acme.com'.format(index) for index in range(10)]
+
+        start = time.time()
+        report = space.add_participants(persons)
+        self.assertTrue(time.time() - start < 0.3)  # concurrent requests
+        self.assertEqual(report['Alice@acme.com'], 'skipped')
+        self.assertEqual(report['bad@acme.com'], 'failed')
+        self.assertEqual(report['wrong@acme.com'], 'failed')
+        self.assertEqual(report['user3@acme.com'], 'added')
+        self.assertEqual(sorted(space._persons), sorted(persons[3:]))
+
+        report = space.remove_participants(['bob@acme.com'])
+        self.assertEqual(report, {'bob@acme.com': 'skipped'})
+
     def test_remove_participant(self):
 
         logging.info("*** remove_participant")
@@ -9,14 +9,18 @@ import logging
 import mock
 import os
 from multiprocessing import Process, Queue
+import shutil
 import sys
+import tempfile
 import yaml
 
 sys.path.insert(0, os.path.abspath('../..'))
 
 from shellbot import Context
 from shellbot.events import Event, Message, Attachment, Join, Leave
+from shellbot.limiter import Limiter
 from shellbot.spaces import Space, SparkSpace
+from shellbot.spaces.attachments import Downloader
 
 
 # unit tests
@@ -177,6 +181,7 @@ class SparkSpaceTests(unittest.TestCase):
 
     def tearDown(self):
         my_context.clear()
+        SparkSpace.directories.clear()
         collected = gc.collect()
         logging.info("Garbage collector: collected %d objects." % (collected))
 
@@ -563,6 +568,40 @@ class SparkSpaceTests(unittest.TestCase):
 
         self.assertTrue(space.api.memberships.create.called)
 
+    def test_bulk_memberships(self):
+
+        logging.info("*** bulk memberships")
+        space = SparkSpace(context=my_context)
+        space.api = FakeApi()
+        space.personal_api = FakeApi()
+        space.personal_api.memberships.list = mock.Mock(return_value=[
+            Fake(personEmail='Alice@acme.com', isModerator=True),
+            Fake(personEmail='bob@acme.com', isModerator=False)])
+        space.values['id'] = '*id'
+
+        report = space.add_participants(['alice@acme.com', 'carol@acme.com',
+                                         'dave@acme.com'])
+        self.assertEqual(report, {'alice@acme.com': 'skipped',
+                                  'carol@acme.com': 'added',
+                                  'dave@acme.com': 'added'})
+        self.assertEqual(space.api.memberships.create.call_count, 2)
+
+        report = space.add_moderators(['alice@acme.com', 'bob@acme.com'])
+        self.assertEqual(report, {'alice@acme.com': 'skipped',
+                                  'bob@acme.com': 'added'})
+
+        report = space.remove_participants(['carol@acme.com', 'eve@acme.com'])
+        self.assertEqual(report, {'carol@acme.com': 'removed',
+                                  'eve@acme.com': 'skipped'})
+        self.assertEqual(space.personal_api.memberships.list.call_count, 1)
+        self.assertEqual(space.list_members(), {'alice@acme.com': True,
+                                                'bob@acme.com': True,
+                                                'dave@acme.com': False})
+
+        space.api.memberships.create.side_effect = Exception('TEST')
+        report = space.add_participants(['frank@acme.com'])
+        self.assertEqual(report, {'frank@acme.com': 'failed'})
+
     def test_remove_participant(self):
 
         logging.info("*** remove_participant")
@@ -602,6 +641,7 @@ class SparkSpaceTests(unittest.TestCase):
         # configured room, room exists
         space.api = FakeApi(rooms=[FakeRoom()])
         space.personal_api = FakeApi(rooms=[FakeRoom()])
+        space.get_directory().clear()  # room has been forgotten on deletion
         space.values['id'] = None
         my_context.set('spark.room', '*title')
         space.delete_space()
@@ -654,6 +694,49 @@ class SparkSpaceTests(unittest.TestCase):
                            space_id='123')
         self.assertTrue(space.api.messages.create.called)
 
+    def test_post_message_retry(self):
+
+        logging.info("*** post_message/retry")
+        space = SparkSpace(context=my_context)
+        space.api = FakeApi()
+
+        class RateLimited(Exception):
+            retry_after = 0.01
+
+        space.api.messages.create = mock.Mock(
+            side_effect=[RateLimited(), Exception('TEST'), True])
+        with mock.patch.object(Limiter, 'BACKOFF_DELAY', 0.01):
+            space.post_message(text='hello world', space_id='123')
+        self.assertEqual(space.api.messages.create.call_count, 3)
+        self.assertEqual(my_context.get('spark.limiter.postpones'), 1)
+        self.assertEqual(my_context.get('spark.limiter.retries'), 1)
+
+        space.api.messages.create = mock.Mock(side_effect=Exception('TEST'))
+        with mock.patch.object(Limiter, 'BACKOFF_DELAY', 0.001):
+            space.post_message(text='hello world', space_id='123')
+        self.assertEqual(space.api.messages.create.call_count,
+                         Limiter.MAX_ATTEMPTS)
+        self.assertEqual(my_context.get('spark.limiter.drops'), 1)
+
+    def test_get_retry_after(self):
+
+        logging.info("*** get_retry_after")
+        space = SparkSpace(context=my_context)
+
+        self.assertEqual(space.get_retry_after(Exception()), None)
+
+        feedback = Exception()
+        feedback.response = Fake()
+        feedback.response.status_code = 500
+        self.assertEqual(space.get_retry_after(feedback), None)
+
+        feedback.response.status_code = 429
+        feedback.response.headers = {'Retry-After': '3'}
+        self.assertEqual(space.get_retry_after(feedback), 3.0)
+
+        feedback.response.headers = {}
+        self.assertEqual(space.get_retry_after(feedback), 15.0)
+
     def test_register(self):
 
         logging.info("*** register")
@@ -666,6 +749,82 @@ class SparkSpaceTests(unittest.TestCase):
         space.register('*hook')
         self.assertTrue(space.personal_api.webhooks.create.called)
 
+    def test_reconcile(self):
+
+        logging.info("*** reconcile")
+        my_context.set('spark.reconcile', True)
+        my_context.set('bot.id', '*bot')
+        space = SparkSpace(context=my_context)
+        space.api = FakeApi()
+        space.personal_api = FakeApi()
+
+        space.api.webhooks.list.return_value = [
+            Fake(id='1', name='shellbot-rooms', targetUrl='*hook',
+                 resource='memberships', event='all', filter='personId=*bot'),
+            Fake(id='2', name='shellbot-rooms', targetUrl='*hook',
+                 resource='memberships', event='all', filter='personId=*bot'),
+        ]
+        space.personal_api.webhooks.list.return_value = [
+            Fake(id='3', name='shellbot-messages', targetUrl='*old',
+                 resource='messages', event='created'),
+            Fake(id='4', name='shellbot-participants', targetUrl='*hook',
+                 resource='memberships', event='all', status='inactive'),
+            Fake(id='5', name='my-own-hook', targetUrl='*elsewhere',
+                 resource='messages', event='all'),
+        ]
+        space.api.webhooks.update = mock.Mock()
+        space.api.webhooks.delete = mock.Mock()
+        space.personal_api.webhooks.update = mock.Mock()
+        space.personal_api.webhooks.delete = mock.Mock()
+
+        space.register('*hook')
+        self.assertFalse(space.api.webhooks.create.called)  # kept
+        space.api.webhooks.delete.assert_called_once_with(webhookId='2')
+        space.personal_api.webhooks.update.assert_called_once_with(
+            webhookId='3', name='shellbot-messages', targetUrl='*hook')
+        space.personal_api.webhooks.delete.assert_called_once_with(
+            webhookId='4')  # '5' is not managed by shellbot
+        space.personal_api.webhooks.create.assert_called_once_with(
+            name='shellbot-participants', targetUrl='*hook',
+            resource='memberships', event='all')
+
+        space.api.webhooks.list.return_value = []
+        self.assertEqual(space.reconcile('*hook'), 4)
+
+    def test_connect_shared(self):
+
+        logging.info("*** connect/shared")
+
+        def my_factory(access_token):
+            return FakeApi(access_token=access_token,
+                           me=FakeBot() if access_token == 'a'
+                           else FakePerson())
+
+        space = SparkSpace(context=my_context)
+        space.token = 'a'
+        space.personal_token = 'b'
+        space.connect(factory=my_factory)
+        self.assertEqual(space.api.people.me.call_count, 1)
+        self.assertEqual(space.personal_api.people.me.call_count, 1)
+
+        other = SparkSpace(context=my_context)
+        other.token = 'a'
+        other.personal_token = 'b'
+        other.connect(factory=my_factory)
+        self.assertTrue(other.api is space.api)
+        self.assertTrue(other.personal_api is space.personal_api)
+        self.assertEqual(space.api.people.me.call_count, 1)  # not called again
+        self.assertEqual(space.personal_api.people.me.call_count, 1)
+        self.assertEqual(my_context.get('bot.name'), 'shelly')
+        self.assertEqual(my_context.get('administrator.name'), 'Foo Bar')
+
+        other = SparkSpace(context=my_context)
+        other.token = 'c'
+        other.personal_token = 'b'
+        other.connect(factory=my_factory)
+        self.assertFalse(other.api is space.api)
+        self.assertTrue(other.personal_api is space.personal_api)
+
     def test_on_connect(self):
 
         logging.info("*** on_connect")
@@ -724,6 +883,114 @@ class SparkSpaceTests(unittest.TestCase):
         with self.assertRaises(Exception):
             print(my_ears.get_nowait())
 
+    def test_webhook_fetchers(self):
+
+        logging.info("*** webhook with fetchers")
+        my_context.set('spark.fetchers', 2)
+        space = SparkSpace(context=my_context, ears=my_ears)
+        space.personal_api = FakeApi()
+
+        notification = {'resource': 'messages',
+                        'event': 'created',
+                        'data': {'id': '*123'},
+                        'name': 'shellbot-messages'}
+        with mock.patch('shellbot.spaces.ciscospark.request') as request:
+            request.json = notification
+            self.assertEqual(space.webhook(), 'OK')
+            self.assertEqual(len(space.fetchers), 2)
+            self.assertEqual(space.webhook(), 'OK')
+            self.assertEqual(len(space.fetchers), 2)  # started only once
+
+        space.stop_fetchers()
+        self.assertEqual(space.fetchers, [])
+        self.assertEqual(space.personal_api.messages.get.call_count, 2)
+        for index in range(2):
+            self.assertEqual(yaml.safe_load(my_ears.get())['hook'],
+                             'shellbot-messages')
+        with self.assertRaises(Exception):
+            print(my_ears.get_nowait())
+        self.assertEqual(my_context.get('spark.fetchers.pending'), 0)
+
+    def test_fetchers_order(self):
+
+        logging.info("*** fetchers keep order of rooms")
+        my_context.set('spark.fetchers', 4)
+        space = SparkSpace(context=my_context, ears=my_ears)
+
+        def get(messageId):
+            time.sleep(0.01 if messageId.endswith('1') else 0.0)
+            return FakeMessage(_json={'text': messageId,
+                                      'roomId': messageId[:2]})
+
+        space.personal_api = FakeApi()
+        space.personal_api.messages.get = mock.Mock(side_effect=get)
+
+        with mock.patch('shellbot.spaces.ciscospark.request') as request:
+            for id in ('*a1', '*a2', '*b1', '*b2', '*a3'):
+                request.json = {'resource': 'messages',
+                                'event': 'created',
+                                'data': {'id': id, 'roomId': id[:2]},
+                                'name': 'shellbot-messages'}
+                self.assertEqual(space.webhook(), 'OK')
+
+        space.on_stop()  # pending notifications are fetched
+        self.assertEqual(space.fetchers, [])
+        self.assertEqual(my_context.get('spark.fetchers.pending'), 0)
+
+        texts = {}
+        for index in range(5):
+            item = yaml.safe_load(my_ears.get())
+            texts.setdefault(item['space_id'], []).append(item['text'])
+        self.assertEqual(texts, {'*a': ['*a1', '*a2', '*a3'],
+                                 '*b': ['*b1', '*b2']})
+
+        with mock.patch('shellbot.spaces.ciscospark.request') as request:
+            request.json = {'resource': 'messages',
+                            'event': 'created',
+                            'data': {'id': '*a4', 'roomId': '*a'},
+                            'name': 'shellbot-messages'}
+            self.assertEqual(space.webhook(), 'OK')  # handled synchronously
+        self.assertEqual(space.fetchers, [])
+        self.assertEqual(yaml.safe_load(my_ears.get())['text'], '*a4')
+
+        space.on_start()
+        self.assertFalse(my_context.get('spark.fetchers.stopping'))
+
+    def test_fetch_memberships(self):
+
+        logging.info("*** fetch memberships")
+        space = SparkSpace(context=my_context, ears=my_ears)
+        space.personal_api = FakeApi()
+        room = FakeRoom(_json={'title': '*title', 'type': 'group'})
+        space.personal_api.rooms.get = mock.Mock(return_value=room)
+
+        for index in range(3):  # e.g., a team is added to the room
+            space.fetch('memberships', 'created',
+                        {'roomId': '*id', 'personId': '*person'},
+                        'shellbot-memberships')
+        self.assertEqual(space.personal_api.rooms.get.call_count, 1)
+        for index in range(3):
+            item = yaml.safe_load(my_ears.get())
+            self.assertEqual(item['type'], 'join')
+            self.assertEqual(item['space_title'], '*title')
+
+        my_context.set('administrator.id', '*admin')
+        space.fetch('memberships', 'deleted',
+                    {'roomId': '*id', 'personId': '*admin'},
+                    'shellbot-memberships')
+        self.assertEqual(yaml.safe_load(my_ears.get())['type'], 'leave')
+        self.assertEqual(space.get_room_cache().get('*id'), None)
+        with self.assertRaises(Exception):
+            print(my_ears.get_nowait())
+
+        with mock.patch('shellbot.spaces.directory.RoomCache.put',
+                        side_effect=ValueError('Shared memory is full')):
+            space.fetch('memberships', 'created',
+                        {'roomId': '*other', 'personId': '*person'},
+                        'shellbot-memberships')
+        self.assertEqual(yaml.safe_load(my_ears.get())['space_title'],
+                         '*title')
+
     def test_pull(self):
 
         logging.info("*** pull")
@@ -758,6 +1025,53 @@ class SparkSpaceTests(unittest.TestCase):
         with self.assertRaises(Exception):
             print(my_ears.get_nowait())
 
+    def test_pull_rooms(self):
+
+        logging.info("*** pull rooms")
+        my_context.set('spark.pull.rooms', ['*a', '*b'])
+        my_context.set('spark.pull.min', 1.0)
+        my_context.set('spark.pull.max', 3.0)
+        space = SparkSpace(context=my_context, ears=my_ears)
+
+        def messages(room_id, count):
+            return [FakeMessage(id='{}-{}'.format(room_id, index),
+                                _json={'text': str(index), 'roomId': room_id})
+                    for index in reversed(range(count))]  # newest first
+
+        history = {'*a': messages('*a', 3), '*b': []}
+        space.api = FakeApi()
+        space.api.messages.list = mock.Mock(
+            side_effect=lambda roomId, **kwargs: iter(history[roomId]))
+
+        self.assertEqual(space.list_pulled_rooms(), ['*a', '*b'])
+        self.assertEqual(space.get_pull_interval(), 1.0)
+        self.assertEqual(space.pull(), 3)
+        self.assertEqual(space.get_pull_interval(), 1.0)
+        for index in range(3):  # oldest first
+            self.assertEqual(yaml.safe_load(my_ears.get())['text'], str(index))
+        self.assertEqual(space.get_cursor('*a'), '*a-2')
+        self.assertEqual(space.get_cursor('*b'), None)
+
+        self.assertEqual(space.pull(), 0)
+        self.assertEqual(space.get_pull_interval(), 2.0)
+        self.assertEqual(space.pull(), 0)
+        self.assertEqual(space.get_pull_interval(), 3.0)  # backing off
+
+        history['*a'] = messages('*a', 3 + 25)  # burst larger than a page
+        history['*b'] = messages('*b', 1)
+        self.assertEqual(space.pull(), 26)
+        self.assertEqual(space.get_pull_interval(), 1.0)
+        for index in range(3, 28):
+            self.assertEqual(yaml.safe_load(my_ears.get())['text'], str(index))
+        self.assertEqual(yaml.safe_load(my_ears.get())['space_id'], '*b')
+        with self.assertRaises(Exception):
+            print(my_ears.get_nowait())
+
+        restarted = SparkSpace(context=my_context, ears=my_ears)
+        restarted.api = space.api
+        restarted.cursors = space.cursors  # e.g., a sqlite store
+        self.assertEqual(restarted.pull(), 0)
+
     def test_on_message(self):
 
         logging.info("*** on_message")
@@ -790,23 +1104,38 @@ class SparkSpaceTests(unittest.TestCase):
 
         logging.info("*** download_attachment")
 
-        class MySpace(SparkSpace):
-            def name_attachment(self, url):
-                return 'some_file.pdf'
+        class MyResponse(object):
+            status_code = 200
+            headers = {'Content-Disposition': 'filename="some_file.pdf"'}
 
-            def get_attachment(self, url):
-                return b'hello world'
+            def iter_content(self, chunk_size):
+                return [b'hello ', b'world']
 
-        space = MySpace(context=my_context)
-        outcome = space.download_attachment(url='/dummy')
+            def close(self):
+                pass
 
+        session = Fake(get=mock.Mock(return_value=MyResponse()))
+        directory = tempfile.mkdtemp()
+
+        space = SparkSpace(context=my_context)
+        space.token = '*void'
+        space.downloader = Downloader(directory=directory, session=session)
+        outcome = space.download_attachment(url='/dummy')
+        self.assertEqual(os.path.basename(outcome), 'some_file.pdf')
         with open(outcome, "r+b") as handle:
-            self.assertEqual(handle.read(), space.get_attachment('/dummy'))
+            self.assertEqual(handle.read(), b'hello world')
+        self.assertEqual(session.get.call_args[1]['headers'],
+                         {'Authorization': 'Bearer *void'})
+
+        self.assertEqual(space.download_attachment(url='/dummy'), outcome)
+        self.assertEqual(session.get.call_count, 1)  # cached
+
+        paths = []
+        space.download_attachment(url='/other', callback=paths.append)
+        space.downloader.stop()
+        self.assertEqual(paths, [outcome])  # same content
 
-        try:
-            os.remove(outcome)
-        except:
-            pass
+        shutil.rmtree(directory, ignore_errors=True)
 
     def test_name_attachment(self):
 
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import gc
+import logging
+import mock
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath('../..'))
+
+from shellbot import Context
+from shellbot.spaces.directory import Directory, RoomCache
+
+
+class FakeRoom(object):
+    def __init__(self, id, title):
+        self.id = id
+        self.title = title
+
+
+class DirectoryTests(unittest.TestCase):
+
+    def tearDown(self):
+        collected = gc.collect()
+        logging.info("Garbage collector: collected %d objects." % (collected))
+
+    def test_init(self):
+
+        logging.info('*** init ***')
+
+        directory = Directory()
+        self.assertEqual(directory.ttl, Directory.TTL)
+        self.assertEqual(directory.rooms, {})
+        self.assertTrue(directory.is_stale())
+
+        directory = Directory(ttl=10)
+        self.assertEqual(directory.ttl, 10.0)
+
+    def test_get(self):
+
+        logging.info('*** get ***')
+
+        lister = mock.Mock(return_value=[FakeRoom('*a', 'A'),
+                                         FakeRoom('*b', 'B')])
+        directory = Directory()
+        self.assertEqual(directory.get('*a', lister=lister).title, 'A')
+        self.assertEqual(directory.lookup('B', lister=lister).id, '*b')
+        self.assertEqual(directory.get('*c', lister=lister), None)
+        self.assertEqual(directory.lookup('C', lister=lister), None)
+        self.assertEqual(lister.call_count, 1)  # listed only once
+        self.assertFalse(directory.is_stale())
+
+        directory.stamp = time.time() - directory.ttl - 1.0
+        self.assertTrue(directory.is_stale())
+        directory.get('*a', lister=lister)
+        self.assertEqual(lister.call_count, 2)  # listed again
+
+        lister.side_effect = Exception('TEST')
+        directory.clear()
+        with self.assertRaises(Exception):
+            directory.get('*a', lister=lister)
+        self.assertEqual(directory.get('*a'), None)
+
+    def test_put(self):
+
+        logging.info('*** put ***')
+
+        directory = Directory()
+        directory.put(FakeRoom('*a', 'A'))
+        self.assertEqual(directory.lookup('A').id, '*a')
+
+        directory.put(FakeRoom('*a', 'renamed'))
+        self.assertEqual(directory.lookup('A'), None)
+        self.assertEqual(directory.lookup('renamed').id, '*a')
+
+        directory.forget('*a')
+        self.assertEqual(directory.get('*a'), None)
+        self.assertEqual(directory.lookup('renamed'), None)
+        directory.forget('*unknown')
+
+    def test_room_cache(self):
+
+        logging.info('*** room cache ***')
+
+        context = Context()
+        cache = RoomCache(context, prefix='rooms')
+        self.assertEqual(cache.get('*a'), None)
+        self.assertEqual(cache.put('*a', 'A', 'group'),
+                         {'title': 'A', 'type': 'group'})
+        self.assertEqual(cache.get('*a'), {'title': 'A', 'type': 'group'})
+
+        other = RoomCache(context, prefix='rooms')  # e.g., another process
+        self.assertEqual(other.get('*a')['title'], 'A')
+
+        cache.rename('*a', 'renamed')
+        self.assertEqual(other.get('*a')['title'], 'renamed')
+        cache.rename('*unknown', 'ghost')
+        self.assertEqual(cache.get('*unknown'), None)
+
+        cache.put('*b', 'B', 'direct')
+        cache.put('*c', 'C', 'group')
+        self.assertEqual(context.get('rooms.*c')[:2], ['C', 'group'])
+        self.assertEqual(cache.get('*c')['type'], 'group')
+
+        cache.forget('*b')
+        self.assertEqual(cache.get('*b'), None)
+        cache.forget('*unknown')
+
+        cache.ttl = 0.01
+        time.sleep(0.02)
+        self.assertEqual(cache.get('*c'), None)
+
+    def test_room_cache_shared(self):
+
+        logging.info('*** room cache in shared memory ***')
+
+        context = Context(backend='shared')
+        cache = RoomCache(context, prefix='spark.rooms')
+        for index in range(500):
+            id = 'Y2lzY29zcGFyazovL3VzL1JPT00v{:036d}'.format(index)
+            cache.put(id, 'room #{}'.format(index), 'group')
+
+        self.assertEqual(cache.get(id)['title'], 'room #499')
+
+
+if __name__ == '__main__':
+
+    Context.set_logger()
+    sys.exit(unittest.main())
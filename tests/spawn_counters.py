@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Passes a context to a process that is spawned, as on macOS and Windows
+"""
+
+import multiprocessing
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shellbot import Context
+
+
+def count(context):
+    context.increment('listener.counter')
+
+
+if __name__ == '__main__':
+
+    multiprocessing.set_start_method('spawn')
+
+    context = Context()
+    context.increment('listener.counter')
+
+    p = multiprocessing.Process(target=count, args=(context,))
+    p.start()
+    p.join()
+
+    assert p.exitcode == 0
+    assert context.get('listener.counter') == 2
@@ -35,6 +35,21 @@ class MemoryStoreTests(unittest.TestCase):
         with self.assertRaises(AttributeError):
             self.assertEqual(store.weird, 'weird')
 
+    def test_suspend(self):
+
+        logging.info('***** suspend')
+
+        store = MemoryStore()
+        store.remember('hello', 'world')
+        archive = store.suspend()
+        self.assertEqual(archive, {'hello': '"world"'})
+
+        store = MemoryStore()
+        store.resume(None)
+        self.assertEqual(store.recall('hello'), None)
+        store.resume(archive)
+        self.assertEqual(store.recall('hello'), 'world')
+
     def test__set(self):
 
         logging.info('***** _set')
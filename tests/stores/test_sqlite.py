@@ -5,7 +5,9 @@ import unittest
 import logging
 import os
 import random
+import sqlite3
 import sys
+import tempfile
 
 sys.path.insert(0, os.path.abspath('..'))
 
@@ -141,6 +143,135 @@ class SqliteStoreTests(unittest.TestCase):
         store._set(u'hello', u'wôrld')
         self.assertEqual(store._get(u'hello'), u'wôrld')
 
+    def test_get_db(self):
+
+        logging.info('***** get_db')
+
+        my_context.set('sqlite.synchronous', 'full')
+        store = SqliteStore(context=my_context, db=my_db_name)
+        handle = store.get_db()
+        self.assertTrue(store.get_db() is handle)  # reused
+        self.assertEqual(
+            handle.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+        self.assertEqual(
+            handle.execute("PRAGMA synchronous").fetchone()[0], 2)
+
+        other = SqliteStore(context=my_context, db=my_db_name, id='*other')
+        other._set('shared', 'other')
+        store._set('shared', 'mine')
+        self.assertEqual(store._get('shared'), 'mine')
+        self.assertEqual(other._get('shared'), 'other')  # same key, other space
+        other._clear()
+        store._clear()
+
+    def test_increment(self):
+
+        logging.info('***** increment')
+
+        store = SqliteStore(context=my_context, db=my_db_name, id='*counter')
+        store.bond()
+        store.forget()
+
+        self.assertEqual(store.increment('gauge'), 1)
+        self.assertEqual(store.increment('gauge', 10), 11)
+        self.assertEqual(store.decrement('gauge', 2), 9)
+        self.assertEqual(store.recall('gauge'), 9)
+
+        store.remember('gauge', 'not a number')
+        self.assertEqual(store.increment('gauge'), 1)
+        store._set('gauge', 'not json')
+        self.assertEqual(store.decrement('gauge'), -1)
+
+        other = SqliteStore(context=my_context, db=my_db_name, id='*counter')
+        other.increment('gauge', 3)  # e.g., from another process
+        self.assertEqual(store.recall('gauge'), 2)
+        store.forget()
+
+    def test_append(self):
+
+        logging.info('***** append')
+
+        store = SqliteStore(context=my_context, db=my_db_name, id='*list')
+        store.bond()
+        store.forget()
+
+        store.append('names', 'Alice')
+        store.append('names', {'name': 'Bob'})
+        self.assertEqual(store.recall('names'), ['Alice', {'name': 'Bob'}])
+
+        store.remember('names', ['Carol'])  # items are overwritten
+        store.append('names', 'Dave')
+        self.assertEqual(store.recall('names'), ['Carol', 'Dave'])
+
+        store.remember('names', 'not a list')
+        store.append('names', 'Eve')
+        self.assertEqual(store.recall('names'), ['Eve'])
+
+        store.forget('names')
+        self.assertEqual(store.recall('names'), None)
+        store.append('names', 'Frank')
+        store.increment('names')  # not a list anymore
+        self.assertEqual(store.recall('names'), 1)
+        store.forget()
+
+    def test_update(self):
+
+        logging.info('***** update')
+
+        store = SqliteStore(context=my_context, db=my_db_name, id='*dict')
+        store.bond()
+        store.forget()
+
+        store.update('input', 'PO Number', '1234A')
+        store.update('input', 'amount', 12)
+        store.update('input', 'lines', [{'a': 1}])
+        store.update('input', 'PO Number', '5678B')
+        store.update('input', 'with "quotes"', True)
+        self.assertEqual(store.recall('input'), {'PO Number': '5678B',
+                                                 'amount': 12,
+                                                 'lines': [{'a': 1}],
+                                                 'with "quotes"': True})
+
+        store.remember('input', ['not', 'a', 'dict'])
+        store.update('input', 'key', 'value')
+        self.assertEqual(store.recall('input'), {'key': 'value'})
+
+        store.append('input', 'item')
+        store.update('input', 'key', 'value')
+        self.assertEqual(store.recall('input'), {'key': 'value'})
+        store.forget()
+
+    def test_upgrade(self):
+
+        logging.info('***** upgrade')
+
+        (handle, name) = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        try:
+            handle = sqlite3.connect(name)
+            handle.execute("CREATE TABLE store \
+                (id INTEGER PRIMARY KEY, \
+                context TEXT, \
+                key TEXT UNIQUE, \
+                value TEXT)")
+            handle.execute("INSERT INTO store (context,key,value) "
+                           "VALUES ('*id', 'hello', '\"world\"')")
+            handle.commit()
+            handle.close()
+
+            store = SqliteStore(context=my_context, db=name)
+            store.bond()
+            self.assertEqual(store.recall('hello'), 'world')
+            store.remember('hello', 'again')
+            self.assertEqual(store.recall('hello'), 'again')
+
+        finally:
+            for suffix in ('', '-wal', '-shm'):
+                try:
+                    os.remove(name + suffix)
+                except OSError:
+                    pass
+
 
 if __name__ == '__main__':
 
@@ -171,6 +171,31 @@ class BotTests(unittest.TestCase):
             my_bot.dispose()
             mocked.assert_called_with(title='Collaboration space')
 
+    def test_suspend(self):
+
+        logging.info('*** suspend ***')
+
+        store = MemoryStore(context=my_context)
+        bot = ShellBot(engine=my_engine, space=my_space, store=store)
+        self.assertFalse(bot.is_active())
+
+        bot.machine = mock.Mock()
+        bot.machine.mutables = {'state': 'waiting', 'answer': 42}
+        bot.machine.is_running = mock.Mock(return_value=True)
+        self.assertTrue(bot.is_active())
+
+        bot.remember('a', 'b')
+        archive = bot.suspend()
+
+        store = MemoryStore(context=my_context)
+        bot = ShellBot(engine=my_engine, space=my_space, store=store)
+        bot.machine = mock.Mock()
+        bot.machine.mutables = {'state': 'begin'}
+        bot.resume(archive)
+        self.assertEqual(bot.recall('a'), 'b')
+        self.assertEqual(bot.machine.mutables,
+                         {'state': 'waiting', 'answer': 42})
+
     def test_say(self):
 
         logging.info('*** say ***')
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import gc
+import logging
+import mock
+from multiprocessing import Queue
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath('..'))
+
+from shellbot import Context, Engine
+from shellbot.consumer import Consumer
+
+
+class MyConsumer(Consumer):
+    def __init__(self, engine):
+        self.engine = engine
+
+
+class ConsumerTests(unittest.TestCase):
+
+    def tearDown(self):
+        collected = gc.collect()
+        logging.info("Garbage collector: collected %d objects." % (collected))
+
+    def test_drain(self):
+
+        logging.info("*** drain")
+
+        consumer = MyConsumer(engine=Engine())
+        consumer.WAIT_DURATION = 0.01
+        consumer.BATCH_SIZE = 3
+
+        queue = Queue()
+        self.assertEqual(consumer.drain(queue), [])
+
+        for item in ['a', 'b', 'c', 'd']:
+            queue.put(item)
+        time.sleep(0.05)  # let the feeder thread do its job
+
+        self.assertEqual(consumer.drain(queue), ['a', 'b', 'c'])
+        self.assertEqual(consumer.drain(queue), ['d'])
+
+        # stop on poison pill
+        for item in ['e', None, 'f']:
+            queue.put(item)
+        time.sleep(0.05)
+        self.assertEqual(consumer.drain(queue), ['e', None])
+        self.assertEqual(consumer.drain(queue), ['f'])
+
+    def test_consume(self):
+
+        logging.info("*** consume")
+
+        engine = Engine()
+        engine.set('general.switch', 'on')
+        consumer = MyConsumer(engine=engine)
+        consumer.WAIT_DURATION = 0.01
+
+        queue = Queue()
+        for item in ['a', 'b', 'c', None, 'd']:
+            queue.put(item)
+
+        handler = mock.Mock(side_effect=[None, Exception('TEST'), None])
+        self.assertTrue(consumer.consume(queue, handler))
+        self.assertEqual(handler.call_count, 3)
+        self.assertEqual(queue.get(), 'd')
+
+        # stop on general switch
+        engine.set('general.switch', 'off')
+        handler = mock.Mock()
+        self.assertFalse(consumer.consume(queue, handler))
+        self.assertFalse(handler.called)
+
+    def test_consume_ack(self):
+
+        logging.info("*** consume/ack")
+
+        engine = Engine()
+        engine.set('general.switch', 'on')
+        consumer = MyConsumer(engine=engine)
+        consumer.WAIT_DURATION = 0.01
+
+        queue = Queue()
+        for item in ['a', 'b', None]:
+            queue.put(item)
+        queue.ack = mock.Mock()
+
+        handler = mock.Mock(side_effect=[None, Exception('TEST')])
+        self.assertTrue(consumer.consume(queue, handler))
+        queue.ack.assert_called_once_with(3)
+
+
+if __name__ == '__main__':
+
+    Context.set_logger()
+    sys.exit(unittest.main())
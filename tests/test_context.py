@@ -30,6 +30,17 @@ class ContextTests(unittest.TestCase):
         self.assertEqual(context.get('bot.name'), 'testy')
         self.assertEqual(context.get('bot.version'), '17.4.1')
 
+    def test_init_backend(self):
+
+        context = Context(backend='shared')
+        self.assertEqual(context.backend, 'shared')
+        context.set('general.switch', 'on')
+        self.assertEqual(context.get('general.switch'), 'on')
+        self.assertTrue(context.has('general'))
+
+        with self.assertRaises(ValueError):
+            Context(backend='*unknown')
+
     def test_init_filter(self):
 
         context = Context(filter=lambda x, y : x + '...')
@@ -233,6 +244,41 @@ class ContextTests(unittest.TestCase):
         # undefined 2-level prefix
         self.assertFalse(context.has('.token'))
 
+        # index is updated on change
+        context.set('hello.world', True)
+        self.assertTrue(context.has('hello'))
+        context.clear()
+        self.assertFalse(context.has('hello'))
+        self.assertFalse(context.has('spark'))
+
+    def test_has_concurrency(self):
+
+        from multiprocessing import Process
+
+        def worker(context, key):
+            context.set(key, True)
+
+        for context in (Context(), Context(backend='shared')):
+            context.set('spark.room', 'title')
+            self.assertTrue(context.has('spark'))
+            self.assertFalse(context.has('sqlite'))
+
+            p = Process(target=worker, args=(context, 'sqlite.db'))
+            p.start()
+            p.join()
+
+            self.assertTrue(context.has('sqlite'))
+            self.assertTrue(context.has('sqlite.db'))
+
+            context.clear()
+            self.assertFalse(context.has('sqlite'))
+
+            p = Process(target=worker, args=(context, 'spark.room'))
+            p.start()
+            p.join()
+
+            self.assertTrue(context.has('spark'))
+
     def test_getter(self):
 
         context = my_context
@@ -271,6 +317,53 @@ class ContextTests(unittest.TestCase):
         context.set(u'hello', u'wôrld')
         self.assertEqual(context.get(u'hello'), u'wôrld')
 
+    def test_many(self):
+
+        for context in (my_context, Context(backend='shared')):
+            context.clear()
+
+            context.set_many({'bot.id': '123', 'bot.name': 'Shelly'})
+            self.assertEqual(context.get('bot.id'), '123')
+            self.assertEqual(context.get('bot.name'), 'Shelly')
+
+            values = context.get_many(['bot.id', 'bot.name', 'bot.unknown'])
+            self.assertEqual(values, {'bot.id': '123',
+                                      'bot.name': 'Shelly',
+                                      'bot.unknown': None})
+
+            values = context.get_many(['bot.unknown'], default='*void')
+            self.assertEqual(values, {'bot.unknown': '*void'})
+
+            context.set_many({})
+
+    def test_transaction(self):
+
+        for context in (my_context, Context(backend='shared')):
+            context.clear()
+            context.set_many({'a': 1, 'b': 2, 'c': 3})
+
+            with context.transaction() as values:
+                values['a'] = values['b'] + values['c']
+                values['d'] = 4
+                del values['c']
+
+            self.assertEqual(context.get('a'), 5)
+            self.assertEqual(context.get('b'), 2)
+            self.assertEqual(context.get('c'), None)
+            self.assertEqual(context.get('d'), 4)
+
+            # nothing is changed on exception
+            with self.assertRaises(ValueError):
+                with context.transaction() as values:
+                    values['a'] = 0
+                    raise ValueError()
+
+            self.assertEqual(context.get('a'), 5)
+
+            # context is not locked anymore
+            context.set('a', 6)
+            self.assertEqual(context.get('a'), 6)
+
     def test_increment(self):
 
         context = my_context
@@ -286,6 +379,22 @@ class ContextTests(unittest.TestCase):
         value = context.increment('gauge')
         self.assertEqual(value, 1)
 
+    def test_counters(self):
+
+        context = Context(counters=['my.gauge'])
+        self.assertEqual(context.get('listener.counter'), 0)
+        self.assertEqual(context.increment('listener.counter'), 1)
+        self.assertEqual(context.increment('my.gauge', 3), 3)
+        self.assertEqual(context.decrement('my.gauge'), 2)
+        self.assertEqual(context.get_many(['my.gauge']), {'my.gauge': 2})
+
+        context.set('my.gauge', 0)
+        self.assertEqual(context.get('my.gauge'), 0)
+
+        context.increment('my.gauge')
+        context.clear()
+        self.assertEqual(context.get('my.gauge'), 0)
+
     def test_decrement(self):
 
         context = my_context
@@ -332,6 +441,42 @@ class ContextTests(unittest.TestCase):
         context.set('gauge', 123)
         self.assertEqual(context.get('gauge'), 123)
 
+    def test_watch(self):
+
+        from multiprocessing import Process
+        import time
+
+        context = Context()
+        context.set('general.switch', 'on')
+
+        # nothing changes until time out
+        started = time.time()
+        value = context.watch('general.switch', 'on', timeout=0.05)
+        self.assertEqual(value, 'on')
+        self.assertTrue(time.time() - started >= 0.05)
+
+        # value is already different
+        self.assertEqual(context.watch('general.switch', 'off'), 'on')
+
+        # default value is used for missing keys
+        self.assertEqual(context.watch('*unknown', 'on',
+                                       timeout=0.01, default='on'), 'on')
+
+        # change from another process
+        def switch(context):
+            time.sleep(0.1)
+            context.set('general.switch', 'off')
+
+        p = Process(target=switch, args=(context,))
+        p.start()
+
+        started = time.time()
+        value = context.watch('general.switch', 'on', timeout=5.0)
+        self.assertEqual(value, 'off')
+        self.assertTrue(time.time() - started < 5.0)
+
+        p.join()
+
     def test_concurrency(self):
 
         from multiprocessing import Process
@@ -363,6 +508,29 @@ class ContextTests(unittest.TestCase):
         logging.info('Counter: %d' % self.counter.get('gauge'))
         self.assertEqual(self.counter.get('gauge'), 16)
 
+    def test_concurrency_shared(self):
+
+        from multiprocessing import Process
+
+        def worker(id, context):
+            for i in range(10):
+                context.increment('gauge')
+                context.set('worker.{}'.format(id), i)
+
+        context = Context(backend='shared')
+
+        workers = []
+        for i in range(4):
+            p = Process(target=worker, args=(i, context,))
+            p.start()
+            workers.append(p)
+
+        for p in workers:
+            p.join()
+
+        self.assertEqual(context.get('gauge'), 40)
+        self.assertEqual(context.get('worker.3'), 9)
+
 
 if __name__ == '__main__':
 
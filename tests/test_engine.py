@@ -7,13 +7,16 @@ import logging
 import os
 import mock
 from multiprocessing import Manager, Process, Queue
+import shutil
 import sys
+import tempfile
 import time
 
 sys.path.insert(0, os.path.abspath('..'))
 
 from shellbot import Context, Engine, ShellBot
 from shellbot.spaces import Space, LocalSpace, SparkSpace
+from shellbot.spool import Spool
 
 my_context = Context()
 my_engine = Engine(context=my_context,
@@ -570,6 +573,77 @@ class EngineTests(unittest.TestCase):
         self.assertTrue(engine.start_processes.called)
         self.assertTrue(engine.on_start.called)
 
+    def test_get_worker(self):
+
+        logging.info('*** get_worker ***')
+
+        engine = Engine(context=Context(), inbox=Queue())
+        self.assertEqual(engine.get_worker('*id'), engine.worker)
+
+        engine.configure_from_dict({'worker.pool': 4})
+        engine.build_workers()
+        self.assertEqual(len(engine.workers), 4)
+        self.assertTrue(engine.workers[0].get_inbox() is engine.inbox)
+        self.assertEqual(len(set([x.get_inbox() for x in engine.workers])), 4)
+
+        selected = set()
+        for space_id in ['*id{}'.format(index) for index in range(50)]:
+            worker = engine.get_worker(space_id)
+            self.assertEqual(engine.get_worker(space_id), worker)
+            selected.add(worker.index)
+        self.assertTrue(len(selected) > 1)
+
+    def test_build_queue(self):
+
+        logging.info('*** build_queue ***')
+
+        engine = Engine(context=Context())
+        queue = engine.build_queue('mouth')
+        self.assertEqual(queue.name, 'mouth')
+        self.assertEqual(queue.size, 0)
+        self.assertFalse(isinstance(queue.queue, Spool))
+
+        engine.configure_from_dict({'queue.inbox.size': 2,
+                                    'queue.inbox.overflow': 'drop_newest'})
+        queue = engine.build_queue('inbox.1')
+        self.assertEqual(queue.size, 2)
+        self.assertEqual(queue.overflow, 'drop_newest')
+
+        directory = tempfile.mkdtemp()
+        try:
+            engine.set('general.spool', directory)
+            queue = engine.build_queue('mouth')
+            self.assertTrue(isinstance(queue.queue, Spool))
+            self.assertEqual(queue.queue.path,
+                             os.path.join(directory, 'mouth.db'))
+
+        finally:
+            shutil.rmtree(directory)
+
+    def test_on_drop(self):
+
+        logging.info('*** on_drop ***')
+
+        engine = Engine(context=Context(), mouth=Queue())
+        engine.configure_from_dict({'queue.inbox.size': 1,
+                                    'queue.inbox.overflow': 'reply'})
+        engine.inbox = engine.build_queue('inbox')
+        engine.build_workers()
+        engine.get_bot = mock.Mock(return_value=FakeBot())
+        engine.get_bot.return_value.say = mock.Mock()
+
+        engine.worker.push(('sleep', '1', '*id'))
+        engine.worker.push(('sleep', '2', '*id'))
+        engine.get_bot.return_value.say.assert_called_once_with(
+            engine.BUSY_MESSAGE)
+        self.assertEqual(engine.get('worker.0.depth'), 1)
+
+        engine.ears = engine.build_queue('ears')
+        gauges = engine.get_gauges()
+        self.assertEqual(gauges['inbox.depth'], 1)
+        self.assertEqual(gauges['inbox.dropped'], 1)
+        self.assertEqual(gauges['ears.depth'], 0)
+
     def test_static(self):
 
         logging.info('*** static test ***')
@@ -612,6 +686,47 @@ class EngineTests(unittest.TestCase):
             self.assertEqual(bot.space_id, '*bot')
             self.assertTrue('*bot' in my_engine.bots.keys())
 
+    def test_evict_bots(self):
+
+        logging.info('*** evict_bots ***')
+
+        class MyBot(FakeBot):
+            archive = None
+            def is_active(self):
+                return self.space_id == '*active'
+            def suspend(self):
+                return {'id': self.space_id}
+            def resume(self, archive):
+                self.archive = archive
+
+        engine = Engine(context=Context())
+        engine.build_bot = lambda id: MyBot(engine, id)
+        engine.configure_from_dict({'bots.size': 2, 'bots.idle': 3600})
+
+        counter = MyCounter('evict')
+        counter.on_evict = mock.Mock()
+        engine.subscribe('evict', counter)
+
+        engine.get_bot('*active')
+        engine.get_bot('123')
+        engine.get_bot('456')  # '*active' is not evicted
+        self.assertEqual(list(engine.bots.keys()), ['*active', '456'])
+        self.assertEqual(engine.archives, {'123': {'id': '123'}})
+        self.assertEqual(counter.on_evict.call_count, 1)
+
+        engine.get_bot('456')  # used recently
+        engine.get_bot('789')
+        self.assertEqual(list(engine.bots.keys()), ['*active', '789'])
+
+        bot = engine.get_bot('123')  # resumed transparently
+        self.assertEqual(bot.archive, {'id': '123'})
+        self.assertFalse('123' in engine.archives.keys())
+
+        engine.set('bots.size', 10)
+        engine.set('bots.idle', 0.0)
+        engine.get_bot('007')  # all other bots are idle
+        self.assertEqual(list(engine.bots.keys()), ['*active', '007'])
+
     def test_build_bot(self):
 
         logging.info('*** build_bot ***')
@@ -644,6 +759,12 @@ class EngineTests(unittest.TestCase):
         my_engine.context.apply(my_engine.DEFAULT_SETTINGS)
         space = my_engine.build_space('123')
 
+        # type of space is sensed only once
+        self.assertEqual(my_engine.space_type, 'spark')
+        with mock.patch('shellbot.engine.SpaceFactory.sense') as mocked:
+            my_engine.build_space('456')
+            self.assertFalse(mocked.called)
+
     def test_build_store(self):
 
         logging.info('*** build_store ***')
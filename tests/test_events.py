@@ -14,6 +14,7 @@ sys.path.insert(0, os.path.abspath('..'))
 
 from shellbot import Context
 from shellbot.events import Event, Message, Attachment, Join, Leave
+from shellbot.events import Codec, PickleCodec
 
 my_queue = Queue()
 
@@ -251,6 +252,38 @@ class EventsTests(unittest.TestCase):
         with self.assertRaises(AttributeError):
             value = event.space_id
 
+    def test_codec(self):
+
+        with self.assertRaises(ValueError):
+            Codec.get('*unknown*codec')
+
+        item = {
+              "text" : "/plumby use containers/docker",
+              "from_id" : "Y2lzY29zcGFyjOGRkLTQ3MjctOGIyZi1mOWM0NDdmMjkwNDY",
+              "mentioned_ids" : ["Y2lzYDMzLTRmYTUtYTcyYS1jYzg5YjI1ZWVlMmX"],
+            }
+        expected = item.copy()
+        expected['type'] = 'message'
+
+        codec = Codec.get('json')
+        self.assertEqual(codec.name, 'json')
+        encoded = codec.encode(Message(item))
+        self.assertEqual(encoded, str(Message(item)))
+        self.assertEqual(codec.decode(encoded), expected)
+        self.assertEqual(codec.decode(expected), expected)
+        self.assertEqual(codec.decode("hello: world"), {'hello': 'world'})
+
+        codec = Codec.get('pickle')
+        self.assertTrue(isinstance(codec, PickleCodec))
+        encoded = codec.encode(Message(item))
+        self.assertTrue(isinstance(encoded, bytes))
+        self.assertEqual(codec.decode(encoded), expected)
+        self.assertEqual(codec.decode(str(Message(item))), expected)
+
+        my_queue.put(codec.encode(Join({'actor_id': '*id'})))
+        after = Join(codec.decode(my_queue.get()))
+        self.assertEqual(after.actor_id, '*id')
+
 
 if __name__ == '__main__':
 
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import gc
+import logging
+import mock
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath('..'))
+
+from shellbot import Context
+from shellbot.limiter import TokenBucket, Limiter
+
+
+class LimiterTests(unittest.TestCase):
+
+    def tearDown(self):
+        collected = gc.collect()
+        logging.info("Garbage collector: collected %d objects." % (collected))
+
+    def test_bucket(self):
+
+        logging.info('*** bucket ***')
+
+        bucket = TokenBucket(rate=10.0, burst=2)
+        now = bucket.stamp = 1000.0
+        self.assertEqual(bucket.delay(now), 0.0)
+        bucket.take()
+        self.assertEqual(bucket.delay(now), 0.0)
+        bucket.take()
+        self.assertAlmostEqual(bucket.delay(now), 0.1)
+        self.assertAlmostEqual(bucket.delay(now + 0.05), 0.05)
+        self.assertEqual(bucket.delay(now + 0.1), 0.0)
+        self.assertAlmostEqual(bucket.delay(now + 10.0), 0.0)
+        self.assertEqual(bucket.tokens, 2.0)  # capped
+        self.assertTrue(bucket.is_full())
+
+    def test_acquire(self):
+
+        logging.info('*** acquire ***')
+
+        context = Context()
+        limiter = Limiter(rate=100.0, burst=2, context=context, prefix='l')
+        self.assertEqual(limiter.acquire('a'), 0.0)
+        self.assertEqual(limiter.acquire('a'), 0.0)
+        self.assertTrue(limiter.acquire('a') > 0.0)  # per-target bucket
+        self.assertEqual(limiter.acquire('b'), 0.0)
+        self.assertEqual(context.get('l.waits'), 1)
+        self.assertEqual(limiter.state()['targets'], 2)
+
+        limiter = Limiter(rate=1000.0, global_rate=100.0, global_burst=1)
+        self.assertEqual(limiter.acquire('a'), 0.0)
+        self.assertTrue(limiter.acquire('b') > 0.0)  # global bucket
+
+        limiter = Limiter(rate=1000.0, burst=1, global_rate=1000.0)
+        limiter.MAX_BUCKETS = 3
+        for key in range(3):
+            limiter.acquire(key)
+        self.assertEqual(len(limiter.buckets), 3)
+        time.sleep(0.01)  # buckets are refilled
+        limiter.acquire('*new')
+        self.assertEqual(list(limiter.buckets.keys()), ['*new'])
+
+    def test_acquire_threads(self):
+
+        logging.info('*** acquire with threads ***')
+
+        limiter = Limiter(rate=1000.0, burst=1,
+                          global_rate=200.0, global_burst=1)
+
+        def take():
+            for index in range(10):
+                limiter.acquire(index)
+
+        start = time.time()
+        threads = [threading.Thread(target=take) for index in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(time.time() - start > 0.15)  # 40 requests at 200/s
+
+    def test_postpone(self):
+
+        logging.info('*** postpone ***')
+
+        context = Context()
+        limiter = Limiter(context=context, prefix='l')
+        limiter.postpone(0.05)
+        self.assertTrue(limiter.state()['suspended'] > 0.0)
+        self.assertTrue(limiter.acquire('a') >= 0.04)
+        self.assertEqual(limiter.state()['suspended'], 0.0)
+        self.assertEqual(context.get('l.postpones'), 1)
+
+    def test_backoff(self):
+
+        logging.info('*** backoff ***')
+
+        context = Context()
+        limiter = Limiter(context=context, prefix='l')
+        for attempt in range(1, 10):
+            delay = limiter.backoff(attempt)
+            expected = min(limiter.BACKOFF_LIMIT,
+                           limiter.BACKOFF_DELAY * 2 ** (attempt - 1))
+            self.assertTrue(expected / 2 <= delay <= expected)
+        self.assertEqual(context.get('l.retries'), 9)
+
+        limiter.drop()
+        self.assertEqual(context.get('l.drops'), 1)
+
+
+if __name__ == '__main__':
+
+    Context.set_logger()
+    sys.exit(unittest.main())
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import gc
+import logging
+import mock
+from multiprocessing import Process, Queue
+import os
+from six.moves.queue import Empty
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath('..'))
+
+from shellbot import Context
+from shellbot.queues import BoundedQueue
+
+
+def consume(queue, count):
+    for index in range(count):
+        time.sleep(0.01)
+        queue.get()
+
+
+class BoundedQueueTests(unittest.TestCase):
+
+    def tearDown(self):
+        collected = gc.collect()
+        logging.info("Garbage collector: collected %d objects." % (collected))
+
+    def test_init(self):
+
+        logging.info('*** init ***')
+
+        queue = BoundedQueue(Queue())
+        self.assertEqual(queue.size, 0)
+        self.assertEqual(queue.overflow, 'block')
+        self.assertTrue(queue.empty())
+
+        with self.assertRaises(ValueError):
+            BoundedQueue(Queue(), overflow='*unknown')
+
+    def test_unbounded(self):
+
+        logging.info('*** unbounded ***')
+
+        queue = BoundedQueue(Queue(), name='mouth')
+        for index in range(100):
+            self.assertTrue(queue.put(index))
+        self.assertEqual(queue.qsize(), 100)
+        self.assertEqual(queue.get(), 0)
+        self.assertEqual(queue.gauges(),
+                         {'mouth.depth': 99, 'mouth.dropped': 0})
+
+    def test_block(self):
+
+        logging.info('*** block ***')
+
+        queue = BoundedQueue(Queue(), size=2)
+        queue.put('a')
+        queue.put('b')
+
+        process = Process(target=consume, args=(queue, 2))
+        process.start()
+        start = time.time()
+        queue.put('c')  # waits for the consumer
+        self.assertTrue(time.time() - start >= 0.005)
+        process.join()
+
+        self.assertEqual(queue.get(True, 1.0), 'c')
+        self.assertTrue(queue.empty())
+
+    def test_drop_newest(self):
+
+        logging.info('*** drop_newest ***')
+
+        on_drop = mock.Mock()
+        queue = BoundedQueue(Queue(), name='ears', size=2,
+                             overflow='drop_newest', on_drop=on_drop)
+        self.assertTrue(queue.put('a'))
+        self.assertTrue(queue.put('b'))
+        self.assertFalse(queue.put('c'))
+        on_drop.assert_called_once_with('c')
+        self.assertEqual(queue.gauges(), {'ears.depth': 2, 'ears.dropped': 1})
+
+        self.assertEqual(queue.get(), 'a')
+        self.assertEqual(queue.get(), 'b')
+        with self.assertRaises(Empty):
+            queue.get_nowait()
+
+    def test_drop_oldest(self):
+
+        logging.info('*** drop_oldest ***')
+
+        on_drop = mock.Mock()
+        queue = BoundedQueue(Queue(), size=2,
+                             overflow='drop_oldest', on_drop=on_drop)
+        queue.put('a')
+        queue.put('b')
+        self.assertFalse(queue.put('c'))
+        on_drop.assert_called_once_with('a')
+        self.assertEqual(queue.qsize(), 2)
+
+        self.assertEqual(queue.get(), 'b')
+        self.assertEqual(queue.get(), 'c')
+
+
+if __name__ == '__main__':
+
+    Context.set_logger()
+    sys.exit(unittest.main())
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import gc
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath('..'))
+
+from shellbot import Context
+from shellbot.shared import SharedDict, SharedCounters
+
+
+class SharedDictTests(unittest.TestCase):
+
+    def tearDown(self):
+        collected = gc.collect()
+        logging.info("Garbage collector: collected %d objects." % (collected))
+
+    def test_init(self):
+
+        values = SharedDict()
+        self.assertEqual(values.shards, SharedDict.SHARDS)
+        self.assertEqual(values.size, SharedDict.SHARD_SIZE)
+        self.assertEqual(len(values), 0)
+        self.assertEqual(values.keys(), [])
+
+        values = SharedDict(shards=2, size=1024)
+        self.assertEqual(values.shards, 2)
+        self.assertEqual(values.size, 1024)
+
+    def test_getter(self):
+
+        values = SharedDict()
+
+        self.assertEqual(values.get('hello'), None)
+        self.assertEqual(values.get('hello', 'whatever'), 'whatever')
+        self.assertFalse('hello' in values)
+        with self.assertRaises(KeyError):
+            values['hello']
+
+        values['hello'] = 'world'
+        self.assertEqual(values.get('hello'), 'world')
+        self.assertEqual(values['hello'], 'world')
+        self.assertTrue('hello' in values)
+
+        values[u'hello'] = u'wôrld'
+        self.assertEqual(values.get('hello'), u'wôrld')
+
+        del values['hello']
+        self.assertEqual(values.get('hello'), None)
+
+    def test_copy(self):
+
+        values = SharedDict()
+        values['list'] = ['a', 'b']
+
+        fetched = values.get('list')
+        fetched.append('c')
+        self.assertEqual(values.get('list'), ['a', 'b'])
+
+    def test_update(self):
+
+        values = SharedDict(shards=3)
+        values.update({'a': 1, 'b': 2, 'c': 3, 'd': 4})
+        self.assertEqual(len(values), 4)
+        self.assertEqual(sorted(values.keys()), ['a', 'b', 'c', 'd'])
+        self.assertEqual(values.get('c'), 3)
+
+        values.clear()
+        self.assertEqual(len(values), 0)
+        self.assertEqual(values.get('c'), None)
+
+    def test_full(self):
+
+        values = SharedDict(shards=1, size=64)
+        with self.assertRaises(ValueError):
+            values['big'] = 'x' * 100
+
+    def test_concurrency(self):
+
+        from multiprocessing import Process
+
+        def worker(id, values):
+            for i in range(20):
+                with values.lock_for('gauge'):
+                    values['gauge'] = values.get('gauge', 0) + 1
+                values['worker.{}'.format(id)] = i
+
+        values = SharedDict()
+
+        workers = []
+        for i in range(4):
+            p = Process(target=worker, args=(i, values,))
+            p.start()
+            workers.append(p)
+
+        for p in workers:
+            p.join()
+
+        self.assertEqual(values.get('gauge'), 80)
+        for i in range(4):
+            self.assertEqual(values.get('worker.{}'.format(i)), 19)
+
+
+class SharedCountersTests(unittest.TestCase):
+
+    def test_init(self):
+
+        counters = SharedCounters(names=['a', 'b', 'a'])
+        self.assertEqual(sorted(counters.names.keys()), ['a', 'b'])
+        self.assertEqual(counters.slots, SharedCounters.SLOTS)
+        self.assertTrue('a' in counters)
+        self.assertFalse('c' in counters)
+
+    def test_counters(self):
+
+        counters = SharedCounters(names=['a', 'b'])
+        self.assertEqual(counters.get('a'), 0)
+
+        counters.increment('a')
+        counters.increment('a', 4)
+        counters.increment('b', -2)
+        self.assertEqual(counters.get('a'), 5)
+        self.assertEqual(counters.get('b'), -2)
+
+        counters.set('a', 10)
+        self.assertEqual(counters.get('a'), 10)
+        counters.increment('a')
+        self.assertEqual(counters.get('a'), 11)
+
+        counters.clear()
+        self.assertEqual(counters.get('a'), 0)
+        self.assertEqual(counters.get('b'), 0)
+
+        with self.assertRaises(KeyError):
+            counters.increment('*unknown')
+
+    def test_concurrency(self):
+
+        from multiprocessing import Process
+
+        def worker(counters):
+            for i in range(100):
+                counters.increment('gauge')
+
+        # more processes than slots, to use the common slot as well
+        counters = SharedCounters(names=['gauge'], slots=3)
+        counters.increment('gauge')
+
+        workers = []
+        for i in range(5):
+            p = Process(target=worker, args=(counters,))
+            p.start()
+            workers.append(p)
+
+        for p in workers:
+            p.join()
+
+        self.assertEqual(counters.get('gauge'), 501)
+
+    def test_spawn(self):
+
+        import multiprocessing
+        import subprocess
+
+        counters = SharedCounters(names=['a'])
+        counters.increment('a')
+        state = counters.__getstate__()
+        self.assertEqual(state['_local'], None)
+        self.assertEqual(state['_pid'], None)
+
+        if not hasattr(multiprocessing, 'set_start_method'):  # python 2
+            return
+
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              'spawn_counters.py')
+        subprocess.check_call([sys.executable, script])
+
+
+if __name__ == '__main__':
+
+    Context.set_logger()
+    sys.exit(unittest.main())
@@ -182,11 +182,11 @@ class ShellTests(unittest.TestCase):
         shell.do('sleep 123', space_id='*id')
         self.assertEqual(shell.line, 'sleep 123')
         self.assertEqual(shell.count, 5)
-        my_engine.set('worker.busy', True)
+        my_engine.set('worker.0.busy', True)
         shell.do('sleep 456', space_id='*id')
         self.assertEqual(shell.line, 'sleep 456')
         self.assertEqual(shell.count, 6)
-        my_engine.set('worker.busy', False)
+        my_engine.set('worker.0.busy', False)
         self.assertEqual(shell.engine.mouth.get().text, 'Ok, working on it')
         self.assertEqual(shell.engine.mouth.get().text,
                          'Ok, will work on it as soon as possible')
@@ -133,6 +133,78 @@ class SpeakerTests(unittest.TestCase):
         my_engine.speaker.run()
         self.assertEqual(my_engine.get('speaker.counter'), 0)
 
+    def test_run_threads(self):
+
+        logging.info("*** run with threads")
+
+        my_engine.space = SpaceFactory.get('local', engine=my_engine)
+        my_engine.space.values['id'] = '123'
+        my_engine.set('speaker.threads', 4)
+
+        posted = []
+
+        def my_post(text, content=None, file=None, space_id=None):
+            time.sleep(0.001)
+            posted.append((space_id, text))
+
+        my_engine.space.post_message = my_post
+
+        for index in range(20):
+            for space_id in ('123', '456', '789'):
+                my_engine.mouth.put(Vibes(text=str(index), space_id=space_id))
+        my_engine.mouth.put(None)
+
+        speaker = Speaker(engine=my_engine)
+        speaker.run()
+        my_engine.set('speaker.threads', 1)
+
+        self.assertEqual(speaker.lanes, [])
+        self.assertEqual(my_engine.get('speaker.counter'), 60)
+        for space_id in ('123', '456', '789'):
+            self.assertEqual([text for (id, text) in posted if id == space_id],
+                             [str(index) for index in range(20)])
+
+    def test_coalesce(self):
+
+        logging.info("*** coalesce")
+
+        my_engine.space = SpaceFactory.get('local', engine=my_engine)
+        my_engine.space.values['id'] = '123'
+        my_engine.set('speaker.coalesce', 0.01)
+
+        my_engine.mouth.put(Vibes(text='hello', space_id='123'))
+        my_engine.mouth.put(Vibes(text='world', space_id='456'))
+        my_engine.mouth.put(Vibes(text='how', content='**how**',
+                                  space_id='123'))
+        my_engine.mouth.put(Vibes(text='are', space_id='123'))
+        my_engine.mouth.put(Vibes(text='file', file='a.pdf', space_id='123'))
+        my_engine.mouth.put(Vibes(text='you', space_id='123'))
+        my_engine.mouth.put(Vibes(text='x' * 7000, space_id='456'))
+        my_engine.mouth.put(None)
+
+        speaker = Speaker(engine=my_engine)
+        with mock.patch.object(my_engine.space,
+                               'post_message',
+                               return_value=None) as mocked:
+
+            speaker.run()
+            my_engine.set('speaker.coalesce', 0.0)
+
+            self.assertEqual(mocked.call_count, 5)
+            self.assertEqual(mocked.call_args_list[0], mock.call(
+                'hello\nhow\nare',
+                content='hello\n\n**how**\n\nare',
+                file=None,
+                space_id='123'))
+            self.assertEqual(mocked.call_args_list[1], mock.call(
+                'world', content=None, file=None, space_id='456'))
+            self.assertEqual(mocked.call_args_list[2], mock.call(
+                'file', content=None, file='a.pdf', space_id='123'))
+            self.assertEqual(mocked.call_args_list[3], mock.call(
+                'you', content=None, file=None, space_id='123'))
+            self.assertEqual(mocked.call_args_list[4], mock.call(
+                'x' * 7000, content=None, file=None, space_id='456'))
+
     def test_run_wait(self):
 
         logging.info("*** run/wait while empty and not ready")
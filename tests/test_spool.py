@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import gc
+import logging
+from multiprocessing import Process
+import os
+import shutil
+from six.moves.queue import Empty
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath('..'))
+
+from shellbot import Context
+from shellbot.speaker import Vibes
+from shellbot.spool import Spool
+
+
+def feed(spool, count):
+    for index in range(count):
+        spool.put(index)
+
+
+class SpoolTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'spool', 'test.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        collected = gc.collect()
+        logging.info("Garbage collector: collected %d objects." % (collected))
+
+    def test_init(self):
+
+        logging.info('*** init ***')
+
+        spool = Spool(self.path)
+        self.assertTrue(os.path.exists(self.path))
+        self.assertTrue(spool.empty())
+        self.assertEqual(spool.qsize(), 0)
+
+    def test_queue(self):
+
+        logging.info('*** queue ***')
+
+        spool = Spool(self.path)
+        spool.put('hello')
+        spool.put(('echo', 'world', '*id'))
+        spool.put(Vibes(text='hi', space_id='*id'))
+        spool.put(None)
+        self.assertEqual(spool.qsize(), 4)
+
+        self.assertEqual(spool.get(), 'hello')
+        self.assertEqual(spool.get(), ('echo', 'world', '*id'))
+        self.assertEqual(spool.get_nowait().text, 'hi')
+        self.assertEqual(spool.get(True, 0.1), None)
+        self.assertTrue(spool.empty())
+
+        with self.assertRaises(Empty):
+            spool.get_nowait()
+
+        start = time.time()
+        with self.assertRaises(Empty):
+            spool.get(True, 0.05)
+        self.assertTrue(time.time() - start >= 0.05)
+
+    def test_replay(self):
+
+        logging.info('*** replay ***')
+
+        spool = Spool(self.path)
+        for item in ['a', 'b', 'c']:
+            spool.put(item)
+
+        self.assertEqual(spool.get(), 'a')
+        self.assertEqual(spool.get(), 'b')
+        spool.ack()  # 'a' has been processed, not 'b'
+
+        spool = Spool(self.path)  # restart
+        self.assertEqual(spool.qsize(), 2)
+        self.assertEqual(spool.get(), 'b')
+        self.assertEqual(spool.get(), 'c')
+        spool.ack(2)
+
+        spool = Spool(self.path)
+        self.assertTrue(spool.empty())
+
+    def test_processes(self):
+
+        logging.info('*** processes ***')
+
+        spool = Spool(self.path)
+        process = Process(target=feed, args=(spool, 20))
+        process.start()
+
+        received = []
+        while len(received) < 20:
+            received.append(spool.get(True, 5.0))
+            spool.ack()
+        process.join()
+
+        self.assertEqual(received, list(range(20)))
+        self.assertTrue(spool.empty())
+
+
+if __name__ == '__main__':
+
+    Context.set_logger()
+    sys.exit(unittest.main())
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+import gc
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath('..'))
+
+from shellbot import Context, Engine
+from shellbot.state import State
+from shellbot.stores import MemoryStore
+
+
+class StateTests(unittest.TestCase):
+
+    def tearDown(self):
+        State.configure()
+        collected = gc.collect()
+        logging.info("Garbage collector: collected %d objects." % (collected))
+
+    def test_configure(self):
+
+        logging.info('*** configure ***')
+
+        self.assertEqual(State.mode, 'shared')
+
+        State.configure(mode='local')
+        self.assertEqual(State.mode, 'local')
+
+        State.configure()
+        self.assertEqual(State.mode, 'shared')
+
+        with self.assertRaises(ValueError):
+            State.configure(mode='*unknown*mode')
+        self.assertEqual(State.mode, 'shared')
+
+    def test_get_manager(self):
+
+        logging.info('*** get_manager ***')
+
+        manager = State.get_manager()
+        self.assertTrue(manager is not None)
+        self.assertTrue(State.get_manager() is manager)
+
+    def test_dict(self):
+
+        logging.info('*** dict ***')
+
+        values = State.dict()
+        self.assertFalse(isinstance(values, dict))
+        values['hello'] = 'world'
+        self.assertEqual(values.get('hello'), 'world')
+
+        other = State.dict()
+        self.assertEqual(other.get('hello'), None)
+
+        State.configure(mode='local')
+        values = State.dict()
+        self.assertTrue(isinstance(values, dict))
+
+        values = State.dict(shared=True)
+        self.assertFalse(isinstance(values, dict))
+
+        State.configure()
+        values = State.dict(shared=False)
+        self.assertTrue(isinstance(values, dict))
+
+    def test_engine(self):
+
+        logging.info('*** engine ***')
+
+        engine = Engine(context=Context())
+        engine.configure_from_dict({'general.state': 'local'})
+        self.assertEqual(engine.get('general.state'), 'local')
+        self.assertEqual(State.mode, 'local')
+
+        store = MemoryStore()
+        self.assertTrue(isinstance(store.values, dict))
+
+        with self.assertRaises(ValueError):
+            engine.configure_from_dict({'general.state': '*unknown*mode'})
+
+
+if __name__ == '__main__':
+
+    Context.set_logger()
+    sys.exit(unittest.main())
@@ -127,6 +127,36 @@ class WorkerTests(unittest.TestCase):
             with self.assertRaises(Exception):
                 worker.process(item=('hello', 'here', '*id'))
 
+    def test_pool(self):
+
+        logging.info("*** pool")
+
+        my_engine.context.clear()
+        worker = Worker(engine=my_engine, index=1, inbox=Queue())
+        self.assertEqual(worker.key('busy'), 'worker.1.busy')
+        self.assertTrue(worker.get_inbox() is not my_engine.inbox)
+        self.assertFalse(worker.is_busy())
+
+        worker.push(('pass', '', '*id'))
+        self.assertEqual(my_engine.get('worker.1.depth'), 1)
+        self.assertTrue(worker.is_busy())
+
+        worker.process = mock.Mock()
+        worker.inbox.put(None)
+        worker.run()
+        worker.process.assert_called_with(('pass', '', '*id'))
+        self.assertEqual(my_engine.get('worker.1.depth'), 0)
+        self.assertFalse(worker.is_busy())
+
+        worker = Worker(engine=my_engine)
+        self.assertTrue(worker.get_inbox() is my_engine.inbox)
+        worker.process = mock.Mock()
+        my_engine.inbox.put(('pass', '', '*id'))  # not counted
+        my_engine.inbox.put(None)
+        worker.run()
+        self.assertEqual(my_engine.get('worker.0.depth'), 0)
+        my_engine.context.clear()
+
 
 if __name__ == '__main__':
 
@@ -58,8 +58,8 @@ class UpdaterTests(unittest.TestCase):
         })
 
         class FakeSpace(object):
-            def download_attachment(self, url):
-                return 'some_file.pdf'
+            def download_attachment(self, url, callback):
+                callback('some_file.pdf')
 
         u.space = FakeSpace()
         u.put(item)